@@ -0,0 +1,330 @@
+"""
+能源問答的多語系回答模板（zh-TW / en / ja / ko）
+
+查表類回答直接用使用者的語種產生，
+/chat 只有在回答語種仍然不一致時才呼叫翻譯模型
+"""
+
+from query_parser import DEFAULT_LANG, detect_lang
+
+LANGUAGE_NAMES = {
+    "zh-TW": "Traditional Chinese",
+    "en": "English",
+    "ja": "Japanese",
+    "ko": "Korean",
+}
+
+# 五大部門（其餘子部門用 hierarchy.json 的英文名稱）
+DEPARTMENT_NAMES = {
+    "工業部門": {"en": "Industrial Sector", "ja": "産業部門", "ko": "산업 부문"},
+    "運輸部門": {"en": "Transportation Sector", "ja": "運輸部門", "ko": "수송 부문"},
+    "農業部門": {"en": "Agricultural Sector", "ja": "農業部門", "ko": "농업 부문"},
+    "服務業部門": {"en": "Service Sector", "ja": "サービス部門", "ko": "서비스 부문"},
+    "住宅部門": {"en": "Residential Sector", "ja": "家庭部門", "ko": "주거 부문"},
+}
+
+TEMPLATES = {
+    # -------------------------------------------------
+    # 共用片段
+    # -------------------------------------------------
+    "list_sep": {"zh-TW": "、", "en": ", ", "ja": "、", "ko": ", "},
+    "year": {
+        "zh-TW": "{year}年",
+        "en": "{ad} (ROC {year})",
+        "ja": "{ad}年（民国{year}年）",
+        "ko": "{ad}년(민국 {year}년)",
+    },
+    "year_roc": {
+        "zh-TW": "民國{year}年",
+        "en": "{ad} (ROC {year})",
+        "ja": "{ad}年（民国{year}年）",
+        "ko": "{ad}년(민국 {year}년)",
+    },
+    "selected_year": {
+        "zh-TW": "指定年度",
+        "en": "the selected year",
+        "ja": "指定年度",
+        "ko": "지정 연도",
+    },
+    "all_years": {
+        "zh-TW": "各年度",
+        "en": "all years",
+        "ja": "全年度",
+        "ko": "전체 연도",
+    },
+    "related_years": {
+        "zh-TW": "相關年度",
+        "en": "the relevant years",
+        "ja": "関連年度",
+        "ko": "관련 연도",
+    },
+    "usage_item": {
+        "zh-TW": "{name}（比例 {value}%｜使用量 {usage:,}公噸油當量（toe））",
+        "en": "{name} (share {value}% | usage {usage:,} toe)",
+        "ja": "{name}（比率 {value}%｜使用量 {usage:,} toe）",
+        "ko": "{name} (비율 {value}% | 사용량 {usage:,} toe)",
+    },
+    # -------------------------------------------------
+    # 單年度查表
+    # -------------------------------------------------
+    "top_by_department": {
+        "zh-TW": "根據{year}已生成的能源資料，{department}主要使用的能源包括：{items}。",
+        "en": "Based on the energy data for {year}, the {department} mainly uses: {items}.",
+        "ja": "{year}のエネルギーデータによると、{department}が主に使用しているエネルギーは：{items}。",
+        "ko": "{year} 에너지 데이터에 따르면 {department}에서 주로 사용하는 에너지는 {items}입니다.",
+    },
+    "department_not_found": {
+        "zh-TW": "找不到「{year}{department}」的能源資料。",
+        "en": "No energy data found for the {department} in {year}.",
+        "ja": "{year}の{department}のエネルギーデータが見つかりません。",
+        "ko": "{year} {department}의 에너지 데이터를 찾을 수 없습니다.",
+    },
+    "top_by_energy": {
+        "zh-TW": "根據{year}已生成的能源資料，{energy}主要使用於：{items}。",
+        "en": "Based on the energy data for {year}, {energy} is mainly used in: {items}.",
+        "ja": "{year}のエネルギーデータによると、{energy}の主な使用先は：{items}。",
+        "ko": "{year} 에너지 데이터에 따르면 {energy}은(는) 주로 {items}에서 사용됩니다.",
+    },
+    "energy_not_found": {
+        "zh-TW": "找不到「{year}{energy}」的資料。",
+        "en": "No data found for {energy} in {year}.",
+        "ja": "{year}の{energy}のデータが見つかりません。",
+        "ko": "{year} {energy} 데이터를 찾을 수 없습니다.",
+    },
+    "uses_energy": {
+        "zh-TW": "根據{year}已生成的能源資料，{department}有使用{item}。",
+        "en": "Based on the energy data for {year}, the {department} uses {item}.",
+        "ja": "{year}のエネルギーデータによると、{department}は{item}を使用しています。",
+        "ko": "{year} 에너지 데이터에 따르면 {department}은(는) {item}을(를) 사용합니다.",
+    },
+    "not_uses_energy": {
+        "zh-TW": "根據{year}已生成的能源資料，{department}沒有使用{energy}。",
+        "en": "Based on the energy data for {year}, the {department} does not use {energy}.",
+        "ja": "{year}のエネルギーデータによると、{department}は{energy}を使用していません。",
+        "ko": "{year} 에너지 데이터에 따르면 {department}은(는) {energy}을(를) 사용하지 않습니다.",
+    },
+    "top_overall": {
+        "zh-TW": "根據{year}已生成的能源資料，使用量最多的能源包括：{items}。",
+        "en": "Based on the energy data for {year}, the most used energy sources are: {items}.",
+        "ja": "{year}のエネルギーデータによると、使用量が最も多いエネルギーは：{items}。",
+        "ko": "{year} 에너지 데이터에 따르면 사용량이 가장 많은 에너지는 {items}입니다.",
+    },
+    "overall_not_found": {
+        "zh-TW": "找不到「{year}」的整體能源資料。",
+        "en": "No overall energy data found for {year}.",
+        "ja": "{year}の全体エネルギーデータが見つかりません。",
+        "ko": "{year} 전체 에너지 데이터를 찾을 수 없습니다.",
+    },
+    # -------------------------------------------------
+    # 多年度 / 多部門比較
+    # -------------------------------------------------
+    "multi_year_title": {
+        "zh-TW": "各年度使用量最多能源如下：\n\n",
+        "en": "Most used energy sources by year:\n\n",
+        "ja": "年度別の使用量上位エネルギー：\n\n",
+        "ko": "연도별 사용량 상위 에너지:\n\n",
+    },
+    "multi_year_not_found": {
+        "zh-TW": "找不到多年份資料",
+        "en": "No data found for these years",
+        "ja": "複数年度のデータが見つかりません",
+        "ko": "여러 연도의 데이터를 찾을 수 없습니다",
+    },
+    "years_not_found": {
+        "zh-TW": "找不到相關年份資料。",
+        "en": "No data found for the requested years.",
+        "ja": "該当年度のデータが見つかりません。",
+        "ko": "해당 연도의 데이터를 찾을 수 없습니다.",
+    },
+    "compare_years_title": {
+        "zh-TW": "### 多年度能源比較\n\n",
+        "en": "### Energy comparison across years\n\n",
+        "ja": "### 年度別エネルギー比較\n\n",
+        "ko": "### 연도별 에너지 비교\n\n",
+    },
+    "compare_department_title": {
+        "zh-TW": "### {department} 多年度能源比較\n\n",
+        "en": "### {department}: energy comparison across years\n\n",
+        "ja": "### {department} 年度別エネルギー比較\n\n",
+        "ko": "### {department} 연도별 에너지 비교\n\n",
+    },
+    "compare_departments_title": {
+        "zh-TW": "### {year} 多部門能源比較\n\n",
+        "en": "### {year}: energy comparison across sectors\n\n",
+        "ja": "### {year} 部門別エネルギー比較\n\n",
+        "ko": "### {year} 부문별 에너지 비교\n\n",
+    },
+    "labeled_line": {
+        "zh-TW": "{label}：{items}",
+        "en": "{label}: {items}",
+        "ja": "{label}：{items}",
+        "ko": "{label}: {items}",
+    },
+    # -------------------------------------------------
+    # 語意檢索
+    # -------------------------------------------------
+    "semantic_intro": {
+        "zh-TW": "根據{year}已生成的能源資料，找到以下相關內容：\n",
+        "en": "Based on the energy data for {year}, the following related records were found:\n",
+        "ja": "{year}のエネルギーデータから、以下の関連データが見つかりました：\n",
+        "ko": "{year} 에너지 데이터에서 다음 관련 내용을 찾았습니다:\n",
+    },
+    "semantic_ratio": {
+        "zh-TW": "{year} {department} 使用 {item}",
+        "en": "{year}: {department} uses {item}",
+        "ja": "{year}：{department}が{item}を使用",
+        "ko": "{year}: {department}에서 {item} 사용",
+    },
+    "semantic_not_found": {
+        "zh-TW": "找不到相關能源資料。",
+        "en": "No related energy data found.",
+        "ja": "関連するエネルギーデータが見つかりません。",
+        "ko": "관련 에너지 데이터를 찾을 수 없습니다.",
+    },
+    # -------------------------------------------------
+    # /chat 回答模式
+    # -------------------------------------------------
+    "precise_header": {
+        "zh-TW": "🎯 **精確查詢結果**",
+        "en": "🎯 **Precise query result**",
+        "ja": "🎯 **検索結果**",
+        "ko": "🎯 **정확한 조회 결과**",
+    },
+    "analysis_header": {
+        "zh-TW": "## 📊 能源資料完整分析",
+        "en": "## 📊 Full energy data analysis",
+        "ja": "## 📊 エネルギーデータ総合分析",
+        "ko": "## 📊 에너지 데이터 종합 분석",
+    },
+    "analysis_footer": {
+        "zh-TW": (
+            "### 🔍 綜合說明\n"
+            "- 已整合所有相關能源數據\n"
+            "- 包含結構比例、主要能源分布\n"
+            "- 可觀察長期趨勢與變化方向\n\n"
+            "### 📈 建議解讀方向\n"
+            "- 注意高占比能源 → 代表依賴性\n"
+            "- 觀察變化 → 可能代表產業轉型"
+        ),
+        "en": (
+            "### 🔍 Summary\n"
+            "- All related energy figures are combined\n"
+            "- Includes structural shares and the main energy sources\n"
+            "- Shows long-term trends and direction of change\n\n"
+            "### 📈 How to read it\n"
+            "- High-share energy sources → dependence\n"
+            "- Changes over time → possible industrial transition"
+        ),
+        "ja": (
+            "### 🔍 総合説明\n"
+            "- 関連するエネルギーデータをすべて統合\n"
+            "- 構成比と主要エネルギーの分布を含む\n"
+            "- 長期的な傾向と変化の方向を確認可能\n\n"
+            "### 📈 読み取りのポイント\n"
+            "- 比率の高いエネルギー → 依存度を示す\n"
+            "- 変化 → 産業構造の転換を示す可能性"
+        ),
+        "ko": (
+            "### 🔍 종합 설명\n"
+            "- 관련 에너지 데이터를 모두 통합\n"
+            "- 구조 비율과 주요 에너지 분포 포함\n"
+            "- 장기 추세와 변화 방향 확인 가능\n\n"
+            "### 📈 해석 포인트\n"
+            "- 비율이 높은 에너지 → 의존도를 의미\n"
+            "- 변화 → 산업 전환 가능성"
+        ),
+    },
+}
+
+
+def render(key, lang=DEFAULT_LANG, **kwargs):
+    templates = TEMPLATES[key]
+    return templates.get(lang, templates[DEFAULT_LANG]).format(**kwargs)
+
+
+def join_items(items, lang=DEFAULT_LANG):
+    return render("list_sep", lang).join(items)
+
+
+# =====================================================
+# 名稱 / 年度
+# =====================================================
+def year_label(year, lang=DEFAULT_LANG, roc=False, missing="selected_year"):
+    """
+    year 為民國年；沒有年份時用 missing 指定的描述（指定年度 / 各年度 / 相關年度）
+    """
+    if year is None:
+        return render(missing, lang)
+
+    return render("year_roc" if roc else "year", lang, year=year, ad=year + 1911)
+
+
+def _cube_meta(dim):
+    # 英文名稱來自前端的 hierarchy.json / supply_catalog.json；讀不到就沿用中文
+    try:
+        from energy_cube import get_cube
+
+        cube = get_cube()
+    except OSError:
+        return {}
+
+    return cube.d_meta if dim == "d" else cube.s_meta
+
+
+def department_label(name, lang=DEFAULT_LANG, code=None):
+    if lang == DEFAULT_LANG or not name:
+        return name
+
+    if name in DEPARTMENT_NAMES:
+        return DEPARTMENT_NAMES[name][lang]
+
+    if code:
+        return _cube_meta("d").get(code, {}).get("name_en") or name
+
+    return name
+
+
+def energy_label(record, lang=DEFAULT_LANG):
+    name = record.get("supply_name_zh", "")
+
+    if lang == DEFAULT_LANG:
+        return name
+
+    return record.get("supply_name_en") or name
+
+
+def energy_name_label(energy_name, lang=DEFAULT_LANG, records=()):
+    """
+    問題中的能源名稱（中文）→ 該語系名稱，先找 records 的 supply_name_en，再找能源目錄
+    """
+    if lang == DEFAULT_LANG:
+        return energy_name
+
+    for r in records:
+        if r.get("supply_name_zh", "").strip() == energy_name and r.get(
+            "supply_name_en"
+        ):
+            return r["supply_name_en"]
+
+    for meta in _cube_meta("s").values():
+        if meta.get("name_zh") == energy_name and meta.get("name_en"):
+            return meta["name_en"]
+
+    return energy_name
+
+
+def usage_item(name, record, lang=DEFAULT_LANG):
+    value = record.get("value", 0) or 0
+
+    return render(
+        "usage_item",
+        lang,
+        name=name,
+        value=round(value, 2),
+        # 欄位式 store 的 NaN 會回傳 None
+        usage=round((record.get("total_supply") or 0) * value / 1000, 2),
+    )
+
+
+def language_name(text):
+    return LANGUAGE_NAMES[detect_lang(text)]
@@ -32,16 +32,18 @@ import pandas as pd
 
 load_dotenv()
 
-from openai import OpenAI
+from llm_backend import get_llm_client
 
-openai_client = OpenAI()
+# LLM_BACKEND：openai / record / replay / stub（見 llm_backend.py）
+openai_client = get_llm_client()
 
 from pipelines.rag_web import qa_over_web
 from pipelines.rag_pdf import qa_over_pdf
 
 # from pipelines.rag_av import qa_over_av
 
-from chat import chat_bp
+from chat import CHAT_SESSIONS, chat_bp, response_cache
+from energy_api import energy_bp
 from tables import tables_bp
 
 app = Flask(__name__)
@@ -58,6 +60,7 @@ app.config.update(
 )
 
 app.register_blueprint(chat_bp)
+app.register_blueprint(energy_bp)
 app.register_blueprint(tables_bp)
 
 
@@ -225,9 +228,10 @@ from prophet import Prophet
 # 📂 路徑
 # =========================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "../src/data")
+# ENERGY_DATA_DIR / ENERGY_MODEL_DIR 可指向合成資料（容量測試）
+DATA_DIR = os.getenv("ENERGY_DATA_DIR", os.path.join(BASE_DIR, "../src/data"))
 CONSUMPTION_PATH = os.path.join(DATA_DIR, "consumption.json")
-MODEL_DIR = os.path.join(BASE_DIR, "models")
+MODEL_DIR = os.getenv("ENERGY_MODEL_DIR", os.path.join(BASE_DIR, "models"))
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 SERIES_CACHE = {}
@@ -1676,11 +1680,7 @@ def contact():
     # =========================
     def generate_reply():
         try:
-            from openai import OpenAI
-
-            client = OpenAI()
-
-            res = client.chat.completions.create(
+            res = openai_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -1773,8 +1773,11 @@ def contact():
     conn.close()
 
     # =========================
-    # 📩 寄信
+    # 📩 寄信（壓力測試時設 CONTACT_SEND_EMAIL=false）
     # =========================
+    if os.getenv("CONTACT_SEND_EMAIL", "true").lower() != "true":
+        return jsonify({"status": "success"})
+
     try:
         print("🔥 開始寄信")
 
@@ -1930,6 +1933,34 @@ def delete_feedback():
     return jsonify({"status": "ok"})
 
 
+# =========================
+# 💬 /chat 語意快取（只影響處理這個請求的 worker）
+# =========================
+@app.route("/chat_cache/stats")
+@require_role("admin")
+def chat_cache_stats():
+    return jsonify(
+        {
+            "semantic_cache": response_cache.stats(),
+            "sessions": CHAT_SESSIONS.stats(),
+        }
+    )
+
+
+@app.route("/chat_cache/purge", methods=["POST"])
+@require_role("admin")
+def chat_cache_purge():
+
+    data = request.get_json(silent=True) or {}
+
+    # 不指定 = 全部清除；其他 worker 在下次查詢前套用
+    where = {k: data[k] for k in ("lang", "mode") if data.get(k) is not None}
+
+    purged = response_cache.purge(**where)
+
+    return jsonify({"purged": purged, "semantic_cache": response_cache.stats()})
+
+
 # ====================================
 # 1. Web 問答
 # ====================================
@@ -0,0 +1,140 @@
+"""
+語意快取命中檢查（離線，使用線上相同的 embedding 模型）
+
+每組問題對：第一句寫入快取，第二句查詢
+  - same：同一個問題的不同說法，應該命中
+  - diff：只差年份 / 部門 / 能源，答案不同，不應命中
+
+分別在「只比相似度」與「加上 cache_guard（意圖 / 年份 / 部門 / 能源 / 數字）」下，
+列出 false hit（diff 卻命中）與 miss（same 卻沒命中），以及每組的相似度，
+調整 CHAT_SEMANTIC_CACHE_THRESHOLD 或換 embedding 模型時先跑一次。
+
+用法：
+  python benchmarks/check_semantic_cache.py
+  python benchmarks/check_semantic_cache.py --threshold 0.9 --verbose
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+# 不連網路：embedding 模型只從本機快取讀取
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# (預期, 寫入的問題, 查詢的問題)
+PAIRS = [
+    ("same", "113年工業部門主要使用哪些能源", "113年工業部門主要用哪些能源？"),
+    ("same", "天然氣用在哪些部門", "天然氣主要用在哪些部門？"),
+    ("same", "住宅部門有沒有使用太陽光電", "住宅部門有使用太陽光電嗎"),
+    ("same", "什麼是能源平衡表", "能源平衡表是什麼"),
+    (
+        "same",
+        "Which sector uses the most natural gas?",
+        "Which sector consumes the most natural gas?",
+    ),
+    ("same", "What is an energy balance table?", "What's an energy balance table?"),
+    ("diff", "113年工業部門主要使用哪些能源", "112年工業部門主要使用哪些能源"),
+    ("diff", "113年工業部門主要使用哪些能源", "113年住宅部門主要使用哪些能源"),
+    ("diff", "85年和113年工業部門主要能源差異", "90年和113年工業部門主要能源差異"),
+    ("diff", "天然氣用在哪些部門", "燃料油用在哪些部門"),
+    ("diff", "住宅部門有沒有使用太陽光電", "服務業部門有沒有使用太陽光電"),
+    ("diff", "113年使用量最多的能源前五", "113年使用量最多的能源前十"),
+    (
+        "diff",
+        "Which sector uses the most natural gas?",
+        "Which sector uses the most coal?",
+    ),
+    (
+        "diff",
+        "Energy use of the industrial sector in 2020",
+        "Energy use of the industrial sector in 2023",
+    ),
+]
+
+
+def run(threshold, pairs=PAIRS):
+    from energy_chat_router import embedder, parse_query
+    from semantic_cache import SemanticCache, cache_guard
+
+    rows = []
+
+    for expected, stored, asked in pairs:
+        row = {"expected": expected, "stored": stored, "asked": asked}
+
+        for name, use_guard in (("plain", False), ("guard", True)):
+            cache = SemanticCache(embedder, threshold=threshold)
+
+            stored_parsed = parse_query(stored)
+            asked_parsed = parse_query(asked)
+            stored_guard = cache_guard(stored_parsed, stored) if use_guard else ()
+            asked_guard = cache_guard(asked_parsed, asked) if use_guard else ()
+
+            scope = (stored_parsed.lang, stored_parsed.mode)
+            cache.set(stored, scope, stored, guard=stored_guard)
+            value, _, _ = cache.get(
+                asked, (asked_parsed.lang, asked_parsed.mode), asked_guard
+            )
+
+            row[name] = value is not None
+
+        # 相似度（不看門檻）
+        vecs = embedder.encode([stored, asked])
+        row["cosine"] = round(float(vecs[0] @ vecs[1]), 4)
+
+        rows.append(row)
+
+    return rows
+
+
+def summarize(rows):
+    report = {}
+
+    for name in ("plain", "guard"):
+        report[name] = {
+            "false_hits": sum(r["expected"] == "diff" and r[name] for r in rows),
+            "misses": sum(r["expected"] == "same" and not r[name] for r in rows),
+        }
+
+    return report
+
+
+def main():
+    from semantic_cache import SEMANTIC_CACHE_THRESHOLD
+
+    parser = argparse.ArgumentParser(description="語意快取命中檢查")
+    parser.add_argument("--threshold", type=float, default=SEMANTIC_CACHE_THRESHOLD)
+    parser.add_argument("--verbose", action="store_true", help="列出每一組問題")
+    args = parser.parse_args()
+
+    rows = run(args.threshold)
+
+    if args.verbose:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+
+    report = summarize(rows)
+
+    print(f"\n===== threshold {args.threshold} =====")
+    for name, counts in report.items():
+        print(f"{name:6s} false hit {counts['false_hits']}  miss {counts['misses']}")
+
+    # guard 下仍有 false hit → 門檻或模型需要調整
+    if report["guard"]["false_hits"]:
+        print("\n⚠️ 加上 guard 仍有 false hit")
+        for row in rows:
+            if row["expected"] == "diff" and row["guard"]:
+                print(f"  {row['stored']}  →  {row['asked']}  ({row['cosine']})")
+
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
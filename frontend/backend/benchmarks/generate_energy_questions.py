@@ -0,0 +1,437 @@
+"""
+產生能源問答 benchmark 的標註問題集（固定亂數種子，可重現）
+
+每一題的標註：
+  category  : 題型（含語意檢索 / 閒聊）
+  use_rag   : 是否應該走 Energy RAG（ParsedQuery.use_rag）
+  intent    : 應該判斷出的意圖（ParsedQuery.intent，閒聊為 null）
+  handler   : resolve_answer_route 應該選到的回答函式
+  params    : 回答函式應該收到的參數（只比對有列出的欄位）
+  relevant  : 相關 records 的欄位條件（計算 recall@k 用，沒有則為 null）
+
+用法：
+  python benchmarks/generate_energy_questions.py
+  python benchmarks/generate_energy_questions.py --per-category 80
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+OUTPUT_PATH = BENCH_DIR / "energy_questions.jsonl"
+
+SEED = 20240601
+RATIO_SHEET = "總比例換算"
+
+YEARS = list(range(80, 114))
+
+DEPARTMENTS = ["工業部門", "運輸部門", "農業部門", "服務業部門", "住宅部門"]
+
+# 口語說法 -> 正式部門名稱
+DEPARTMENT_ALIASES = {
+    "工業部門": ["工業部門", "工業"],
+    "運輸部門": ["運輸部門", "運輸", "交通"],
+    "農業部門": ["農業部門", "農業"],
+    "服務業部門": ["服務業部門", "服務業", "商業"],
+    "住宅部門": ["住宅部門", "住宅", "家庭"],
+}
+
+# 口語說法 -> 資料中的能源名稱
+ENERGY_ALIASES = {
+    "天然氣": ["天然氣", "瓦斯"],
+    "電力": ["電力", "用電"],
+    "煤及煤產品": ["煤及煤產品", "煤炭"],
+    "原油及石油產品": ["原油及石油產品", "石油"],
+    "柴油": ["柴油"],
+    "燃料油": ["燃料油"],
+    "液化石油氣": ["液化石油氣"],
+    "車用汽油": ["車用汽油"],
+    "熱能": ["熱能"],
+    "生質能": ["生質能"],
+}
+
+# 細項部門（不在五大部門內，只能靠語意 / 字詞檢索）
+SUB_SECTORS = [
+    "鋼鐵基本工業",
+    "化學材料製造業",
+    "水泥及水泥製品業",
+    "食品飲料及菸草業",
+    "紡織成衣及服飾業",
+    "電腦通信及視聽電子產品製造業",
+    "公路",
+    "鐵路",
+    "國內航空",
+    "國內水運",
+    "漁業",
+    "農牧及林業",
+]
+
+SUB_SECTOR_ENERGIES = ["電力", "燃料油", "柴油", "天然氣", "車用汽油", "液化石油氣"]
+
+ENERGY_EN = {
+    "電力": "Electricity",
+    "燃料油": "Fuel Oil",
+    "柴油": "Diesel Oil",
+    "天然氣": "Natural Gas",
+    "車用汽油": "Motor Gasoline",
+    "液化石油氣": "Liquefied Petroleum Gases (LPG)",
+}
+
+GENERAL_QUESTIONS = [
+    "你好",
+    "嗨，你是誰？",
+    "你可以做什麼？",
+    "謝謝你的幫忙",
+    "hello",
+    "thanks!",
+    "再生能源是什麼？",
+    "為什麼要發展離岸風電？",
+    "請介紹一下碳中和的概念",
+    "核能發電的原理是什麼",
+    "解釋一下能源轉型",
+    "台灣適合發展地熱嗎？",
+    "氫能未來的發展如何",
+    "能源價格上漲的原因",
+    "說明儲能系統的影響",
+]
+
+
+# =====================================================
+# 年份寫法
+# =====================================================
+def year_text(rng, year, allow_ad=True):
+    forms = ["{y}年", "民國{y}年"]
+    if allow_ad:
+        forms.append("{ad}年")
+
+    return rng.choice(forms).format(y=year, ad=year + 1911)
+
+
+def pick_years(rng, n=2):
+    return sorted(rng.sample(YEARS, n))
+
+
+def question(category, text, intent, handler, params, relevant=None, use_rag=True):
+    return {
+        "category": category,
+        "question": text,
+        "use_rag": use_rag,
+        "intent": intent,
+        "handler": handler,
+        "params": params,
+        "relevant": relevant,
+    }
+
+
+# =====================================================
+# 各題型
+# =====================================================
+def top_energy_by_department(rng):
+    dept = rng.choice(DEPARTMENTS)
+    alias = rng.choice(DEPARTMENT_ALIASES[dept])
+    year = rng.choice(YEARS)
+    y = year_text(rng, year)
+
+    templates = [
+        ("{y}{d}主要使用哪些能源？", 5),
+        ("{y}{d}都用什麼能源", 5),
+        ("{y}{d}用哪些能源", 5),
+        ("{y}{d}主要用什麼能源？", 5),
+        ("{y}{d}使用的能源前三", 3),
+        ("{y}{d}使用最多的能源是什麼", 1),
+    ]
+    template, top_n = rng.choice(templates)
+
+    # 「前三」「最多」的句型需要「部門」字樣
+    if top_n != 5:
+        alias = dept
+
+    return question(
+        "top_energy_by_department",
+        template.format(y=y, d=alias),
+        "top_energy_by_department",
+        "answer_top_energy_by_department",
+        {"department": dept, "year": year, "top_n": top_n},
+        {"year": year, "sheet": RATIO_SHEET, "demand_name": dept},
+    )
+
+
+def top_department_by_energy(rng):
+    energy = rng.choice(list(ENERGY_ALIASES))
+    alias = rng.choice(ENERGY_ALIASES[energy])
+    year = rng.choice(YEARS)
+    y = year_text(rng, year)
+
+    template = rng.choice(
+        [
+            "{y}{e}用在哪些部門？",
+            "{y}哪些部門使用{e}",
+            "{y}{e}有哪些部門有用到",
+            "{y}{e}主要是哪些部門在使用",
+            "{y}誰在用{e}？",
+        ]
+    )
+
+    return question(
+        "top_department_by_energy",
+        template.format(y=y, e=alias),
+        "top_department_by_energy",
+        "answer_top_department_by_energy",
+        {"energy_name": energy, "year": year},
+        {"year": year, "sheet": RATIO_SHEET, "supply_name_zh": energy},
+    )
+
+
+def check_usage(rng):
+    dept = rng.choice(DEPARTMENTS)
+    alias = rng.choice(DEPARTMENT_ALIASES[dept])
+    energy = rng.choice(list(ENERGY_ALIASES))
+    # 「使用用電」不通順，動詞開頭的說法不放進這個題型
+    e_alias = rng.choice([a for a in ENERGY_ALIASES[energy] if not a.startswith("用")])
+    year = rng.choice(YEARS)
+    y = year_text(rng, year)
+
+    template = rng.choice(
+        [
+            "{y}{d}有沒有使用{e}？",
+            "{y}{d}有沒有用{e}",
+            "{y}{d}是否使用{e}",
+            "{y}{d}{e}有用到嗎",
+        ]
+    )
+
+    return question(
+        "check_usage",
+        template.format(y=y, d=alias, e=e_alias),
+        "check_usage",
+        "answer_check_usage",
+        {"department": dept, "energy_name": energy, "year": year},
+        {
+            "year": year,
+            "sheet": RATIO_SHEET,
+            "demand_name": dept,
+            "supply_name_zh": energy,
+        },
+    )
+
+
+def top_energy_overall(rng):
+    year = rng.choice(YEARS)
+    y = year_text(rng, year)
+
+    templates = [
+        ("{y}使用量最多的能源", 1),
+        ("{y}能源使用排名", 5),
+        ("{y}使用量前五的能源", 5),
+        ("{y}能源使用前3名", 3),
+        ("{y}top 10能源", 10),
+        ("{y}最大宗的能源是什麼", 1),
+    ]
+    template, top_n = rng.choice(templates)
+
+    return question(
+        "top_energy_overall",
+        template.format(y=y),
+        "top_energy_overall",
+        "answer_top_energy_overall",
+        {"year": year, "top_n": top_n},
+        {"year": year, "sheet": RATIO_SHEET},
+    )
+
+
+def multi_year_top_energy(rng):
+    years = pick_years(rng, rng.choice([2, 2, 3]))
+    joined = rng.choice(["和", "跟"]).join(f"{y}年" for y in years)
+
+    template = rng.choice(
+        [
+            "{ys}分別使用最多的能源",
+            "{ys}各自最大的能源是什麼",
+            "{ys}使用最多的能源分別是？",
+        ]
+    )
+
+    return question(
+        "multi_year_top_energy",
+        template.format(ys=joined),
+        "top_energy_overall",
+        "answer_multi_year_top_energy",
+        {"years": years},
+    )
+
+
+def compare_years_overall(rng):
+    years = pick_years(rng)
+    joined = rng.choice(["和", "與", "、"]).join(f"{y}年" for y in years)
+
+    template = rng.choice(
+        [
+            "{ys}能源使用比較",
+            "{ys}的能源結構差異",
+            "比較{ys}的能源使用",
+            "{ys}能源差別在哪",
+        ]
+    )
+
+    return question(
+        "compare_years_overall",
+        template.format(ys=joined),
+        "compare_years_overall",
+        "answer_compare_years_overall",
+        {"years": years},
+    )
+
+
+def compare_department_across_years(rng):
+    years = pick_years(rng)
+    dept = rng.choice(DEPARTMENTS)
+    alias = rng.choice(DEPARTMENT_ALIASES[dept])
+    joined = rng.choice(["和", "與"]).join(f"{y}年" for y in years)
+
+    template = rng.choice(
+        [
+            "{ys}{d}主要能源差異",
+            "{ys}{d}能源使用比較",
+            "比較{ys}{d}的能源",
+            "{d}在{ys}的用能差在哪",
+        ]
+    )
+
+    return question(
+        "compare_department_across_years",
+        template.format(ys=joined, d=alias),
+        "compare_department_across_years",
+        "answer_compare_department_across_years",
+        {"department": dept, "years": years},
+    )
+
+
+def compare_departments_same_year(rng):
+    d1, d2 = rng.sample(DEPARTMENTS, 2)
+    a1 = rng.choice(DEPARTMENT_ALIASES[d1])
+    a2 = rng.choice(DEPARTMENT_ALIASES[d2])
+    year = rng.choice(YEARS)
+    y = year_text(rng, year)
+
+    template = rng.choice(
+        [
+            "{y}{a}和{b}能源比較",
+            "{y}{a}與{b}的能源使用差異",
+            "比較{y}{a}跟{b}的能源",
+        ]
+    )
+
+    return question(
+        "compare_departments_same_year",
+        template.format(y=y, a=a1, b=a2),
+        "compare_departments_same_year",
+        "answer_compare_departments_same_year",
+        {"departments": [d1, d2], "year": year},
+    )
+
+
+def semantic_search(rng):
+    """
+    細項部門 × 能源：沒有對應的查表意圖，走語意檢索
+    """
+    sector = rng.choice(SUB_SECTORS)
+    energy = rng.choice(SUB_SECTOR_ENERGIES)
+    year = rng.choice(YEARS)
+
+    template = rng.choice(
+        [
+            "{y}年{s}的{e}比例",
+            "{y}年{s}使用{e}的比例是多少",
+            "{s}{y}年{e}佔比",
+            "{y}年 {s} {e}",
+            "{en} used by {s} in {y}年",
+        ]
+    )
+
+    return question(
+        "semantic_search",
+        template.format(y=year, s=sector, e=energy, en=ENERGY_EN[energy]),
+        "semantic_search",
+        "answer_by_semantic_search",
+        {"year": year},
+        {
+            "year": year,
+            "sheet": RATIO_SHEET,
+            "demand_name": sector,
+            "supply_name_zh": energy,
+        },
+    )
+
+
+GENERATORS = [
+    top_energy_by_department,
+    top_department_by_energy,
+    check_usage,
+    top_energy_overall,
+    multi_year_top_energy,
+    compare_years_overall,
+    compare_department_across_years,
+    compare_departments_same_year,
+    semantic_search,
+]
+
+
+def general_questions():
+    return [
+        question("general", text, None, None, {}, use_rag=False)
+        for text in GENERAL_QUESTIONS
+    ]
+
+
+# =====================================================
+# main
+# =====================================================
+def generate(per_category: int = 45, seed: int = SEED):
+    rng = random.Random(seed)
+    seen = set()
+    questions = []
+
+    for generator in GENERATORS:
+        count = 0
+        attempts = 0
+
+        # 重複的問句跳過，最多嘗試 20 倍
+        while count < per_category and attempts < per_category * 20:
+            attempts += 1
+            q = generator(rng)
+
+            if q["question"] in seen:
+                continue
+
+            seen.add(q["question"])
+            questions.append(q)
+            count += 1
+
+    questions.extend(general_questions())
+
+    for n, q in enumerate(questions, start=1):
+        q["id"] = f"q{n:04d}"
+
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生能源問答 benchmark 問題集")
+    parser.add_argument("--per-category", type=int, default=45)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default=str(OUTPUT_PATH))
+    args = parser.parse_args()
+
+    questions = generate(args.per_category, args.seed)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for q in questions:
+            f.write(json.dumps(q, ensure_ascii=False) + "\n")
+
+    print(f"✅ 已產生 {len(questions)} 題：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+容量測試用的合成資料（固定亂數種子，可重現）
+
+以真實 yearly Excel 為範本，把需求部門（D 列）複製成 N 個「區域」，
+數值依區域權重 × 隨機擾動產生（0 的格子維持 0，稀疏程度與真實資料相同），
+輸出與正式資料相同格式的：
+  yearly/{year}_energy_ratio.xlsx : 總表 / 原始比例 / 總比例換算 / 出現情況(level…)
+  data/                           : {year}_energy_demand_supply.json、Demand_ratio_yearly.json、
+                                    hierarchy.json、consumption.json、supply_catalog.json、
+                                    energy_cost_mapping.json
+  energy.db                       : power_generation_logs（每 10 分鐘 × 發電類別 × 區域）
+  processed/ 、models/            : 給 RAG store / 索引、預測模型用的空目錄
+
+倍數（--scale）= D 列數與發電類別的區域數；×1 ≈ 真實資料量。
+
+用法：
+  python benchmarks/generate_synthetic_data.py --scale 10
+  python benchmarks/generate_synthetic_data.py --scale 100 --years 60 --skip power
+
+再用環境變數把既有腳本指向合成資料（印在執行結果最後）：
+  ENERGY_YEARLY_DIR=<out>/yearly ENERGY_DATA_DIR=<out>/data \\
+  RAG_PROCESSED_DIR=<out>/processed ENERGY_MODEL_DIR=<out>/models python etl.py
+"""
+
+import argparse
+import json
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+SRC_DATA_DIR = BACKEND_DIR.parent / "src" / "data"
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+from build_energy_rag_all_years import extract_year_from_filename  # noqa: E402
+from ratio_sheet import demand_supply_from_frame, norm_values, s54_from_frame  # noqa: E402
+from sheet_cache import read_sheets  # noqa: E402
+from utils.power_category import get_category  # noqa: E402
+
+TEMPLATE_DIR = BACKEND_DIR / "data" / "yearly"
+OUTPUT_ROOT = BENCH_DIR / "synthetic"
+
+SEED = 20240601
+
+TOTAL_SHEET = "總表"
+RAW_RATIO_SHEET = "原始比例"
+RATIO_SHEET = "總比例換算"
+PRESENCE_SHEET = "出現情況"
+LEVEL_SHEETS = ("出現情況(level1)", "出現情況(level 2)", "出現情況(level 3)")
+
+HEADER_ROWS = 3
+FIRST_VALUE_COL = 2
+
+# 總比例換算 = 原始比例 × 10（D1 的 S54 = 10）
+RATIO_SCALE = 10
+
+NOISE_SIGMA = 0.15
+POWER_INTERVAL_MINUTES = 10
+
+
+# =====================================================
+# 範本（真實 Excel）
+# =====================================================
+def load_template(excel_path):
+    sheets = read_sheets(
+        excel_path,
+        {name: {"header": None} for name in (TOTAL_SHEET, *LEVEL_SHEETS)},
+    )
+
+    total = sheets[TOTAL_SHEET]
+    body = total.iloc[HEADER_ROWS:]
+    codes = norm_values(body.iloc[:, 0])
+    keep = codes != ""
+
+    values = (
+        body.iloc[:, FIRST_VALUE_COL:]
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0)
+        .to_numpy(dtype=np.float64)
+    )
+
+    return {
+        "header": total.iloc[:HEADER_ROWS].reset_index(drop=True),
+        "codes": codes[keep].tolist(),
+        "names": norm_values(body.iloc[:, 1])[keep].tolist(),
+        "values": values[keep],
+        "levels": {
+            name: set(norm_values(df.iloc[HEADER_ROWS:, 0]).tolist())
+            for name, df in sheets.items()
+            if name in LEVEL_SHEETS
+        },
+    }
+
+
+def load_templates(template_dir):
+    templates = {}
+
+    for excel_path in sorted(template_dir.glob("*.xlsx")):
+        year = extract_year_from_filename(excel_path.name)
+
+        if year is not None:
+            templates[year] = load_template(excel_path)
+
+    if not templates:
+        raise FileNotFoundError(f"找不到範本 Excel：{template_dir}")
+
+    return dict(sorted(templates.items()))
+
+
+# =====================================================
+# 區域代碼 / 名稱
+# =====================================================
+def code_stride(codes):
+    # D2 → 區域 2 為 D102（範本最大 D 代碼 < 100 時）
+    top = max(int(c[1:]) for c in codes if c[1:].isdigit())
+    return 10 ** len(str(top))
+
+
+def region_code(code, region, stride):
+    if region == 0 or not code[1:].isdigit():
+        return code
+
+    return f"D{region * stride + int(code[1:])}"
+
+
+def region_name(name, region):
+    return name if region == 0 else f"{name}（區域{region + 1}）"
+
+
+def region_weights(scale, rng):
+    # 各區域占全國的比例（加總為 1，全國合計與範本同一量級）
+    return rng.dirichlet(np.full(scale, 2.0))
+
+
+# =====================================================
+# 一年的 Excel
+# =====================================================
+def build_year_sheets(template, year, scale, weights, stride):
+    """
+    回傳 {工作表名稱: DataFrame}（header=None 格式，與真實 Excel 相同）
+    """
+    rng = np.random.default_rng([SEED, year])
+
+    codes = template["codes"]
+    names = template["names"]
+    values = template["values"]
+
+    d1 = codes.index("D1") if "D1" in codes else None
+    rows = [i for i in range(len(codes)) if i != d1]
+    level1 = template["levels"].get(LEVEL_SHEETS[0], set())
+
+    out_codes, out_names, out_values, out_template_codes = [], [], [], []
+
+    for region in range(scale):
+        noise = rng.lognormal(0, NOISE_SIGMA, size=(len(rows), values.shape[1]))
+
+        out_codes += [region_code(codes[i], region, stride) for i in rows]
+        out_names += [region_name(names[i], region) for i in rows]
+        out_values.append(np.round(values[rows] * weights[region] * noise, 2))
+        out_template_codes += [codes[i] for i in rows]
+
+    out_values = np.vstack(out_values)
+    out_template_codes = np.asarray(out_template_codes, dtype=object)
+
+    # D1（能源消費合計）= 所有區域 level1 部門相加
+    if d1 is not None:
+        is_level1 = np.isin(out_template_codes, list(level1))
+        total_row = (
+            out_values[is_level1].sum(axis=0)
+            if is_level1.any()
+            else values[d1] * rng.lognormal(0, NOISE_SIGMA, values.shape[1])
+        )
+
+        out_codes.insert(0, "D1")
+        out_names.insert(0, names[d1])
+        out_values = np.vstack([np.round(total_row, 2), out_values])
+        out_template_codes = np.concatenate([["D1"], out_template_codes])
+
+    grand_total = out_values[0, -1] or 1
+
+    def frame(block):
+        body = pd.DataFrame(block, dtype=object)
+        body.insert(0, "name", out_names)
+        body.insert(0, "code", out_codes)
+        body.columns = range(body.shape[1])
+
+        return pd.concat([template["header"], body], ignore_index=True)
+
+    raw_ratio = np.round(out_values / grand_total, 3)
+    presence = (out_values > 0).astype(int)
+
+    sheets = {
+        TOTAL_SHEET: frame(out_values),
+        RAW_RATIO_SHEET: frame(raw_ratio),
+        RATIO_SHEET: frame(np.round(raw_ratio * RATIO_SCALE, 2)),
+        PRESENCE_SHEET: frame(presence),
+    }
+
+    # 出現情況(level…)：只留該層級的部門，且沒有 S54（總計）欄
+    presence_frame = sheets[PRESENCE_SHEET]
+
+    for level_sheet in LEVEL_SHEETS:
+        in_level = np.isin(out_template_codes, list(template["levels"].get(level_sheet, ())))
+        keep = np.concatenate([np.ones(HEADER_ROWS, dtype=bool), in_level])
+
+        sheets[level_sheet] = presence_frame.loc[keep].iloc[:, :-1].reset_index(drop=True)
+
+    return sheets
+
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, header=False, index=False)
+
+
+# =====================================================
+# data/ 下的 JSON
+# =====================================================
+def region_hierarchy(hierarchy, scale, stride):
+    def copy(nodes, region):
+        result = {}
+
+        for code, node in nodes.items():
+            node = dict(node)
+            node["name_zh"] = region_name(node.get("name_zh", ""), region)
+
+            if "children" in node:
+                node["children"] = copy(node["children"], region)
+
+            result[region_code(code, region, stride)] = node
+
+        return result
+
+    merged = {}
+    for region in range(scale):
+        merged.update(copy(hierarchy, region))
+
+    return merged
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+# =====================================================
+# 發電紀錄（power_generation_logs）
+# =====================================================
+def power_capacity():
+    """
+    依 power_full.json 的機組裝置容量，加總成 {發電類別: MW}
+    """
+    units = json.loads((SRC_DATA_DIR / "power_full.json").read_text(encoding="utf-8"))
+
+    capacity = {}
+
+    for plant in units.values():
+        for unit in plant.get("units", []):
+            category = get_category(unit.get("name", ""), unit.get("value"))["main"]
+            capacity[category] = capacity.get(category, 0) + float(unit.get("max") or 0)
+
+    return capacity
+
+
+def power_profile(category, hours, rng):
+    """
+    一天內的出力比例（0 ~ 1，儲能負載為負）
+    """
+    noise = rng.normal(0, 0.05, size=hours.shape)
+
+    if category.startswith("太陽能"):
+        return np.clip(np.sin(np.pi * (hours - 6) / 12), 0, None) * 0.7 + noise.clip(0)
+
+    if category.startswith("風力"):
+        return np.clip(0.3 + 0.15 * np.cos(np.pi * hours / 12) + noise, 0, 1)
+
+    if category.startswith("儲能負載"):
+        return -np.clip(np.sin(np.pi * (hours - 8) / 8), 0, None) * 0.5
+
+    # 火力 / 核能等：白天高、深夜低
+    return np.clip(0.65 + 0.2 * np.sin(np.pi * (hours - 9) / 12) + noise, 0, 1)
+
+
+def write_power_logs(db_path, scale, days, weights):
+    # 與正式環境相同的資料表結構
+    subprocess.run(
+        [sys.executable, str(BACKEND_DIR / "init_db.py")],
+        cwd=db_path.parent,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+    capacity = power_capacity()
+    slots = 24 * 60 // POWER_INTERVAL_MINUTES
+    hours = np.arange(slots) * POWER_INTERVAL_MINUTES / 60
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    conn = sqlite3.connect(db_path)
+    count = 0
+
+    try:
+        for day in range(days - 1, -1, -1):
+            date = today - timedelta(days=day)
+            rng = np.random.default_rng([SEED, date.toordinal()])
+
+            stamps = [
+                (date + timedelta(minutes=POWER_INTERVAL_MINUTES * n)).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+                for n in range(slots)
+            ]
+
+            rows = []
+
+            for region in range(scale):
+                for category, mw in capacity.items():
+                    name = category if region == 0 else f"{category}-區域{region + 1}"
+                    power = power_profile(category, hours, rng) * mw * weights[region] * scale
+
+                    rows.extend(zip(stamps, [name] * slots, np.round(power, 1).tolist()))
+
+            conn.executemany(
+                "INSERT INTO power_generation_logs (timestamp, category, power)"
+                " VALUES (?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            count += len(rows)
+
+    finally:
+        conn.close()
+
+    return count
+
+
+# =====================================================
+# main
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="產生容量測試用的合成資料")
+    parser.add_argument("--scale", type=int, default=10, help="D 列 / 發電類別的區域倍數")
+    parser.add_argument("--years", type=int, default=None, help="年數（預設同範本）")
+    parser.add_argument("--start-year", type=int, default=None)
+    parser.add_argument("--days", type=int, default=7, help="發電紀錄天數（到今天）")
+    parser.add_argument("--output-dir", type=Path, default=None)
+    parser.add_argument("--template-dir", type=Path, default=TEMPLATE_DIR)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["xlsx", "json", "power"])
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    templates = load_templates(args.template_dir)
+    template_years = list(templates)
+
+    start_year = args.start_year or template_years[0]
+    n_years = args.years or len(template_years)
+    years = list(range(start_year, start_year + n_years))
+
+    # 檔名年份只取 2~3 位數
+    if years[0] < 10 or years[-1] > 999:
+        parser.error("年份必須介於 10 ~ 999（民國年）")
+
+    out = args.output_dir or OUTPUT_ROOT / f"x{args.scale}"
+    yearly_dir = out / "yearly"
+    data_dir = out / "data"
+
+    for d in (yearly_dir, data_dir, out / "processed", out / "models"):
+        d.mkdir(parents=True, exist_ok=True)
+
+    all_codes = [c for t in templates.values() for c in t["codes"]]
+    stride = code_stride(all_codes)
+    weights = region_weights(args.scale, np.random.default_rng(SEED))
+
+    print(f"📦 ×{args.scale}：{len(years)} 年（{years[0]}~{years[-1]}）→ {out}")
+
+    # =========================
+    # 每年：Excel + demand/supply JSON
+    # =========================
+    demand_ratio = {}
+    consumption = {"unit": "toe", "base_year_type": "ROC"}
+    rows = 0
+
+    for year in years:
+
+        # 沒有同年範本的年份輪流使用既有範本
+        template = templates.get(year) or templates[
+            template_years[(year - years[0]) % len(template_years)]
+        ]
+
+        sheets = build_year_sheets(template, year, args.scale, weights, stride)
+        ratio = sheets[RATIO_SHEET]
+        rows = len(ratio) - HEADER_ROWS
+
+        if "xlsx" not in args.skip:
+            write_workbook(yearly_dir / f"{year}_energy_ratio.xlsx", sheets)
+
+        if "json" not in args.skip:
+            write_json(
+                data_dir / f"{year}_energy_demand_supply.json",
+                demand_supply_from_frame(ratio),
+            )
+            demand_ratio[str(year)] = s54_from_frame(ratio) or {}
+
+        total = pd.to_numeric(sheets[TOTAL_SHEET].iloc[HEADER_ROWS, -1], errors="coerce")
+        consumption[str(year)] = {"year": year + 1911, "value": float(total)}
+
+        print(f"  ✅ {year}：{rows} 個部門列")
+
+    if "json" not in args.skip:
+        write_json(data_dir / "Demand_ratio_yearly.json", demand_ratio)
+        write_json(data_dir / "consumption.json", consumption)
+
+        hierarchy = json.loads((SRC_DATA_DIR / "hierarchy.json").read_text(encoding="utf-8"))
+        write_json(data_dir / "hierarchy.json", region_hierarchy(hierarchy, args.scale, stride))
+
+        for name in ("supply_catalog.json", "energy_cost_mapping.json"):
+            shutil.copyfile(SRC_DATA_DIR / name, data_dir / name)
+
+    # =========================
+    # 發電紀錄
+    # =========================
+    if "power" not in args.skip:
+        db_path = out / "energy.db"
+        db_path.unlink(missing_ok=True)
+
+        count = write_power_logs(db_path, args.scale, args.days, weights)
+        print(f"  ⚡ power_generation_logs：{count} 筆（{args.days} 天）")
+
+    print(f"\n🎉 完成（{time.perf_counter() - started:.1f}s）")
+    print("\n把既有腳本指向合成資料：")
+    print(
+        f"  ENERGY_YEARLY_DIR={yearly_dir} ENERGY_DATA_DIR={data_dir} "
+        f"RAG_PROCESSED_DIR={out / 'processed'} ENERGY_MODEL_DIR={out / 'models'}"
+    )
+    print("  python etl.py / build_index.py / ../tools/energy_sphere_layout.py")
+    print(f"  daily_stats / daily-trend 用的 energy.db：在 {out} 下執行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+LLM 路徑壓力測試（/chat、/ask_pdf、/ask_table、/contact）
+
+對執行中的後端同時送出大量請求，量測每個端點的吞吐量與延遲 p50 / p95 / p99。
+後端以 LLM_BACKEND=replay 或 stub 啟動就不會連到 OpenAI，可在離線機器上跑：
+
+  # 1. 連網時錄製一次（request / response 存到 processed/llm_recordings.jsonl）
+  LLM_BACKEND=record python app.py
+  python benchmarks/load_test_llm.py --requests 20 --concurrency 1
+
+  # 2. 離線回放（延遲 = 錄製時的實際耗時，或 LLM_REPLAY_LATENCY_MS 指定）
+  LLM_BACKEND=replay CONTACT_SEND_EMAIL=false python app.py
+  python benchmarks/load_test_llm.py --requests 2000 --concurrency 64
+
+/contact 會寫入 feedback 資料表，建議對測試用的 energy.db 執行。
+
+用法：
+  python benchmarks/load_test_llm.py --endpoints chat ask_table --concurrency 32
+  python benchmarks/load_test_llm.py --stream --output report.json
+"""
+
+import argparse
+import io
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+QUESTIONS_PATH = BENCH_DIR / "energy_questions.jsonl"
+
+SEED = 20240601
+
+ENDPOINTS = ("chat", "ask_pdf", "ask_table", "contact")
+
+# 一般問題（走 web search / 語意快取）
+GENERAL_QUESTIONS = (
+    "什麼是綠電",
+    "太陽光電原理",
+    "台灣的再生能源目標是什麼",
+    "What is carbon neutrality?",
+    "離岸風電有哪些挑戰",
+)
+
+TABLE_CSV = "年份,燃煤,燃氣,太陽能\n110,36.0,37.2,4.2\n111,34.5,38.6,5.1\n112,33.2,39.6,6.3\n"
+
+PDF_TEXT = "Energy report: solar 6.3%, wind 2.1%, LNG 39.6%."
+
+
+# =====================================================
+# 測試資料
+# =====================================================
+def load_questions(path, limit=200):
+    if not Path(path).exists():
+        return list(GENERAL_QUESTIONS)
+
+    with open(path, encoding="utf-8") as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()]
+
+    return questions[:limit] + list(GENERAL_QUESTIONS)
+
+
+def minimal_pdf(text):
+    """
+    只有一頁文字的最小 PDF（pypdf 可讀）
+    """
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+        b" /Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+
+    offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (n, body))
+
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+
+    return out.getvalue()
+
+
+# =====================================================
+# 單一請求
+# =====================================================
+def make_request(endpoint, n, questions, stream, pdf_bytes):
+    """
+    回傳 (method, path, kwargs)
+    """
+    question = questions[n % len(questions)]
+
+    if endpoint == "chat":
+        return (
+            "/chat",
+            {
+                "json": {
+                    "question": question,
+                    "session_id": f"load-{n}",
+                    "stream": str(stream).lower(),
+                },
+                "stream": stream,
+            },
+        )
+
+    if endpoint == "ask_pdf":
+        return (
+            "/ask_pdf",
+            {
+                "data": {"question": question},
+                "files": {"file": ("report.pdf", pdf_bytes, "application/pdf")},
+            },
+        )
+
+    if endpoint == "ask_table":
+        return (
+            "/ask_table",
+            {
+                "data": {"question": question},
+                "files": {"file": ("table.csv", TABLE_CSV.encode("utf-8"), "text/csv")},
+            },
+        )
+
+    return (
+        "/contact",
+        {
+            "json": {
+                "name": f"load-{n}",
+                "email": "",
+                "phone": "",
+                "feeling": "滿意",
+                "message": question,
+            }
+        },
+    )
+
+
+def send(session, base_url, endpoint, path, kwargs, timeout):
+    """
+    回傳 (endpoint, ok, 總耗時 ms, 第一個 byte ms)
+    """
+    started = time.perf_counter()
+    first_byte = None
+
+    try:
+        resp = session.post(base_url + path, timeout=timeout, **kwargs)
+
+        if kwargs.get("stream"):
+            for chunk in resp.iter_content(chunk_size=None):
+                if first_byte is None and chunk:
+                    first_byte = time.perf_counter()
+        else:
+            first_byte = time.perf_counter()
+            resp.content
+
+        ok = resp.status_code < 500
+
+    except requests.RequestException:
+        ok = False
+
+    elapsed = (time.perf_counter() - started) * 1000
+    ttfb = ((first_byte or time.perf_counter()) - started) * 1000
+
+    return endpoint, ok, elapsed, ttfb
+
+
+# =====================================================
+# 報表
+# =====================================================
+def percentiles(values):
+    if not values:
+        return {}
+
+    arr = np.asarray(values)
+
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p95": round(float(np.percentile(arr, 95)), 1),
+        "p99": round(float(np.percentile(arr, 99)), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+def summarize(results, wall):
+    by_endpoint = defaultdict(list)
+
+    for endpoint, ok, elapsed, ttfb in results:
+        by_endpoint[endpoint].append((ok, elapsed, ttfb))
+
+    report = {}
+
+    for endpoint, rows in sorted(by_endpoint.items()):
+        report[endpoint] = {
+            "requests": len(rows),
+            "errors": sum(not ok for ok, _, _ in rows),
+            "rps": round(len(rows) / wall, 1) if wall else 0,
+            "latency_ms": percentiles([e for _, e, _ in rows]),
+            "ttfb_ms": percentiles([t for _, _, t in rows]),
+        }
+
+    return report
+
+
+def print_report(report, wall, concurrency):
+    print(f"\n⏱️ {wall:.1f}s，concurrency = {concurrency}\n")
+
+    header = f"{'endpoint':<10}{'req':>7}{'err':>6}{'rps':>8}   latency p50 / p95 / p99 (ms)   ttfb p50"
+    print(header)
+    print("-" * len(header))
+
+    for endpoint, r in report.items():
+        lat = r["latency_ms"]
+        print(
+            f"{endpoint:<10}{r['requests']:>7}{r['errors']:>6}{r['rps']:>8}"
+            f"   {lat['p50']:>8} / {lat['p95']:>8} / {lat['p99']:>8}"
+            f"   {r['ttfb_ms']['p50']:>8}"
+        )
+
+
+# =====================================================
+# main
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="LLM 路徑壓力測試")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=200, help="每個端點的請求數")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--stream", action="store_true", help="/chat 使用 SSE 串流")
+    parser.add_argument("--questions", default=str(QUESTIONS_PATH))
+    parser.add_argument("--output", default=None, help="另存 JSON 報表")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    random.Random(SEED).shuffle(questions)
+
+    pdf_bytes = minimal_pdf(PDF_TEXT)
+
+    jobs = [
+        (endpoint, *make_request(endpoint, n, questions, args.stream, pdf_bytes))
+        for n in range(args.requests)
+        for endpoint in args.endpoints
+    ]
+
+    base_url = args.base_url.rstrip("/")
+    session = requests.Session()
+    session.mount(
+        "http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    )
+
+    print(f"🚀 {len(jobs)} 個請求 → {base_url}（{' / '.join(args.endpoints)}）")
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(
+            pool.map(
+                lambda job: send(session, base_url, *job, args.timeout),
+                jobs,
+            )
+        )
+
+    wall = time.perf_counter() - started
+    report = summarize(results, wall)
+
+    print_report(report, wall, args.concurrency)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"concurrency": args.concurrency, "wall_s": round(wall, 2), "endpoints": report},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+能源問答 routing / retrieval benchmark（離線）
+
+對 benchmarks/energy_questions.jsonl 的每一題量測：
+  - parse_query 的 use_rag 判斷是否正確
+  - parse_query 的意圖準確率
+  - resolve_answer_route 選到的回答函式與參數
+  - search_energy_records 的 recall@k / hit@k（有標註 relevant 的題目）
+  - 各階段延遲 p50 / p95
+
+只讀取 processed/ 下已建好的 store / FAISS / lexical 索引，
+embedding 模型從本機快取載入，不連網路。
+
+用法：
+  python benchmarks/run_energy_benchmark.py
+  python benchmarks/run_energy_benchmark.py --k 5 10 20 --output report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+# 不連網路：embedding 模型只從本機快取讀取
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+QUESTIONS_PATH = BENCH_DIR / "energy_questions.jsonl"
+
+STAGES = (
+    "parse",
+    "route",
+    "handler",
+    "search.lexical",
+    "search.embed",
+    "search.faiss",
+    "search.total",
+)
+
+
+def load_questions(path, limit=None):
+    with open(path, encoding="utf-8") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+
+    return questions[:limit] if limit else questions
+
+
+def timed(timings, stage, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[stage].append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def normalize_param(value):
+    # tuple / list 一律當作 list 比較
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def params_match(expected, actual):
+    return all(
+        normalize_param(actual.get(key)) == normalize_param(value)
+        for key, value in expected.items()
+    )
+
+
+# =====================================================
+# 相關 records（依欄位條件，索引重建後仍然有效）
+# =====================================================
+class RelevantIds:
+    def __init__(self, store):
+        self.store = store
+        self._cache = {}
+
+    def __call__(self, conditions):
+        key = tuple(sorted(conditions.items()))
+
+        if key not in self._cache:
+            mask = np.ones(len(self.store), dtype=bool)
+            for field, value in conditions.items():
+                mask &= self.store.equals(field, value)
+            self._cache[key] = set(self.store.where(mask).tolist())
+
+        return self._cache[key]
+
+
+def is_relevant(record, conditions):
+    return all(record.get(field) == value for field, value in conditions.items())
+
+
+# =====================================================
+# benchmark
+# =====================================================
+def run(questions, ks):
+    import energy_chat_router as router
+    from rag_index import search_index
+
+    store = router.store
+    relevant_ids = RelevantIds(store)
+    max_k = max(ks)
+
+    timings = defaultdict(list)
+    by_category = defaultdict(lambda: defaultdict(list))
+    failures = []
+
+    for q in questions:
+        text = q["question"]
+        cat = by_category[q["category"]]
+
+        # -------------------------------------------------
+        # routing
+        # -------------------------------------------------
+        # 解析結果有快取，量測的是第一次解析
+        router.query_parser.parse.cache_clear()
+        parsed = timed(timings, "parse", router.parse_query, text)
+        cat["use_rag"].append(parsed.use_rag == q["use_rag"])
+
+        if q["intent"] is None:
+            continue
+
+        intent = parsed.intent
+        cat["intent"].append(intent == q["intent"])
+
+        handler, kwargs = timed(timings, "route", router.resolve_answer_route, parsed)
+        route_ok = handler.__name__ == q["handler"] and params_match(
+            q["params"], kwargs
+        )
+        cat["route"].append(route_ok)
+
+        if intent != q["intent"] or not route_ok:
+            failures.append(
+                {
+                    "id": q["id"],
+                    "question": text,
+                    "expected": [q["intent"], q["handler"], q["params"]],
+                    "actual": [intent, handler.__name__, kwargs],
+                }
+            )
+
+        # 不經過答案快取
+        timed(timings, "handler", handler, **kwargs)
+
+        # -------------------------------------------------
+        # retrieval（年份用標註值，只量測檢索本身）
+        # -------------------------------------------------
+        if not q["relevant"]:
+            continue
+
+        n_relevant = len(relevant_ids(q["relevant"]))
+        if not n_relevant:
+            continue
+
+        year = q["relevant"].get("year")
+        year_ids = router.YEAR_IDS.get(year) if year is not None else None
+        selector = router.YEAR_SELECTORS.get(year) if year is not None else None
+
+        timed(
+            timings,
+            "search.lexical",
+            router.lexical_index.search,
+            text,
+            k=max_k,
+            ids=year_ids,
+        )
+        q_emb = timed(timings, "search.embed", router.embedder.encode, [text])
+        timed(
+            timings,
+            "search.faiss",
+            search_index,
+            router.index,
+            q_emb,
+            max_k,
+            selector=selector,
+        )
+
+        results = timed(
+            timings,
+            "search.total",
+            router.search_energy_records,
+            text,
+            k=max_k,
+            year=year,
+        )
+
+        hits = [is_relevant(r, q["relevant"]) for r in results]
+
+        for k in ks:
+            found = sum(hits[:k])
+            cat[f"recall@{k}"].append(found / min(k, n_relevant))
+            cat[f"hit@{k}"].append(found > 0)
+
+        cat["fast_path"].append(
+            bool(results) and all(r.get("match") == "lexical" for r in results)
+        )
+
+    return timings, by_category, failures, router
+
+
+# =====================================================
+# 報表
+# =====================================================
+def summarize_metrics(by_category):
+    summary = {}
+    overall = defaultdict(list)
+
+    for category, metrics in sorted(by_category.items()):
+        summary[category] = {}
+
+        for name, values in metrics.items():
+            summary[category][name] = round(float(np.mean(values)), 4)
+            overall[name].extend(values)
+
+        summary[category]["questions"] = len(metrics["use_rag"])
+
+    summary["overall"] = {
+        name: round(float(np.mean(values)), 4) for name, values in overall.items()
+    }
+    summary["overall"]["questions"] = len(overall["use_rag"])
+
+    return summary
+
+
+def summarize_latency(timings):
+    result = {}
+
+    for stage in STAGES:
+        values = timings.get(stage)
+        if not values:
+            continue
+
+        arr = np.asarray(values)
+        result[stage] = {
+            "n": len(arr),
+            "p50_ms": round(float(np.percentile(arr, 50)), 3),
+            "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "mean_ms": round(float(arr.mean()), 3),
+        }
+
+    return result
+
+
+def print_report(report, ks):
+    columns = ["use_rag", "intent", "route"]
+    columns += [f"recall@{k}" for k in ks] + [f"hit@{max(ks)}", "fast_path"]
+
+    print("\n===== 準確率 =====")
+    print(f"{'category':34s}{'n':>5s}" + "".join(f"{c:>12s}" for c in columns))
+
+    for category, metrics in report["metrics"].items():
+        row = f"{category:34s}{metrics['questions']:>5d}"
+        for c in columns:
+            v = metrics.get(c)
+            row += f"{v:>12.3f}" if v is not None else f"{'-':>12s}"
+        print(row)
+
+    print("\n===== 延遲（ms） =====")
+    print(f"{'stage':20s}{'n':>6s}{'p50':>10s}{'p95':>10s}{'mean':>10s}")
+
+    for stage, t in report["latency"].items():
+        print(
+            f"{stage:20s}{t['n']:>6d}{t['p50_ms']:>10.3f}"
+            f"{t['p95_ms']:>10.3f}{t['mean_ms']:>10.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="能源問答 routing / retrieval benchmark"
+    )
+    parser.add_argument("--questions", default=str(QUESTIONS_PATH))
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default=None, help="另存 JSON 報表")
+    parser.add_argument("--show-failures", type=int, default=10)
+    args = parser.parse_args()
+
+    ks = sorted(set(args.k))
+    questions = load_questions(args.questions, args.limit)
+
+    print(f"共 {len(questions)} 題，載入索引中...")
+
+    timings, by_category, failures, router = run(questions, ks)
+
+    report = {
+        "questions": len(questions),
+        "data_version": router.DATA_VERSION,
+        "embed_backend": router.embedder.backend,
+        "index_type": type(router.index).__name__,
+        "metrics": summarize_metrics(by_category),
+        "latency": summarize_latency(timings),
+        "failures": failures,
+    }
+
+    print_report(report, ks)
+
+    if failures and args.show_failures:
+        print(
+            f"\n===== 判斷錯誤（{len(failures)} 題，列出前 {args.show_failures}） ====="
+        )
+        for f in failures[: args.show_failures]:
+            print(json.dumps(f, ensure_ascii=False))
+
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"\n報表已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
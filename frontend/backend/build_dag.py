@@ -0,0 +1,443 @@
+"""
+資料更新 DAG：新的 / 修改過的 yearly Excel → 依相依順序只重跑需要的步驟
+
+每個步驟宣告 inputs / outputs（相對 frontend/ 的 glob），
+步驟間的相依由「A 的 output 是 B 的 input」自動推得。
+inputs 的內容 hash 與上次成功時相同、outputs 也沒被動過，就略過。
+互不相依的步驟平行執行，log 寫在 processed/build_logs/<步驟>.log。
+
+用法：
+  python build_dag.py                  # 全部（只跑過期的）
+  python build_dag.py rag_index        # 只跑 rag_index 及其上游
+  python build_dag.py --dry-run        # 只列出會跑哪些步驟
+  python build_dag.py --mark-done      # 把目前狀態記為最新（第一次導入時用）
+  python build_dag.py --watch          # 監看 data/yearly，有變動就自動更新
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import xxhash
+
+from ingest_manifest import file_hash
+
+BASE_DIR = Path(__file__).resolve().parent
+FRONTEND_DIR = BASE_DIR.parent
+
+YEARLY_DIR = BASE_DIR / "data" / "yearly"
+STATE_PATH = BASE_DIR / "processed" / "build_state.json"
+LOG_DIR = BASE_DIR / "processed" / "build_logs"
+
+BUILD_JOBS = int(os.getenv("BUILD_DAG_JOBS", "0")) or os.cpu_count() or 1
+
+# =====================================================
+# 資料（相對 frontend/ 的 glob）
+# =====================================================
+YEARLY = "backend/data/yearly/*.xlsx"
+SUPPLY_CATALOG = "backend/data/supply_catalog.json"
+
+DEMAND_SUPPLY = "src/data/*_energy_demand_supply.json"
+DEMAND_RATIO = "src/data/Demand_ratio_yearly.json"
+DISTANCE = "src/data/*_energy_euclidean_distance.json"
+SUPPLY_LAYOUT = "src/data/supply_layout_*.json"
+DEMAND_LAYOUT = "src/data/demand_layout_*.json"
+COST_MAP = "src/data/energy_cost_mapping.json"
+CONSUMPTION = "src/data/consumption.json"
+HISTORICAL_COST = "src/data/historical_cost_pressure.json"
+PREDICTED_COST = "src/data/predicted_cost_pressure.json"
+
+# CURRENT 內容 = 版本（內容 hash），舊版本目錄的增減不影響判斷
+RAG_STORE = "backend/processed/energy_rag_all_years_store/CURRENT"
+RAG_INDEX = "backend/processed/energy_rag_all_years.index"
+RAG_LEXICAL = "backend/processed/energy_rag_all_years_lexical/CURRENT"
+
+# app.init_data 找不到這些 pickle 就會重新訓練 Prophet
+MODEL_PICKLES = ("models.pkl", "series.pkl", "accuracy.pkl", "evaluation.pkl")
+
+ETL_SOURCES = ("backend/etl.py", "backend/ratio_sheet.py")
+
+
+# =====================================================
+# 步驟
+# =====================================================
+@dataclass(frozen=True)
+class Step:
+    name: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...] = ()
+    # 相對 frontend/ 的 python 腳本 + 參數；或用 action 在本 process 執行
+    command: Tuple[str, ...] = ()
+    action: Optional[Callable[[], None]] = None
+    # 腳本自己也會判斷「已是最新」而略過：DAG 決定重跑時加上這些參數
+    force_args: Tuple[str, ...] = ()
+    # 腳本自己的變動偵測（例如 ingest manifest）涵蓋全部 inputs：
+    # 只有 inputs 變動時照常增量執行，不加 force_args
+    incremental: bool = False
+
+
+def clear_model_pickles():
+    for name in MODEL_PICKLES:
+        (BASE_DIR / "models" / name).unlink(missing_ok=True)
+
+
+STEPS = (
+    Step(
+        "demand_supply",
+        inputs=(YEARLY, *ETL_SOURCES),
+        outputs=(DEMAND_SUPPLY, DEMAND_RATIO),
+        command=("backend/etl.py", "--only", "demand_supply", "s54"),
+    ),
+    Step(
+        "distance",
+        inputs=(YEARLY, *ETL_SOURCES, "src/scripts/build_distance.py"),
+        outputs=(DISTANCE,),
+        command=("backend/etl.py", "--only", "distance"),
+    ),
+    Step(
+        "layout",
+        inputs=(DISTANCE, DEMAND_SUPPLY, "tools/energy_sphere_layout.py"),
+        outputs=(SUPPLY_LAYOUT, DEMAND_LAYOUT),
+        command=("tools/energy_sphere_layout.py",),
+    ),
+    Step(
+        "rag_store",
+        inputs=(
+            YEARLY,
+            SUPPLY_CATALOG,
+            "backend/build_energy_rag_all_years.py",
+            "backend/build_energy_rag_core.py",
+            "backend/ratio_sheet.py",
+        ),
+        outputs=(RAG_STORE,),
+        command=("backend/build_energy_rag_all_years.py",),
+        force_args=("--full",),
+        incremental=True,
+    ),
+    Step(
+        "rag_index",
+        inputs=(RAG_STORE, "backend/build_index.py"),
+        outputs=(RAG_INDEX, RAG_LEXICAL),
+        command=("backend/build_index.py",),
+        force_args=("--force",),
+    ),
+    Step(
+        "cost_pressure",
+        inputs=(DEMAND_SUPPLY, COST_MAP, "backend/scripts/build_cost_pressure.py"),
+        outputs=(HISTORICAL_COST,),
+        command=("backend/scripts/build_cost_pressure.py",),
+    ),
+    Step(
+        "predict_cost_pressure",
+        inputs=(HISTORICAL_COST, "backend/scripts/predict_cost_pressure.py"),
+        outputs=(PREDICTED_COST,),
+        command=("backend/scripts/predict_cost_pressure.py",),
+    ),
+    Step(
+        "forecast_models",
+        inputs=(DEMAND_SUPPLY, CONSUMPTION),
+        action=clear_model_pickles,
+    ),
+)
+
+
+def dependencies(steps):
+    """
+    {步驟: 上游步驟}：A 的 output 出現在 B 的 inputs → B 依賴 A
+    """
+    return {
+        step.name: [
+            other.name
+            for other in steps
+            if other is not step and set(other.outputs) & set(step.inputs)
+        ]
+        for step in steps
+    }
+
+
+def select_steps(targets):
+    """
+    targets 及其所有上游（保持 STEPS 的順序）
+    """
+    if not targets:
+        return list(STEPS)
+
+    deps = dependencies(STEPS)
+    wanted = set()
+    stack = list(targets)
+
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(deps[name])
+
+    return [step for step in STEPS if step.name in wanted]
+
+
+# =====================================================
+# 內容 hash
+# =====================================================
+def digest(patterns):
+    """
+    patterns 展開後所有檔案（目錄則遞迴）的 路徑 + 內容 hash
+    """
+    h = xxhash.xxh3_128()
+
+    for pattern in patterns:
+        h.update(pattern.encode("utf-8"))
+
+        for path in sorted(FRONTEND_DIR.glob(pattern)):
+            files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+
+            for f in files:
+                h.update(f.relative_to(FRONTEND_DIR).as_posix().encode("utf-8"))
+                h.update(file_hash(f).encode("ascii"))
+
+    return h.hexdigest()
+
+
+def load_state():
+    if not STATE_PATH.exists():
+        return {}
+
+    return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+
+
+def save_state(state):
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = STATE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(STATE_PATH)
+
+
+def is_up_to_date(step, state, inputs):
+    done = state.get(step.name)
+
+    return (
+        done is not None
+        and done["inputs"] == inputs
+        and done["outputs"] == digest(step.outputs)
+    )
+
+
+def needs_force(step, state, force=False):
+    """
+    重跑時是否要加 force_args
+
+    incremental 的步驟只有在 inputs 變動（輸出沒被動過）時交給腳本自己判斷；
+    --force、第一次執行、輸出被改過或刪掉時都要強制重建
+    """
+    if not step.force_args:
+        return False
+
+    if force or not step.incremental:
+        return True
+
+    done = state.get(step.name)
+
+    return done is None or done["outputs"] != digest(step.outputs)
+
+
+def record(state, step, inputs):
+    state[step.name] = {
+        "inputs": inputs,
+        "outputs": digest(step.outputs),
+        "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# =====================================================
+# 執行
+# =====================================================
+def run_step(step, force=False):
+    """
+    回傳 (成功與否, 秒數)；force = 加上 step.force_args
+    """
+    started = time.perf_counter()
+
+    if step.action is not None:
+        step.action()
+        return True, time.perf_counter() - started
+
+    script = FRONTEND_DIR / step.command[0]
+
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    with open(LOG_DIR / f"{step.name}.log", "w", encoding="utf-8") as log:
+        proc = subprocess.run(
+            [
+                sys.executable,
+                str(script),
+                *step.command[1:],
+                *(step.force_args if force else ()),
+            ],
+            cwd=script.parent,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+        )
+
+    return proc.returncode == 0, time.perf_counter() - started
+
+
+def run_dag(steps, jobs=BUILD_JOBS, force=False, dry_run=False, mark_done=False):
+    """
+    回傳 {步驟: ran / skipped / failed / blocked / would_run / marked}
+    """
+    deps = dependencies(steps)
+    state = load_state()
+
+    status = {}
+    pending = list(steps)
+    running = {}
+
+    with ThreadPoolExecutor(max(1, jobs)) as pool:
+
+        while pending or running:
+
+            # 上游都結束的步驟：判斷要略過還是送出執行
+            progressed = True
+            while progressed:
+                progressed = False
+
+                for step in list(pending):
+                    upstream = [status.get(d) for d in deps[step.name]]
+
+                    if None in upstream:
+                        continue
+
+                    pending.remove(step)
+                    progressed = True
+
+                    if any(s in ("failed", "blocked") for s in upstream):
+                        status[step.name] = "blocked"
+                        print(f"⛔ {step.name}：上游失敗，略過")
+                        continue
+
+                    inputs = digest(step.inputs)
+
+                    if mark_done:
+                        record(state, step, inputs)
+                        status[step.name] = "marked"
+                        print(f"📌 {step.name}：記為最新")
+                        continue
+
+                    if dry_run and "would_run" in upstream:
+                        status[step.name] = "would_run"
+                        print(f"🔸 {step.name}：上游會更新，可能需要重跑")
+                        continue
+
+                    if not force and is_up_to_date(step, state, inputs):
+                        status[step.name] = "skipped"
+                        print(f"✔️ {step.name}：已是最新")
+                        continue
+
+                    if dry_run:
+                        status[step.name] = "would_run"
+                        print(f"🔸 {step.name}：需要重跑")
+                        continue
+
+                    rerun = needs_force(step, state, force)
+                    flags = f"（{' '.join(step.force_args)}）" if rerun else ""
+
+                    print(f"▶️ {step.name} 開始{flags}")
+                    running[pool.submit(run_step, step, rerun)] = (step, inputs)
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                step, inputs = running.pop(future)
+
+                try:
+                    ok, seconds = future.result()
+                except Exception as e:
+                    print(f"❌ {step.name}：{e}")
+                    ok, seconds = False, 0
+
+                if ok:
+                    record(state, step, inputs)
+                    save_state(state)
+                    status[step.name] = "ran"
+                    print(f"✅ {step.name} 完成（{seconds:.1f}s）")
+                else:
+                    status[step.name] = "failed"
+                    print(f"❌ {step.name} 失敗，log：{LOG_DIR / (step.name + '.log')}")
+
+    if mark_done:
+        save_state(state)
+
+    return status
+
+
+# =====================================================
+# 監看 data/yearly
+# =====================================================
+def is_workbook(change, path):
+    name = Path(path).name
+
+    # Excel 開啟時的 ~$ 暫存檔不算
+    return name.endswith(".xlsx") and not name.startswith("~$")
+
+
+def watch(steps, jobs):
+    from watchfiles import watch as watch_files
+
+    print(f"👀 監看 {YEARLY_DIR}（Ctrl+C 結束）")
+
+    for changes in watch_files(YEARLY_DIR, watch_filter=is_workbook, debounce=2000):
+
+        names = sorted({Path(path).name for _, path in changes})
+        print(f"\n📂 偵測到變動：{', '.join(names)}")
+
+        run_dag(steps, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="資料更新 DAG")
+    parser.add_argument("targets", nargs="*", help="步驟名稱（預設全部）")
+    parser.add_argument("--jobs", type=int, default=BUILD_JOBS)
+    parser.add_argument("--force", action="store_true", help="不看 hash，全部重跑")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--mark-done", action="store_true")
+    parser.add_argument("--watch", action="store_true")
+    parser.add_argument("--list", action="store_true", help="列出步驟與相依")
+    args = parser.parse_args()
+
+    unknown = set(args.targets) - {step.name for step in STEPS}
+    if unknown:
+        parser.error(f"沒有這個步驟：{', '.join(sorted(unknown))}")
+
+    steps = select_steps(args.targets)
+
+    if args.list:
+        deps = dependencies(steps)
+        for step in steps:
+            after = ", ".join(deps[step.name]) or "-"
+            print(f"{step.name:<24} ← {after}")
+        return
+
+    started = time.perf_counter()
+    status = run_dag(steps, args.jobs, args.force, args.dry_run, args.mark_done)
+
+    print(f"\n🎉 完成（{time.perf_counter() - started:.1f}s）")
+
+    if args.watch:
+        watch(steps, args.jobs)
+    elif "failed" in status.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
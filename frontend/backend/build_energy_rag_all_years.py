@@ -1,10 +1,21 @@
+import argparse
+import os
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import pandas as pd
-
-from build_energy_rag_core import parse_ratio_like_sheet
+from build_energy_rag_core import parse_ratio_like_frame
+from ingest_manifest import (
+    changed_years,
+    diff_workbooks,
+    file_hash,
+    ingest_signature,
+    load_manifest,
+    save_manifest,
+)
+from rag_store import RecordStore, write_store
+from sheet_cache import read_sheet, read_sheets
 
 
 # =========================
@@ -12,8 +23,12 @@ from build_energy_rag_core import parse_ratio_like_sheet
 # =========================
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
-YEARLY_DIR = DATA_DIR / "yearly"
-PROCESSED_DIR = BASE_DIR / "processed"
+YEARLY_DIR = Path(os.getenv("ENERGY_YEARLY_DIR", DATA_DIR / "yearly"))
+PROCESSED_DIR = Path(os.getenv("RAG_PROCESSED_DIR", BASE_DIR / "processed"))
+
+OUTPUT_STORE = PROCESSED_DIR / "energy_rag_all_years_store"
+PREVIEW_PATH = PROCESSED_DIR / "energy_rag_all_years_preview.json"
+SUPPLY_CATALOG_PATH = DATA_DIR / "supply_catalog.json"
 
 
 RATIO_SHEETS = [
@@ -24,6 +39,11 @@ RATIO_SHEETS = [
     "出現情況(level 3)",
 ]
 
+TOTAL_SHEET = "總表"
+
+# 同時處理幾個 Excel（0 = CPU 核心數）
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
 
 # =========================
 # 年份解析
@@ -33,12 +53,36 @@ def extract_year_from_filename(filename: str):
     return int(m.group(1)) if m else None
 
 
+# =========================
+# 一次開啟 Excel，讀出所有需要的工作表
+# =========================
+def load_workbook_sheets(excel_path):
+    """
+    回傳 {工作表名稱: DataFrame}，缺少的工作表不會出現在結果中
+
+    總表用第一列當欄名，比例類工作表不設 header
+    """
+    # 工作表快取：Excel 沒變就不再走 openpyxl
+    return read_sheets(
+        excel_path,
+        {
+            TOTAL_SHEET: {},
+            **{sheet_name: {"header": None} for sheet_name in RATIO_SHEETS},
+        },
+    )
+
+
 # =========================
 # TOTAL MAP（安全版）
 # =========================
 def build_total_map(excel_path):
 
-    df = pd.read_excel(excel_path, sheet_name="總表")
+    df = read_sheet(excel_path, TOTAL_SHEET)
+
+    return build_total_map_from_frame(df)
+
+
+def build_total_map_from_frame(df):
 
     # 🔥 找 D1（安全版）
     d1_rows = df[df.iloc[:, 0].astype(str).str.contains("D1", na=False)]
@@ -65,12 +109,160 @@ def build_total_map(excel_path):
     return total_map
 
 
+# =========================
+# 單一 Excel → records（在 worker process 執行）
+# =========================
+def ingest_workbook(excel_path, year, supply_catalog_map):
+    """
+    回傳 (records, logs)；log 交給主程式依年份順序印出，避免多個 worker 輸出交錯
+    """
+    logs = [f"📘 處理 {excel_path.name}（{year}）"]
+
+    try:
+        sheets = load_workbook_sheets(excel_path)
+    except Exception as e:
+        logs.append(f"❌ 讀取失敗: {e}")
+        return [], logs
+
+    records, sheet_logs = ingest_sheets(sheets, year, supply_catalog_map)
+
+    return records, logs + sheet_logs
+
+
+def ingest_sheets(sheets, year, supply_catalog_map):
+    """
+    load_workbook_sheets 的結果 → (records, logs)
+    """
+    logs = []
+    records = []
+
+    # =========================
+    # total map
+    # =========================
+    try:
+        total_map = build_total_map_from_frame(sheets[TOTAL_SHEET])
+    except Exception as e:
+        logs.append(f"❌ total map error: {e}")
+        total_map = {}
+
+    # =========================
+    # sheets ingestion
+    # =========================
+    for sheet_name in RATIO_SHEETS:
+
+        try:
+            if sheet_name not in sheets:
+                raise ValueError(f"找不到工作表 {sheet_name}")
+
+            sheet_records = parse_ratio_like_frame(
+                sheets[sheet_name],
+                sheet_name,
+                year,
+                total_map,
+                supply_catalog_map
+            )
+
+            records.extend(sheet_records)
+
+            logs.append(f"  ✅ {sheet_name}: {len(sheet_records)}")
+
+        except Exception as e:
+            logs.append(f"  ❌ {sheet_name}: {e}")
+
+    return records, logs
+
+
+def ingest_workbooks(jobs, supply_catalog_map, workers=INGEST_WORKERS):
+    """
+    jobs：[(year, excel_path)]，依 jobs 順序 yield (records, logs)
+    """
+    workers = max(1, min(workers, len(jobs)))
+
+    if workers == 1:
+        for year, excel_path in jobs:
+            yield ingest_workbook(excel_path, year, supply_catalog_map)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+
+        futures = [
+            pool.submit(ingest_workbook, excel_path, year, supply_catalog_map)
+            for year, excel_path in jobs
+        ]
+
+        for future in futures:
+            yield future.result()
+
+
+# =========================
+# 沿用上一次的 records（沒變動的 Excel 不重新解析）
+# =========================
+def load_previous(manifest, signature):
+    """
+    回傳 (上次的 workbooks, store)；解析程式 / catalog 變了或 store 不見了就全部重算
+    """
+    if manifest.get("signature") != signature:
+        return {}, None
+
+    try:
+        store = RecordStore(OUTPUT_STORE)
+    except FileNotFoundError:
+        return {}, None
+
+    if store.version != manifest.get("store_version"):
+        return {}, None
+
+    return manifest.get("workbooks", {}), store
+
+
+def write_outputs(all_records, manifest, signature, current, changes, years):
+    """
+    寫出 store / preview，並更新 manifest（current 需已填好 start / count）
+    """
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+
+    # 欄位式儲存（取代整包 meta JSON）
+    meta = write_store(all_records, OUTPUT_STORE)
+
+    PREVIEW_PATH.write_text(
+        json.dumps(all_records[:50], ensure_ascii=False, indent=2),
+        encoding="utf-8"
+    )
+
+    manifest.update(
+        signature=signature,
+        store_version=meta["version"],
+        workbooks=current,
+        changes={**{k: v for k, v in changes.items() if k != "unchanged"}, "years": years},
+    )
+    save_manifest(manifest)
+
+    return meta
+
+
+def print_changes(changes, years):
+
+    labels = {"added": "新增", "changed": "修改", "removed": "刪除"}
+
+    for key, label in labels.items():
+        for name in changes[key]:
+            print(f"  {label}：{name}")
+
+    print(
+        f"🔁 重新解析 {len(changes['added']) + len(changes['changed'])} 個，"
+        f"沿用 {len(changes['unchanged'])} 個，刪除 {len(changes['removed'])} 個"
+        f"（影響年份：{', '.join(map(str, years)) or '無'}）"
+    )
+
+
 # =========================
 # main
 # =========================
 def main():
 
-    all_records = []
+    parser = argparse.ArgumentParser(description="yearly Excel → RAG store")
+    parser.add_argument("--full", action="store_true", help="忽略 manifest，全部重新解析")
+    args = parser.parse_args()
 
     yearly_files = sorted(YEARLY_DIR.glob("*.xlsx"))
 
@@ -80,18 +272,19 @@ def main():
     # =========================
     # supply catalog（可選）
     # =========================
-    supply_catalog_path = DATA_DIR / "supply_catalog.json"
-
     supply_catalog_map = {}
 
-    if supply_catalog_path.exists():
+    if SUPPLY_CATALOG_PATH.exists():
         supply_catalog_map = json.loads(
-            supply_catalog_path.read_text(encoding="utf-8")
+            SUPPLY_CATALOG_PATH.read_text(encoding="utf-8")
         )
 
     # =========================
-    # LOOP YEARS
+    # 每個 Excel 的內容 hash
     # =========================
+    jobs = []
+    current = {}
+
     for excel_path in yearly_files:
 
         year = extract_year_from_filename(excel_path.name)
@@ -100,60 +293,74 @@ def main():
             print(f"⚠️ skip {excel_path.name}")
             continue
 
-        print(f"📘 處理 {excel_path.name}（{year}）")
+        jobs.append((year, excel_path))
 
-        # =========================
-        # total map
-        # =========================
-        try:
-            total_map = build_total_map(excel_path)
-        except Exception as e:
-            print(f"❌ total map error: {e}")
-            total_map = {}
+        current[excel_path.name] = {
+            "year": year,
+            "hash": file_hash(excel_path),
+            "size": excel_path.stat().st_size,
+        }
 
-        # =========================
-        # sheets ingestion
-        # =========================
-        for sheet_name in RATIO_SHEETS:
+    jobs.sort(key=lambda job: job[0])
 
-            try:
-                records = parse_ratio_like_sheet(
-                    excel_path,
-                    sheet_name,
-                    year,
-                    total_map,
-                    supply_catalog_map
-                )
+    # =========================
+    # 和上一次的 manifest 比對
+    # =========================
+    manifest = load_manifest()
+    signature = ingest_signature(SUPPLY_CATALOG_PATH)
+
+    previous, store = ({}, None) if args.full else load_previous(manifest, signature)
 
-                all_records.extend(records)
+    changes = diff_workbooks(previous, current)
+    years = changed_years(changes, previous, current)
 
-                print(f"  ✅ {sheet_name}: {len(records)}")
+    print_changes(changes, years)
 
-            except Exception as e:
-                print(f"  ❌ {sheet_name}: {e}")
+    if store is not None and not changes["added"] + changes["changed"] + changes["removed"]:
+        print("\n✅ 沒有變動，store 維持不變")
+        print(f"📁 output = {OUTPUT_STORE}（version {store.version}）")
+        return
 
     # =========================
-    # output
+    # LOOP YEARS（只解析新增 / 修改的 Excel，多個 process 平行處理）
     # =========================
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    reparse = [job for job in jobs if job[1].name not in changes["unchanged"]]
+    parsed = ingest_workbooks(reparse, supply_catalog_map)
 
-    output_path = PROCESSED_DIR / "energy_rag_all_years_meta.json"
-    preview_path = PROCESSED_DIR / "energy_rag_all_years_preview.json"
+    all_records = []
 
-    output_path.write_text(
-        json.dumps(all_records, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    for year, excel_path in jobs:
 
-    preview_path.write_text(
-        json.dumps(all_records[:50], ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+        entry = current[excel_path.name]
+
+        if excel_path.name in changes["unchanged"]:
+            # 從上一版 store 依位置取出原本的 records
+            old = previous[excel_path.name]
+            records = store.rows(range(old["start"], old["start"] + old["count"]))
+        else:
+            records, logs = next(parsed)
+            print("\n".join(logs))
+
+            # 有錯誤的 Excel 不記 hash，下次再重試
+            if any("❌" in line for line in logs):
+                entry["hash"] = None
+
+        entry["start"] = len(all_records)
+        entry["count"] = len(records)
+
+        all_records.extend(records)
+
+    parsed.close()
+
+    # store 會被整個覆寫，先放掉 memmap
+    del store
+
+    meta = write_outputs(all_records, manifest, signature, current, changes, years)
 
     print("\n🎉 完成")
     print(f"📄 total records = {len(all_records)}")
-    print(f"📁 output = {output_path}")
+    print(f"📁 output = {OUTPUT_STORE}（version {meta['version']}）")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,8 +2,12 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import numpy as np
 import pandas as pd
 
+from ratio_sheet import ffill_frame, join_text, norm_values, ratio_cells, take
+from sheet_cache import read_sheet
+
 
 # =========================
 # config
@@ -42,7 +46,7 @@ def norm(v):
 # =========================
 def build_total_map(excel_path):
 
-    df = pd.read_excel(excel_path, sheet_name="總表")
+    df = read_sheet(excel_path, "總表")
 
     d1_rows = df[df.iloc[:, 0].astype(str).str.contains("D1|總計", na=False)]
 
@@ -72,70 +76,101 @@ def build_total_map(excel_path):
 # =========================
 def parse_ratio_like_sheet(file_path, sheet_name, year, total_map, supply_catalog_map):
 
-    df = pd.read_excel(file_path, sheet_name=sheet_name, header=None).ffill()
-
-    supply_codes = [norm(v) for v in df.iloc[0, 2:].tolist()]
-    supply_names_zh = [norm(v) for v in df.iloc[1, 2:].tolist()]
-    supply_names_en = [norm(v) for v in df.iloc[2, 2:].tolist()]
+    df = read_sheet(file_path, sheet_name, header=None)
 
-    records = []
+    return parse_ratio_like_frame(
+        df,
+        sheet_name,
+        year,
+        total_map,
+        supply_catalog_map
+    )
 
-    for i in range(3, len(df)):
-        row = df.iloc[i]
 
-        demand_code = norm(row.iloc[0])
-        demand_name = norm(row.iloc[1])
+def parse_ratio_like_frame(df, sheet_name, year, total_map, supply_catalog_map):
+    """
+    已讀入的工作表（header=None）→ records
+    """
 
-        if not demand_code:
-            continue
+    df = ffill_frame(df)
 
-        for j, code in enumerate(supply_codes):
+    supply_codes = norm_values(df.iloc[0, 2:]).tolist()
+    supply_names_zh = norm_values(df.iloc[1, 2:]).tolist()
+    supply_names_en = norm_values(df.iloc[2, 2:]).tolist()
 
-            value = safe_float(row.iloc[j + 2])
-            if value is None or value == 0:
-                continue
+    # 英文名稱以 supply catalog 為準
+    supply_names_en = [
+        supply_catalog_map.get(code, {}).get("name_en", en)
+        for code, en in zip(supply_codes, supply_names_en)
+    ]
+    totals = [total_map.get(code) for code in supply_codes]
 
-            zh = supply_names_zh[j]
-            en = supply_names_en[j]
+    # 非 0 數值格 → 長表（row-major，與逐格走訪順序相同）
+    cells = ratio_cells(df, first_row=3, first_col=2)
 
-            total_value = total_map.get(code)
+    if cells.empty:
+        return []
 
-            catalog = supply_catalog_map.get(code, {})
-            en_name = catalog.get("name_en", en)
+    j = cells["col"].to_numpy() - 2
 
-            text = (
-                f"{year}年 {demand_name} 使用 {zh}/{en_name}（{code}）"
-                f" 比例 {value}"
-            )
+    demand_codes = take(norm_values(df.iloc[:, 0]).tolist(), cells["row"])
+    demand_names = take(norm_values(df.iloc[:, 1]).tolist(), cells["row"])
+    codes = take(supply_codes, j)
+    names_zh = take(supply_names_zh, j)
+    names_en = take(supply_names_en, j)
+    total_values = take(totals, j)
+    values = cells["value"].tolist()
 
-            if total_value is not None:
-                text += f"｜總用量 {total_value}"
+    text = join_text(
+        f"{year}年 ", demand_names,
+        " 使用 ", names_zh,
+        "/", names_en,
+        "（", codes,
+        "） 比例 ", values,
+    )
 
-            records.append({
-                "text": text,
+    has_total = np.array([t is not None for t in total_values], dtype=bool)
+    text = text.astype(object)
+    text[has_total] = join_text(
+        text[has_total],
+        "｜總用量 ", total_values[has_total],
+    )
 
-                "year": year,
+    return [
+        {
+            "text": t,
 
-                # 🔥 新增
-                "record_type": "ratio",
-                "sheet": sheet_name,
+            "year": year,
 
-                # 原本
-                "type": "excel",
+            # 🔥 新增
+            "record_type": "ratio",
+            "sheet": sheet_name,
 
-                "demand_code": demand_code,
-                "demand_name": demand_name,
+            # 原本
+            "type": "excel",
 
-                "supply_code": code,
+            "demand_code": dc,
+            "demand_name": dn,
 
-                "supply_name_zh": zh,
-                "supply_name_en": en_name,
+            "supply_code": sc,
 
-                "value": value,
-                "total_supply": total_value
-            })
+            "supply_name_zh": zh,
+            "supply_name_en": en,
 
-    return records
+            "value": v,
+            "total_supply": total
+        }
+        for t, dc, dn, sc, zh, en, v, total in zip(
+            text.astype(str).tolist(),
+            demand_codes.tolist(),
+            demand_names.tolist(),
+            codes.tolist(),
+            names_zh.tolist(),
+            names_en.tolist(),
+            values,
+            total_values.tolist(),
+        )
+    ]
 
 
 # =========================
@@ -1,57 +1,266 @@
-import json
+import argparse
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from embedding import EMBED_BACKEND, EMBED_MODEL_NAME, get_embedder
+from embedding_cache import (
+    EMBED_CACHE_DIR,
+    EMBED_CACHE_ENABLED,
+    EmbeddingCache,
+    model_key,
+    text_hashes,
+)
+from ingest_manifest import index_is_current, load_manifest, record_index_build
+from lexical_index import NgramBM25Index
+from rag_index import INDEX_TYPE, create_faiss_index, ivf_train_size, write_index
+from rag_store import open_store
 
 BASE_DIR = Path(__file__).resolve().parent
-PROCESSED_DIR = BASE_DIR / "processed"
+PROCESSED_DIR = Path(os.getenv("RAG_PROCESSED_DIR", BASE_DIR / "processed"))
 
-INPUT_JSON = PROCESSED_DIR / "energy_rag_all_years_meta.json"
+INPUT_STORE = PROCESSED_DIR / "energy_rag_all_years_store"
+LEGACY_JSON = PROCESSED_DIR / "energy_rag_all_years_meta.json"
 OUTPUT_INDEX = PROCESSED_DIR / "energy_rag_all_years.index"
-OUTPUT_META = PROCESSED_DIR / "energy_rag_all_years_meta_index.json"
+OUTPUT_LEXICAL = PROCESSED_DIR / "energy_rag_all_years_lexical"
+
+# 每批讀取 / encode 的筆數與 worker 數（0 = CPU 核心數）
+BUILD_CHUNK_SIZE = int(os.getenv("RAG_BUILD_CHUNK_SIZE", "2048"))
+BUILD_WORKERS = int(os.getenv("RAG_BUILD_WORKERS", "0")) or os.cpu_count() or 1
+ENCODE_BATCH_SIZE = 64
+
+IVF_TRAIN_SEED = 20240601
+
+
+# =====================================================
+# 多 process encode
+# =====================================================
+def _init_worker(threads: int):
+    # 每個 worker 只用分到的核心，避免多個 process 互搶執行緒
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _encode_texts(texts, batch_size: int = ENCODE_BATCH_SIZE):
+    # worker 內第一次呼叫時載入模型，之後沿用
+    return get_embedder().encode(texts, batch_size=batch_size)
+
+
+class ChunkEncoder:
+    """
+    依序送出 text chunk，最多同時 workers × 2 批在跑，
+    workers = 1 時直接在本 process encode
+    """
+
+    def __init__(self, workers: int = BUILD_WORKERS):
+        self.workers = max(1, workers)
+        self.max_inflight = self.workers * 2
+        self.pool = None
+
+        if self.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self.pool = ProcessPoolExecutor(
+                self.workers, initializer=_init_worker, initargs=(threads,)
+            )
+
+    def submit(self, texts):
+        if self.pool is not None and texts:
+            return self.pool.submit(_encode_texts, texts)
+
+        future = Future()
+        future.set_result(_encode_texts(texts) if texts else None)
+        return future
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def embed_chunks(store, chunks, encoder, cache=None):
+    """
+    chunks：row id 陣列的序列 → 依序 yield 每批的向量
+
+    有快取時只 encode 快取沒有、且還沒送出的 text，
+    同一段 text 在不同 chunk 重複出現也只 encode 一次
+    """
+    pending = deque()
+    inflight = set()
+
+    def finish(item):
+        hashes, new_hashes, future = item
+        vectors = future.result()
+
+        if cache is None:
+            return vectors
+
+        if new_hashes:
+            cache.add(new_hashes, vectors)
+            inflight.difference_update(new_hashes)
+
+        return cache.get(hashes)
+
+    for ids in chunks:
+        texts = [store.text(int(i)) for i in ids]
+
+        if cache is None:
+            pending.append((None, None, encoder.submit(texts)))
+        else:
+            hashes = text_hashes(texts)
+            rows = cache.lookup(hashes)
+
+            need = {}
+            for h, text, row in zip(hashes.tolist(), texts, rows):
+                if row < 0 and h not in inflight and h not in need:
+                    need[h] = text
+
+            cache.hits += int((rows >= 0).sum())
+            cache.misses += len(texts) - int((rows >= 0).sum())
+
+            inflight.update(need)
+            pending.append((hashes, list(need), encoder.submit(list(need.values()))))
+
+        while len(pending) >= encoder.max_inflight:
+            yield finish(pending.popleft())
+
+    while pending:
+        yield finish(pending.popleft())
+
+
+def id_chunks(ids, chunk_size: int):
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start : start + chunk_size]
+
+
+# =====================================================
+# 建立索引（分批讀取 / encode / 加入，記憶體不隨資料量成長）
+# =====================================================
+def build_index(store, index_type=INDEX_TYPE, chunk_size=BUILD_CHUNK_SIZE, workers=1):
+    n = len(store)
+    encoder = ChunkEncoder(workers)
+
+    cache = None
+    if EMBED_CACHE_ENABLED:
+        cache = EmbeddingCache(
+            EMBED_CACHE_DIR, model_key(EMBED_BACKEND, EMBED_MODEL_NAME)
+        )
+
+    index = None
+
+    try:
+        # IVF：先用抽樣資料訓練 centroid
+        if index_type == "ivf":
+            rng = np.random.default_rng(IVF_TRAIN_SEED)
+            sample = np.sort(rng.choice(n, ivf_train_size(n), replace=False))
+
+            print(f"抽樣 {len(sample)} 筆訓練 IVF...")
+            sample_vectors = np.vstack(
+                list(embed_chunks(store, id_chunks(sample, chunk_size), encoder, cache))
+            )
+
+            index = create_faiss_index(sample_vectors.shape[1], n, index_type)
+            index.train(sample_vectors)
+            del sample_vectors
+
+        done = 0
+
+        for vectors in embed_chunks(
+            store, id_chunks(np.arange(n), chunk_size), encoder, cache
+        ):
+            if index is None:
+                index = create_faiss_index(vectors.shape[1], n, index_type)
+
+            index.add(np.ascontiguousarray(vectors, dtype="float32"))
+
+            done += len(vectors)
+            print(f"\r已加入 {done}/{n} 筆", end="", flush=True)
+
+        print()
+
+    finally:
+        encoder.close()
+
+        if cache is not None:
+            cache.save()
+
+    return index, cache
 
 
 def main():
-    if not INPUT_JSON.exists():
-        raise FileNotFoundError(f"找不到檔案: {INPUT_JSON}")
+    parser = argparse.ArgumentParser(description="建立 FAISS / BM25 索引")
+    parser.add_argument("--index-type", default=INDEX_TYPE)
+    parser.add_argument("--chunk-size", type=int, default=BUILD_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS)
+    parser.add_argument("--force", action="store_true", help="store 沒變也重建")
+    args = parser.parse_args()
 
-    records = json.loads(INPUT_JSON.read_text(encoding="utf-8"))
+    # 欄位式 store（row id 即 FAISS id，不再另存一份 meta JSON）
+    store = open_store(INPUT_STORE, legacy_json=LEGACY_JSON)
 
-    if not records:
+    if len(store) == 0:
         raise ValueError("records 是空的，無法建立索引")
 
-    texts = [r["text"] for r in records]
+    # ingest manifest：store、索引類型、embedding 模型都沒變就不用重建
+    build_info = {
+        "index_type": args.index_type,
+        "embed_model": model_key(EMBED_BACKEND, EMBED_MODEL_NAME),
+    }
+
+    if (
+        not args.force
+        and NgramBM25Index.exists(OUTPUT_LEXICAL)
+        and index_is_current(store.version, OUTPUT_INDEX, **build_info)
+    ):
+        print(f"✅ 索引已是最新（store version {store.version}），略過")
+        return
+
+    changes = load_manifest().get("changes")
+    if changes:
+        print(f"上次 ingest 變動年份：{', '.join(map(str, changes['years'])) or '無'}")
 
-    print(f"共讀取 {len(texts)} 筆 text，開始 embedding...")
+    print(
+        f"共 {len(store)} 筆 text，每批 {args.chunk_size} 筆，"
+        f"{args.workers} 個 worker 開始 embedding..."
+    )
+    print(f"Embedding backend: {EMBED_BACKEND}（{EMBED_MODEL_NAME}）")
+    print(f"FAISS 索引類型：{args.index_type}")
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model.encode(
-        texts,
-        show_progress_bar=True,
-        convert_to_numpy=True
+    index, cache = build_index(
+        store,
+        index_type=args.index_type,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
     )
 
-    embeddings = embeddings.astype("float32")
-    dim = embeddings.shape[1]
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"Embedding 快取：命中 {stats['hits']} 筆，未命中 {stats['misses']} 筆"
+            f"（快取共 {stats['size']} 筆）"
+        )
 
-    print(f"向量維度: {dim}")
-    print("建立 FAISS 索引中...")
+    print(f"向量維度: {index.d}")
 
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+    write_index(index, OUTPUT_INDEX)
 
-    faiss.write_index(index, str(OUTPUT_INDEX))
-    OUTPUT_META.write_text(
-        json.dumps(records, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    print("建立中文 n-gram BM25 索引中...")
+    NgramBM25Index.from_records(store).save(OUTPUT_LEXICAL)
+
+    record_index_build(store.version, count=len(store), **build_info)
 
     print("✅ 建立完成")
     print(f"索引檔: {OUTPUT_INDEX}")
-    print(f"中繼資料: {OUTPUT_META}")
+    print(f"中繼資料: {INPUT_STORE}（version {store.version}）")
+    print(f"字詞索引: {OUTPUT_LEXICAL}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,33 +1,44 @@
-from energy_chat_router import should_use_energy_rag, answer_energy_question
+from answer_templates import language_name, render
+from energy_chat_router import answer_energy_question, embedder, parse_query
+from query_parser import DEFAULT_LANG
+from semantic_cache import (
+    SEMANTIC_CACHE_ENABLED,
+    SemanticCache,
+    cache_guard,
+    is_cacheable,
+)
+from session_store import create_session_store
+import json
 import re
+import textwrap
 import traceback
-from collections import defaultdict, deque
-from flask import Blueprint, request, jsonify, current_app
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
 
 chat_bp = Blueprint("chat", __name__)
 
-# 記憶設定
+# 記憶設定（backend / TTL / 上限見 session_store.py）
 CHAT_MAX_MESSAGES = 10
-CHAT_SESSIONS = defaultdict(lambda: deque(maxlen=CHAT_MAX_MESSAGES))
+CHAT_SESSIONS = create_session_store(CHAT_MAX_MESSAGES)
+
+# 一般問題（web search）的語意快取：相似問題直接回傳上次的答案
+# 清除事件透過 CHAT_SESSIONS 的 backend 傳給其他 worker
+response_cache = SemanticCache(
+    embedder, scope_fields=("lang", "mode", "model"), events=CHAT_SESSIONS
+)
 
 URL_RE = re.compile(r"(https?://[^\s]+)", re.IGNORECASE)
 
 
 def detect_language(text):
-
-    # 中文
-    if re.search(r"[\u4e00-\u9fff]", text):
-        return "Traditional Chinese"
-
-    # 日文
-    if re.search(r"[\u3040-\u30ff]", text):
-        return "Japanese"
-
-    # 韓文
-    if re.search(r"[\uac00-\ud7af]", text):
-        return "Korean"
-
-    return "English"
+    # 日文 / 韓文 / 中文 / 英文（與回答模板共用同一套判斷）
+    return language_name(text)
 
 
 # =====================================================
@@ -49,6 +60,22 @@ def get_language_prompt(user_text):
     """
 
 
+# =====================================================
+# 生成時直接指定輸出語種
+# =====================================================
+# 翻譯併進生成的 prompt，回答一次到位；
+# finalize_answer 的翻譯只在模型仍用錯語種時才會用到
+def get_output_language_rule(user_text):
+    target_lang = detect_language(user_text)
+
+    return f"""
+                    輸出語種：{target_lang}
+                    - 全部內容（標題、條列、標籤、說明）都使用 {target_lang}
+                    - 資料或網路來源為其他語種時，直接翻譯成 {target_lang}
+                    - 不要雙語對照
+    """
+
+
 # =====================================================
 # Energy Sphere Prompt
 # =====================================================
@@ -118,118 +145,6 @@ DEFAULT_SYSTEM_PROMPT = """
 """
 
 
-# =====================================================
-# 指令關鍵字判斷
-# =====================================================
-def detect_query_mode(text):
-    text = text.lower()
-
-    if any(k in text for k in ["分析", "詳細", "整理", "趨勢", "report", "analysis"]):
-        return "analysis"
-
-    if any(
-        k in text
-        for k in ["最多", "哪個", "找出", "最高", "最低", "多少", "which", "max", "top"]
-    ):
-        return "precise"
-
-    return "normal"
-
-
-# =====================================================
-# 問題來源判斷
-# =====================================================
-def detect_query_source(text):
-
-    realtime_keywords = [
-        # 中文
-        "即時發電",
-        "及時發電",
-        "即時供電",
-        "即時電力",
-        "目前發電",
-        "目前供電",
-        "現在發電",
-        "現在供電",
-        "最新發電",
-        "今日供電",
-        "備轉容量",
-        "台電即時",
-        # English
-        "real-time power",
-        "real-time generation",
-        "current generation",
-        "current power",
-        "live generation",
-    ]
-
-    history_keywords = [
-        "比例",
-        "占比",
-        "使用量",
-        "總量",
-        "排名",
-        "最多",
-        "最高",
-        "最低",
-        "民國",
-        "年份",
-        "哪一年",
-        "前五",
-        "前十",
-        "top",
-        "ratio",
-        "percentage",
-        "ranking",
-        "highest",
-        "lowest",
-    ]
-
-    text_lower = text.lower()
-    # =====================================================
-    # 知識型問題（優先）
-    # =====================================================
-    knowledge_keywords = [
-        "是什麼",
-        "是甚麼",
-        "什麼是",
-        "是啥",
-        "介紹",
-        "解釋",
-        "原理",
-        "用途",
-        "優點",
-        "缺點",
-        "how",
-        "what is",
-        "explain",
-    ]
-
-    for k in knowledge_keywords:
-        if k.lower() in text_lower:
-            return "general"
-
-    # 即時資料
-    for k in realtime_keywords:
-        if k.lower() in text_lower:
-            return "realtime"
-
-    # 歷史 JSON
-    for k in history_keywords:
-        if k.lower() in text_lower:
-            return "history"
-
-    # 西元年份
-    if re.search(r"\b(19|20)\d{2}\b", text):
-        return "history"
-
-    # 民國年份
-    if re.search(r"\b1\d{2}\b", text):
-        return "history"
-
-    return "general"
-
-
 # =====================================================
 # 即時資料查詢
 # =====================================================
@@ -298,7 +213,7 @@ def answer_realtime_question(user_text):
 def _build_messages(session_id: str, user_text: str, system_prompt: str):
     msgs = [{"role": "system", "content": system_prompt}]
 
-    for role, content in CHAT_SESSIONS[session_id]:
+    for role, content in CHAT_SESSIONS.get(session_id):
         msgs.append({"role": role, "content": content})
 
     msgs.append({"role": "user", "content": user_text})
@@ -309,35 +224,29 @@ def _build_messages(session_id: str, user_text: str, system_prompt: str):
 # 儲存對話
 # =====================================================
 def _store_turn(session_id: str, user_text: str, assistant_text: str):
-    CHAT_SESSIONS[session_id].append(("user", user_text))
-    CHAT_SESSIONS[session_id].append(("assistant", assistant_text))
+    CHAT_SESSIONS.append(
+        session_id, ("user", user_text), ("assistant", assistant_text)
+    )
 
 
 # =====================================================
 # 結果強化
 # =====================================================
-def enhance_answer_by_mode(answer, mode):
+def enhance_answer_by_mode(answer, mode, lang=DEFAULT_LANG):
     if mode == "analysis":
         return f"""
-            ## 📊 能源資料完整分析
+            {render("analysis_header", lang)}
 
             {answer}
 
             ---
 
-            ### 🔍 綜合說明
-            - 已整合所有相關能源數據
-            - 包含結構比例、主要能源分布
-            - 可觀察長期趨勢與變化方向
-
-            ### 📈 建議解讀方向
-            - 注意高占比能源 → 代表依賴性
-            - 觀察變化 → 可能代表產業轉型
+{textwrap.indent(render("analysis_footer", lang), " " * 12)}
         """
 
     elif mode == "precise":
         return f"""
-            🎯 **精確查詢結果**
+            {render("precise_header", lang)}
 
             {answer}
 
@@ -527,14 +436,12 @@ def finalize_answer(openai_client, model, user_text, assistant_text, sources):
 
     target_lang = detect_language(user_text)
 
-    # 第一次翻譯
-    assistant_text = translate_answer(openai_client, model, user_text, assistant_text)
-
-    # 翻譯後再次檢查語言
-    final_lang = detect_language(assistant_text)
+    # 回答已經是使用者的語種（例如模板產生的查表答案）就不再翻譯
+    # 翻譯模型只是 fallback，最多兩次
+    for _ in range(2):
 
-    # 如果還是不一致，再翻一次
-    if final_lang != target_lang:
+        if detect_language(assistant_text) == target_lang:
+            break
 
         assistant_text = translate_answer(
             openai_client, model, user_text, assistant_text
@@ -543,6 +450,78 @@ def finalize_answer(openai_client, model, user_text, assistant_text, sources):
     return append_sources(clean_numbers(assistant_text), sources)
 
 
+# =====================================================
+# 串流（Server-Sent Events）
+# =====================================================
+# /chat 內部統一產生事件：
+#   ("delta", {"text": ...})  模型 token / 規則式答案，前端直接接在後面
+#   ("done",  {...})          最終答案 + sources / results 等 metadata
+#   ("error", {...})          同 done，但為錯誤（非串流時回 500）
+#
+# 非串流模式只取 done / error 組成原本的 JSON 回應
+def _respond(openai_client, stream, **kwargs):
+    """
+    呼叫 responses.create，回傳完整 response（給 get_output_text / extract_sources）
+
+    stream=True 時一邊收一邊 yield delta 事件
+    """
+    if not stream:
+        return openai_client.responses.create(**kwargs)
+
+    resp = None
+
+    for event in openai_client.responses.create(stream=True, **kwargs):
+
+        if event.type == "response.output_text.delta":
+            yield "delta", {"text": event.delta}
+
+        elif event.type in ("response.completed", "response.incomplete"):
+            resp = event.response
+
+        elif event.type in ("response.failed", "error"):
+            error = getattr(getattr(event, "response", None), "error", None) or event
+            raise RuntimeError(getattr(error, "message", None) or str(error))
+
+    if resp is None:
+        raise RuntimeError("串流中斷，沒有收到完整回應")
+
+    return resp
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_events(events, session_id):
+    try:
+        for event, data in events:
+            yield _sse(event, data)
+
+    except Exception as e:
+
+        traceback.print_exc()
+
+        yield _sse(
+            "error",
+            {
+                "answer": f"⚠️ 模型錯誤：{e}",
+                "sources": [],
+                "results": [],
+                "session_id": session_id,
+            },
+        )
+
+
+def _collect_events(events):
+    for event, data in events:
+
+        if event == "done":
+            return jsonify(data)
+
+        if event == "error":
+            return jsonify(data), 500
+
+
 # =====================================================
 # CHAT API
 # =====================================================
@@ -557,14 +536,34 @@ def chat():
     session_id = (data.get("session_id") or "default").strip() or "default"
 
     user_text = (data.get("question") or data.get("user") or "").strip()
-    model = (data.get("model") or "gpt-4o-mini").strip()
-
-    rag_auto = str(data.get("rag_auto", "true")).lower() == "true"
 
     file = request.files.get("file")
     if not user_text and not file:
         return jsonify({"error": "請輸入問題內容"}), 400
 
+    # stream=true 或 Accept: text/event-stream → SSE
+    stream = str(data.get("stream", "false")).lower() == "true" or (
+        request.accept_mimetypes.best == "text/event-stream"
+    )
+
+    events = _chat_events(data, session_id, user_text, file, stream)
+
+    if not stream:
+        return _collect_events(events)
+
+    return Response(
+        stream_with_context(_stream_events(events, session_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _chat_events(data, session_id, user_text, file, stream):
+
+    model = (data.get("model") or "gpt-4o-mini").strip()
+
+    rag_auto = str(data.get("rag_auto", "true")).lower() == "true"
+
     # =====================================================
     # Unified File Router
     # =====================================================
@@ -577,18 +576,17 @@ def chat():
 
             answer, sources, structured_data = qa_over_pdf(user_text, file)
 
-            return jsonify(
-                {
-                    "answer": append_sources(answer, sources),
-                    "sources": sources,
-                    "structured_data": structured_data,
-                    "results": [],
-                    "card_type": "default",
-                    "session_id": session_id,
-                    "model": "pdf_rag",
-                    "uses_openai": bool(current_app.config.get("OPENAI_CLIENT")),
-                }
-            )
+            yield "done", {
+                "answer": append_sources(answer, sources),
+                "sources": sources,
+                "structured_data": structured_data,
+                "results": [],
+                "card_type": "default",
+                "session_id": session_id,
+                "model": "pdf_rag",
+                "uses_openai": bool(current_app.config.get("OPENAI_CLIENT")),
+            }
+            return
 
         # Excel / CSV
         elif filename.endswith((".xlsx", ".xls", ".csv", ".tsv")):
@@ -603,34 +601,33 @@ def chat():
 
             structured_data = extract_json(answer)
 
-            return jsonify(
-                {
-                    "answer": append_sources(
-                        answer,
-                        [
-                            {
-                                "sheet": name,
-                                "rows": int(df.shape[0]),
-                            }
-                            for name, df in sheets.items()
-                        ],
-                    ),
-                    "sources": [
+            yield "done", {
+                "answer": append_sources(
+                    answer,
+                    [
                         {
                             "sheet": name,
                             "rows": int(df.shape[0]),
-                            "columns": list(df.columns),
                         }
                         for name, df in sheets.items()
                     ],
-                    "structured_data": structured_data,
-                    "results": [],
-                    "card_type": "default",
-                    "session_id": session_id,
-                    "model": "table_rag",
-                    "uses_openai": bool(client),
-                }
-            )
+                ),
+                "sources": [
+                    {
+                        "sheet": name,
+                        "rows": int(df.shape[0]),
+                        "columns": list(df.columns),
+                    }
+                    for name, df in sheets.items()
+                ],
+                "structured_data": structured_data,
+                "results": [],
+                "card_type": "default",
+                "session_id": session_id,
+                "model": "table_rag",
+                "uses_openai": bool(client),
+            }
+            return
 
         # TXT
         elif filename.endswith(".txt"):
@@ -645,62 +642,40 @@ def chat():
                 {user_text}
             """
 
-            resp = current_app.config.get("OPENAI_CLIENT").responses.create(
+            resp = yield from _respond(
+                current_app.config.get("OPENAI_CLIENT"),
+                stream,
                 model=model,
                 input=prompt,
                 temperature=0.2,
                 max_output_tokens=1000,
             )
 
-            return jsonify(
-                {
-                    "answer": append_sources(get_output_text(resp), [filename]),
-                    "sources": [filename],
-                    "results": [],
-                    "card_type": "default",
-                    "session_id": session_id,
-                    "model": "txt_rag",
-                    "uses_openai": True,
-                }
-            )
+            yield "done", {
+                "answer": append_sources(get_output_text(resp), [filename]),
+                "sources": [filename],
+                "results": [],
+                "card_type": "default",
+                "session_id": session_id,
+                "model": "txt_rag",
+                "uses_openai": True,
+            }
+            return
 
         else:
 
-            return jsonify(
-                {
-                    "answer": "⚠️ 不支援的檔案格式",
-                    "sources": [],
-                    "results": [],
-                }
-            )
+            yield "done", {
+                "answer": "⚠️ 不支援的檔案格式",
+                "sources": [],
+                "results": [],
+            }
+            return
 
     openai_client = current_app.config.get("OPENAI_CLIENT")
     qa_over_web = current_app.config.get("QA_OVER_WEB")
-    # Energy RAG 優先
-    # ====================================
-    # ====================================
-    general_patterns = [
-        "是什麼",
-        "什麼是",
-        "是不是",
-        "為什麼",
-        "怎麼",
-        "如何",
-        "介紹",
-        "解釋",
-        "未來",
-        "適合",
-        "發展",
-        "哪些再生能源",
-        "可以發展",
-    ]
-
-    if should_use_energy_rag(user_text) and not any(
-        p in user_text for p in general_patterns
-    ):
-        query_source = "history"
-    else:
-        query_source = detect_query_source(user_text)
+    # 年份 / 部門 / 能源 / 意圖 / 來源 / 模式只解析一次
+    parsed = parse_query(user_text)
+    query_source = parsed.source
 
     # =====================================================
     # URL 轉換 RAG
@@ -716,16 +691,15 @@ def chat():
                 answer = append_sources(answer, sources)
                 _store_turn(session_id, user_text, answer)
 
-                return jsonify(
-                    {
-                        "answer": answer,
-                        "sources": sources,
-                        "results": [],
-                        "session_id": session_id,
-                        "model": "rag_web",
-                        "uses_openai": bool(openai_client),
-                    }
-                )
+                yield "done", {
+                    "answer": answer,
+                    "sources": sources,
+                    "results": [],
+                    "session_id": session_id,
+                    "model": "rag_web",
+                    "uses_openai": bool(openai_client),
+                }
+                return
 
             except Exception as e:
                 user_text = f"(網址處理失敗) {e}\n\n{user_text}"
@@ -739,23 +713,22 @@ def chat():
 
         answer = answer_realtime_question(user_text)
 
-        return jsonify(
-            {
-                "answer": answer,
-                "sources": ["energy.db"],
-                "results": [],
-                "session_id": session_id,
-                "model": "realtime_sql",
-                "uses_openai": False,
-            }
-        )
+        yield "done", {
+            "answer": answer,
+            "sources": ["energy.db"],
+            "results": [],
+            "session_id": session_id,
+            "model": "realtime_sql",
+            "uses_openai": False,
+        }
+        return
 
     if query_source == "history":
 
         try:
 
-            mode = detect_query_mode(user_text)
-            result = answer_energy_question(user_text)
+            mode = parsed.mode
+            result = answer_energy_question(parsed)
 
             assistant_text = result.get("answer", "（無回應）")
 
@@ -768,7 +741,9 @@ def chat():
                 or "無相關資料" in assistant_text
             ):
 
-                resp = openai_client.responses.create(
+                resp = yield from _respond(
+                    openai_client,
+                    stream,
                     model=model,
                     tools=[{"type": "web_search"}],
                     input=f"""
@@ -782,6 +757,8 @@ def chat():
                     - 使用相同的語種回覆
                     - 回答最後必須附上來源網址
                     - 如果找不到答案，也必須列出可供查詢的相關網站連結
+
+                    {get_output_language_rule(user_text)}
                     """,
                     temperature=0.2,
                     max_output_tokens=1000,
@@ -797,16 +774,15 @@ def chat():
 
                 _store_turn(session_id, user_text, assistant_text)
 
-                return jsonify(
-                    {
-                        "answer": assistant_text,
-                        "sources": sources,
-                        "results": [],
-                        "session_id": session_id,
-                        "model": "web_fallback",
-                        "uses_openai": True,
-                    }
-                )
+                yield "done", {
+                    "answer": assistant_text,
+                    "sources": sources,
+                    "results": [],
+                    "session_id": session_id,
+                    "model": "web_fallback",
+                    "uses_openai": True,
+                }
+                return
 
             if (
                 "目前資料庫中沒有足夠資訊" not in assistant_text
@@ -815,6 +791,10 @@ def chat():
 
                 assistant_text = humanize_answer(assistant_text)
 
+                # 規則式答案先送出，不等後面的分析 / 翻譯
+                if stream:
+                    yield "delta", {"text": assistant_text + "\n\n"}
+
                 # =====================================================
                 # 分析模式 LLM
                 # =====================================================
@@ -835,9 +815,13 @@ def chat():
                         - 條理清楚
                         - 以條列式回覆並適當分段
                         - 使用相同的語種回覆
+
+                        {get_output_language_rule(user_text)}
                     """
 
-                    resp = openai_client.responses.create(
+                    resp = yield from _respond(
+                        openai_client,
+                        stream,
                         model=model,
                         tools=[{"type": "web_search"}],
                         input=[
@@ -864,7 +848,9 @@ def chat():
                 # =====================================
                 else:
 
-                    assistant_text = enhance_answer_by_mode(assistant_text, mode)
+                    assistant_text = enhance_answer_by_mode(
+                        assistant_text, mode, parsed.lang
+                    )
 
                 # 如果 analysis mode 沒有 web sources
                 # 才加 Energy RAG sources
@@ -879,16 +865,15 @@ def chat():
 
                 _store_turn(session_id, user_text, assistant_text)
 
-                return jsonify(
-                    {
-                        "answer": assistant_text,
-                        "sources": result.get("sources", []),
-                        "results": result.get("results", []),
-                        "session_id": session_id,
-                        "model": "energy_rag",
-                        "uses_openai": False,
-                    }
-                )
+                yield "done", {
+                    "answer": assistant_text,
+                    "sources": result.get("sources", []),
+                    "results": result.get("results", []),
+                    "session_id": session_id,
+                    "model": "energy_rag",
+                    "uses_openai": False,
+                }
+                return
 
         except Exception as e:
 
@@ -897,21 +882,17 @@ def chat():
             traceback.print_exc()
             print("=" * 80 + "\n")
 
-            return (
-                jsonify(
-                    {
-                        "answer": f"⚠️ Energy RAG 錯誤：{e}",
-                        "sources": [],
-                        "results": [],
-                        "session_id": session_id,
-                        "model": "energy_rag",
-                        "uses_openai": False,
-                    }
-                ),
-                500,
-            )
+            yield "error", {
+                "answer": f"⚠️ Energy RAG 錯誤：{e}",
+                "sources": [],
+                "results": [],
+                "session_id": session_id,
+                "model": "energy_rag",
+                "uses_openai": False,
+            }
+            return
 
-    if detect_query_mode(user_text) == "analysis":
+    if parsed.mode == "analysis":
         mode_prompt = DEFAULT_SYSTEM_PROMPT
     else:
         mode_prompt = "請用自然聊天方式回答，不要用報告格式。"
@@ -922,6 +903,32 @@ def chat():
         language_prompt + "\n\n" + BASE_ASSISTANT_PROMPT + "\n\n" + mode_prompt
     )
 
+    # =====================================================
+    # 語意快取（依問題本身判斷：追問、與時間有關的問題不走快取）
+    # =====================================================
+    cache_scope = (parsed.lang, parsed.mode, model)
+    guard = cache_guard(parsed, user_text)
+    cache_vec = None
+    use_cache = SEMANTIC_CACHE_ENABLED and openai_client and is_cacheable(user_text)
+    # 有上下文時產生的回答可能引用前文，只讀不寫
+    fresh_session = not CHAT_SESSIONS.get(session_id)
+
+    if use_cache:
+        cached, score, cache_vec = response_cache.get(
+            user_text, cache_scope, guard
+        )
+
+        if cached is not None:
+            _store_turn(session_id, user_text, cached["answer"])
+
+            yield "done", {
+                **cached,
+                "session_id": session_id,
+                "cached": True,
+                "cache_score": round(score, 4),
+            }
+            return
+
     # =====================================================
     # 呼叫模型
     # =====================================================
@@ -931,7 +938,9 @@ def chat():
         try:
             messages = _build_messages(session_id, user_text, system_prompt)
 
-            resp = openai_client.responses.create(
+            resp = yield from _respond(
+                openai_client,
+                stream,
                 model=model,
                 # 允許 GPT 上網搜尋
                 tools=[{"type": "web_search"}],
@@ -961,6 +970,22 @@ def chat():
             # =====================================
             assistant_text = clean_numbers(assistant_text)
 
+            if use_cache and fresh_session:
+                response_cache.set(
+                    user_text,
+                    cache_scope,
+                    {
+                        "answer": assistant_text,
+                        "sources": final_sources,
+                        "results": [],
+                        "card_type": "default",
+                        "model": model,
+                        "uses_openai": True,
+                    },
+                    cache_vec,
+                    guard,
+                )
+
         except Exception as e:
             assistant_text = f"⚠️ 模型錯誤：{e}"
             final_sources = []
@@ -970,14 +995,12 @@ def chat():
 
     _store_turn(session_id, user_text, assistant_text)
 
-    return jsonify(
-        {
-            "answer": assistant_text,
-            "sources": final_sources,
-            "results": [],
-            "card_type": "default",
-            "session_id": session_id,
-            "model": model,
-            "uses_openai": True,
-        }
-    )
+    yield "done", {
+        "answer": assistant_text,
+        "sources": final_sources,
+        "results": [],
+        "card_type": "default",
+        "session_id": session_id,
+        "model": model,
+        "uses_openai": True,
+    }
@@ -0,0 +1,174 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+# torch     : sentence-transformers（PyTorch）
+# onnx      : onnxruntime fp32
+# onnx-int8 : onnxruntime 動態量化 int8
+EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND", "torch").strip().lower()
+EMBED_MODEL_NAME = os.getenv("RAG_EMBED_MODEL", "all-MiniLM-L6-v2")
+ONNX_DIR = Path(os.getenv("RAG_ONNX_DIR", BASE_DIR / "models" / "onnx"))
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model-int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# MiniLM 訓練時的最大長度
+MAX_SEQ_LENGTH = 256
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+# =====================================================
+# PyTorch（sentence-transformers）
+# =====================================================
+class TorchEmbedder:
+    backend = "torch"
+
+    def __init__(self, model_name: str = EMBED_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size: int = 64, show_progress_bar: bool = False):
+        embeddings = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True,
+        )
+        return embeddings.astype("float32")
+
+
+# =====================================================
+# ONNX Runtime（CPU）
+# =====================================================
+class OnnxEmbedder:
+    """
+    與 sentence-transformers 的 all-MiniLM-L6-v2 相同流程：
+    Transformer → mean pooling → L2 normalize
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBED_MODEL_NAME,
+        onnx_dir: Path = ONNX_DIR,
+        quantized: bool = False,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        onnx_dir = Path(onnx_dir)
+        model_path = onnx_dir / (ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        tokenizer_path = onnx_dir / TOKENIZER_FILE
+
+        if not model_path.exists() or not tokenizer_path.exists():
+            raise FileNotFoundError(
+                f"找不到 ONNX 模型：{model_path}，請先執行 export_onnx_embedding.py"
+            )
+
+        self.model_name = model_name
+        self.backend = "onnx-int8" if quantized else "onnx"
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self._dim = None
+
+    @property
+    def dim(self):
+        if self._dim is None:
+            self._dim = int(self.encode(["dim"]).shape[1])
+        return self._dim
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array(
+                [e.type_ids for e in encodings], dtype=np.int64
+            )
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # mean pooling（排除 padding）
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = summed / counts
+
+        # L2 normalize
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.clip(norms, 1e-12, None)
+
+        return embeddings.astype("float32")
+
+    def encode(self, texts, batch_size: int = 64, show_progress_bar: bool = False):
+        texts = list(texts)
+
+        if not texts:
+            return np.zeros((0, self._dim or 0), dtype="float32")
+
+        batches = range(0, len(texts), batch_size)
+
+        if show_progress_bar:
+            from tqdm import tqdm
+
+            batches = tqdm(batches, desc="Batches")
+
+        embeddings = np.vstack(
+            [self._encode_batch(texts[i : i + batch_size]) for i in batches]
+        )
+        self._dim = embeddings.shape[1]
+
+        return embeddings
+
+
+# =====================================================
+# 建立 embedder
+# =====================================================
+def load_embedder(backend: str = EMBED_BACKEND, model_name: str = EMBED_MODEL_NAME):
+    backend = (backend or "torch").strip().lower()
+
+    if backend == "torch":
+        return TorchEmbedder(model_name)
+
+    if backend == "onnx":
+        return OnnxEmbedder(model_name, quantized=False)
+
+    if backend == "onnx-int8":
+        return OnnxEmbedder(model_name, quantized=True)
+
+    raise ValueError(f"不支援的 embedding backend：{backend}（可用：{', '.join(BACKENDS)}）")
+
+
+@lru_cache(maxsize=None)
+def get_embedder(backend: str = EMBED_BACKEND, model_name: str = EMBED_MODEL_NAME):
+    return load_embedder(backend, model_name)
@@ -0,0 +1,234 @@
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import xxhash
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+EMBED_CACHE_ENABLED = os.getenv("RAG_EMBED_CACHE", "true").lower() == "true"
+EMBED_CACHE_DIR = Path(
+    os.getenv("RAG_EMBED_CACHE_DIR", BASE_DIR / "processed" / "embedding_cache")
+)
+
+VECTORS_FILE = "vectors.f32"
+HASHES_FILE = "hashes.npy"
+ROWS_FILE = "rows.npy"
+META_FILE = "meta.json"
+
+
+def text_hash(text: str):
+    return xxhash.xxh3_64_intdigest((text or "").encode("utf-8"))
+
+
+def text_hashes(texts):
+    return np.fromiter((text_hash(t) for t in texts), dtype=np.uint64, count=len(texts))
+
+
+def model_id(embedder):
+    return model_key(embedder.backend, embedder.model_name)
+
+
+def model_key(backend: str, model_name: str):
+    # 同一模型的 torch / onnx / int8 向量不同，backend 也算進 key
+    return f"{backend}:{model_name}"
+
+
+# =====================================================
+# 依內容 hash 快取 embedding
+# =====================================================
+class EmbeddingCache:
+    """
+    (模型, xxh3(text)) → 向量
+
+    每個模型一個目錄：
+      vectors.f32  : 只會往後追加的 float32 向量（np.memmap 讀取）
+      hashes.npy   : 排序過的 text hash
+      rows.npy     : hash 對應的向量列號
+      meta.json    : 模型 / 維度 / 筆數（最後寫入，筆數以此為準）
+
+    重建索引時只 encode 新增或修改過的 text
+    """
+
+    def __init__(self, cache_dir, model: str):
+        self.model = model
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]+", "_", model)
+
+        self.dim = None
+        self.count = 0
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.rows = np.zeros(0, dtype=np.int64)
+        # 尚未併入排序陣列的新向量（save 時合併，避免每批都重新排序）
+        self._pending = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        meta_path = self.dir / META_FILE
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+
+            if meta.get("model") == model:
+                self.dim = meta["dim"]
+                self.count = meta["count"]
+                self.hashes = np.load(self.dir / HASHES_FILE)
+                self.rows = np.load(self.dir / ROWS_FILE)
+
+    @classmethod
+    def for_embedder(cls, embedder, cache_dir=EMBED_CACHE_DIR):
+        return cls(cache_dir, model_id(embedder))
+
+    def __len__(self):
+        return self.count
+
+    # -------------------------------------------------
+    # 查詢
+    # -------------------------------------------------
+    def lookup(self, hashes):
+        """
+        hashes → 向量列號（沒有快取的為 -1）
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        rows = np.full(len(hashes), -1, dtype=np.int64)
+
+        if len(self.hashes):
+            pos = np.searchsorted(self.hashes, hashes)
+            pos = np.minimum(pos, len(self.hashes) - 1)
+            found = self.hashes[pos] == hashes
+            rows[found] = self.rows[pos[found]]
+
+        if self._pending:
+            for n in np.flatnonzero(rows < 0):
+                rows[n] = self._pending.get(int(hashes[n]), -1)
+
+        return rows
+
+    def get(self, hashes):
+        """
+        hashes → 向量（全部都必須已經在快取中）
+        """
+        rows = self.lookup(hashes)
+
+        if (rows < 0).any():
+            raise KeyError(f"{int((rows < 0).sum())} 筆 text 不在 embedding 快取中")
+
+        return np.asarray(self.vectors()[rows], dtype=np.float32)
+
+    def vectors(self):
+        if not self.count:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        return np.memmap(
+            self.dir / VECTORS_FILE,
+            dtype=np.float32,
+            mode="r",
+            shape=(self.count, self.dim),
+        )
+
+    # -------------------------------------------------
+    # 寫入
+    # -------------------------------------------------
+    def add(self, hashes, embeddings):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        if not len(hashes):
+            return
+
+        if self.dim is None:
+            self.dim = int(embeddings.shape[1])
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(
+                f"embedding 維度不一致：快取 {self.dim}，新向量 {embeddings.shape[1]}"
+            )
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / VECTORS_FILE
+
+        # 上次中斷時 meta 之後多寫的部分直接截掉
+        with open(path, "ab") as f:
+            f.truncate(self.count * self.dim * 4)
+            f.write(embeddings.tobytes())
+
+        for n, h in enumerate(hashes.tolist()):
+            self._pending[h] = self.count + n
+
+        self.count += len(hashes)
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+
+        hashes_all = np.concatenate(
+            [self.hashes, np.fromiter(self._pending, dtype=np.uint64)]
+        )
+        rows_all = np.concatenate(
+            [self.rows, np.fromiter(self._pending.values(), dtype=np.int64)]
+        )
+        order = np.argsort(hashes_all, kind="stable")
+
+        self.hashes = hashes_all[order]
+        self.rows = rows_all[order]
+        self._pending = {}
+
+    def save(self):
+        if self.dim is None:
+            return
+
+        self._merge_pending()
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        np.save(self.dir / HASHES_FILE, self.hashes)
+        np.save(self.dir / ROWS_FILE, self.rows)
+
+        (self.dir / META_FILE).write_text(
+            json.dumps(
+                {"model": self.model, "dim": self.dim, "count": self.count},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+
+    # -------------------------------------------------
+    # encode（只算快取沒有的 text）
+    # -------------------------------------------------
+    def encode(self, texts, embedder, batch_size: int = 64, show_progress_bar=False):
+        texts = list(texts)
+        hashes = text_hashes(texts)
+        missing = self.lookup(hashes) < 0
+        self.hits += int((~missing).sum())
+        self.misses += int(missing.sum())
+
+        if missing.any():
+            # 同一段 text 重複出現只 encode 一次
+            new_hashes, first = np.unique(hashes[missing], return_index=True)
+            missing_texts = [texts[i] for i in np.flatnonzero(missing)[first]]
+
+            embeddings = embedder.encode(
+                missing_texts,
+                batch_size=batch_size,
+                show_progress_bar=show_progress_bar,
+            )
+            self.add(new_hashes, embeddings)
+            self.save()
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        return self.get(hashes)
+
+    def stats(self):
+        total = self.hits + self.misses
+
+        return {
+            "model": self.model,
+            "size": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+
+from flask import Blueprint, Response, jsonify, request
+
+from cache_utils import LRUCache
+from energy_chat_router import answer_energy_questions, parse_query
+from energy_cube import get_cube, normalize_query, query_key
+
+energy_bp = Blueprint("energy", __name__)
+
+# 單次批次最多幾題
+ENERGY_BATCH_MAX = int(os.getenv("ENERGY_BATCH_MAX", "200"))
+
+# cube 查詢結果（key 含資料版本，資料更新後自然失效）
+cube_cache = LRUCache(maxsize=int(os.getenv("ENERGY_CUBE_CACHE_SIZE", "512")))
+
+
+# =====================================================
+# 批次問答（報表產生器用）
+# =====================================================
+@energy_bp.route("/energy-batch", methods=["POST"])
+def energy_batch():
+    data = request.get_json(silent=True) or {}
+    questions = data.get("questions")
+
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "questions 必須是非空的問題陣列"}), 400
+
+    if len(questions) > ENERGY_BATCH_MAX:
+        return (
+            jsonify(
+                {"error": f"一次最多 {ENERGY_BATCH_MAX} 題（收到 {len(questions)} 題）"}
+            ),
+            400,
+        )
+
+    questions = [str(q or "").strip() for q in questions]
+    parsed = [parse_query(q) for q in questions]
+    results = answer_energy_questions(parsed)
+
+    answers = []
+
+    for q, result in zip(parsed, results):
+        answers.append(
+            {
+                "question": q.text,
+                "intent": q.intent,
+                "success": result.get("success", False),
+                "answer": result.get("answer", ""),
+                "sources": result.get("sources", []),
+                "results": result.get("results", []),
+                "card_type": result.get("card_type", "default"),
+            }
+        )
+
+    return jsonify(
+        {
+            "answers": answers,
+            "count": len(answers),
+            "model": "energy_rag",
+            "uses_openai": False,
+        }
+    )
+
+
+# =====================================================
+# year × D × S cube 查詢（欄位式 JSON + ETag）
+# =====================================================
+def _etag(*parts):
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def _cached_json(key, etag, build):
+    if etag in request.if_none_match:
+        response = jsonify()
+        response.status_code = 304
+        response.set_etag(etag)
+        return response
+
+    body = cube_cache.get(key)
+    if body is None:
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":"))
+        cube_cache.set(key, body)
+
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@energy_bp.route("/energy-cube", methods=["GET", "POST"])
+def energy_cube():
+    if request.method == "POST":
+        params = request.get_json(silent=True) or {}
+    else:
+        params = request.args.to_dict()
+
+    try:
+        q = normalize_query(params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cube = get_cube()
+    key = (cube.version, query_key(q))
+    etag = _etag(*key)
+
+    try:
+        return _cached_json(
+            key, etag, lambda: {**cube.query(q), "version": cube.version}
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@energy_bp.route("/energy-cube/meta", methods=["GET"])
+def energy_cube_meta():
+    cube = get_cube()
+    key = (cube.version, "meta")
+
+    return _cached_json(key, _etag(*key), cube.meta)
@@ -1,206 +1,96 @@
-import json
-import re
+import contextvars
+import copy
+import os
 from pathlib import Path
 
-import faiss
-from sentence_transformers import SentenceTransformer
+from answer_templates import (
+    department_label,
+    energy_label,
+    energy_name_label,
+    join_items,
+    render,
+    usage_item,
+    year_label,
+)
+from cache_utils import LRUCache
+from embedding import get_embedder
+from lexical_index import NgramBM25Index
+from query_parser import DEFAULT_LANG, ParsedQuery, QueryParser, classify_intent
+from rag_index import build_id_selector, load_index, search_index
+from rag_store import open_store
 
 BASE_DIR = Path(__file__).resolve().parent
-PROCESSED_DIR = BASE_DIR / "processed"
+PROCESSED_DIR = Path(os.getenv("RAG_PROCESSED_DIR", BASE_DIR / "processed"))
 
+STORE_DIR = PROCESSED_DIR / "energy_rag_all_years_store"
+# 舊版 meta JSON（只在 store 不存在時轉換一次）
 META_PATH = PROCESSED_DIR / "energy_rag_all_years_meta.json"
 INDEX_PATH = PROCESSED_DIR / "energy_rag_all_years.index"
+LEXICAL_PATH = PROCESSED_DIR / "energy_rag_all_years_lexical"
+
+# 字詞比對夠明確時直接回傳，不做 embedding
+LEXICAL_FAST_COVERAGE = float(os.getenv("RAG_LEXICAL_FAST_COVERAGE", "0.9"))
+LEXICAL_FAST_MIN_HITS = int(os.getenv("RAG_LEXICAL_FAST_MIN_HITS", "3"))
+RRF_K = 60
+
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "2048"))
+
+# 欄位式 metadata（memory-mapped，row id = FAISS id）
+store = open_store(STORE_DIR, legacy_json=META_PATH)
+# 以 mmap 開啟：多個 worker 共用同一份 page cache
+index = load_index(INDEX_PATH)
+embedder = get_embedder()
+
+# 資料 / 索引版本：重建後 key 不同，舊的快取答案自然失效
+_index_stat = INDEX_PATH.stat()
+DATA_VERSION = f"{store.version}:{_index_stat.st_size}:{_index_stat.st_mtime_ns}"
+
+# 依解析後的意圖快取答案（LRU）
+answer_cache = LRUCache(maxsize=ANSWER_CACHE_SIZE)
+
+# 年份 → FAISS id selector（年份過濾直接在 FAISS 內完成）
+YEAR_IDS = {
+    year: ids for year, ids in store.group_ids("year").items() if year is not None
+}
+YEAR_SELECTORS = {year: build_id_selector(ids) for year, ids in YEAR_IDS.items()}
+
 
-records = json.loads(META_PATH.read_text(encoding="utf-8"))
-index = faiss.read_index(str(INDEX_PATH))
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# 中文 n-gram BM25（build_index.py 產生；不存在或過期就現場建立）
+def load_lexical_index():
+    if NgramBM25Index.exists(LEXICAL_PATH):
+        lexical = NgramBM25Index.load(LEXICAL_PATH)
+        if lexical.store_version == store.version and lexical.n_docs == len(store):
+            return lexical
+
+    print("⚠️ 找不到對應的 lexical index，重新建立中...")
+    return NgramBM25Index.from_records(store)
+
+
+lexical_index = load_lexical_index()
 
 
 # =====================================================
 # 基本資料
 # =====================================================
-DEPARTMENTS = [
-    "工業部門",
-    "運輸部門",
-    "農業部門",
-    "服務業部門",
-    "住宅部門",
-]
-
 ENERGY_NAMES = sorted(
-    {r.get("supply_name_zh", "") for r in records if r.get("supply_name_zh")},
+    {name for name in store.unique("supply_name_zh") if name},
     key=len,
     reverse=True,
 )
 
-# 部門同義詞：口語 / 簡稱 -> 正式名稱
-DEPARTMENT_SYNONYMS = {
-    "工業": "工業部門",
-    "工業部門": "工業部門",
-    "運輸": "運輸部門",
-    "交通": "運輸部門",
-    "運輸部門": "運輸部門",
-    "農業": "農業部門",
-    "農業部門": "農業部門",
-    "服務業": "服務業部門",
-    "商業": "服務業部門",
-    "服務部門": "服務業部門",
-    "服務業部門": "服務業部門",
-    "住宅": "住宅部門",
-    "住家": "住宅部門",
-    "家庭": "住宅部門",
-    "民生": "住宅部門",
-    "住宅部門": "住宅部門",
-}
-
-# 能源同義詞：口語 / 簡稱 -> 正式名稱
-ENERGY_SYNONYMS = {
-    "天然氣": "天然氣",
-    "瓦斯": "天然氣",
-    "液化天然氣": "天然氣",
-    "lng": "天然氣",
-    "LNG": "天然氣",
-    "電力": "電力",
-    "用電": "電力",
-    "電": "電力",
-    "煤": "煤及煤產品",
-    "煤炭": "煤及煤產品",
-    "煤及煤產品": "煤及煤產品",
-    "石油": "原油及石油產品",
-    "油": "原油及石油產品",
-    "原油": "原油及石油產品",
-    "原油及石油產品": "原油及石油產品",
-    "太陽能": "太陽光電",
-    "光電": "太陽光電",
-    "太陽光電": "太陽光電",
-    "風電": "風力",
-    "風能": "風力",
-    "風力": "風力",
-    "熱": "熱能",
-    "熱能": "熱能",
-    "核電": "核能",
-    "核能": "核能",
-    "水電": "水力",
-    "水力": "水力",
-    "生質能": "生質能",
-    "廢棄物": "廢棄物",
-}
-
+# 每則訊息只解析一次（部門 / 能源 / 關鍵字共用一個 automaton）
+query_parser = QueryParser(ENERGY_NAMES)
 
-def should_use_energy_rag(user_text: str):
-    text = user_text.strip()
-
-    # === 基本解析 ===
-    year = extract_year(text)
-    years = extract_years(text)
-    department = normalize_department(text)
-    energy_name = normalize_energy(text)
-
-    general_keywords = [
-        "是不是",
-        "怎樣",
-        "是什麼",
-        "為什麼",
-        "介紹",
-        "說明",
-        "解釋",
-        "概念",
-        "原因",
-        "影響",
-        "未來",
-        "適合",
-        "發展",
-        "可以發展",
-    ]
 
-    if any(k in text for k in general_keywords) and year is None and len(years) == 0:
-        return False
-    intent = detect_intent(
-        text,
-        year=year,
-        department=department,
-        energy_name=energy_name,
-    )
+def parse_query(user_text) -> ParsedQuery:
+    if isinstance(user_text, ParsedQuery):
+        return user_text
 
-    # =====================================================
-    # 🎯 1. 明確查數據（最重要）
-    # =====================================================
-    if year is not None or len(years) >= 2:
-        if intent != "semantic_search":
-            return True
-
-    # =====================================================
-    # 🎯 2. 部門 + 能源（一定是查表）
-    # =====================================================
-    if department and energy_name:
-        return True
-
-    # =====================================================
-    # 🎯 3. 部門 → 問能源
-    # =====================================================
-    if department and any(
-        k in text
-        for k in [
-            "主要使用",
-            "使用哪些能源",
-            "用哪些能源",
-            "主要用什麼",
-            "最多",
-            "前幾",
-            "排名",
-        ]
-    ):
-        return True
-
-    # =====================================================
-    # 🎯 4. 能源 → 問部門
-    # =====================================================
-    if energy_name and any(
-        k in text for k in ["哪些部門", "誰在用", "用在哪", "使用情況"]
-    ):
-        return True
-
-    # =====================================================
-    # 🎯 5. 有「能源語意」但沒完全命中
-    # =====================================================
-    energy_keywords = [
-        "能源",
-        "用電",
-        "耗能",
-        "電力",
-        "天然氣",
-        "石油",
-        "煤",
-        "再生能源",
-        "使用量",
-        "比例",
-        "結構",
-    ]
+    return query_parser.parse(user_text)
 
-    if any(k in text for k in energy_keywords):
-        return True
-
-    # =====================================================
-    # ❌ 6. 明顯聊天（避免誤觸 RAG）
-    # =====================================================
-    casual_keywords = [
-        "你好",
-        "嗨",
-        "hello",
-        "hi",
-        "你是誰",
-        "可以做什麼",
-        "謝謝",
-        "thanks",
-    ]
 
-    if any(k.lower() in text.lower() for k in casual_keywords):
-        return False
-
-    # =====================================================
-    # 🎯 fallback（保守策略）
-    # =====================================================
-    return False
+def should_use_energy_rag(user_text):
+    return parse_query(user_text).use_rag
 
 
 # =====================================================
@@ -223,314 +113,230 @@ def is_energy_question(text: str) -> bool:
     return any(k in text for k in keywords)
 
 
-def extract_top_n(text: str):
-    text = text.lower()
+# =====================================================
+# 舊介面（皆由 ParsedQuery 取得）
+# =====================================================
+def normalize_department(text: str):
+    return parse_query(text).department
 
-    # 🎯 最多 / 最大 → 1筆
-    if "最多" in text or "最大" in text:
-        return 1
 
-    # 🎯 前幾（中文）
-    m = re.search(r"前(\d+)", text)
-    if m:
-        return int(m.group(1))
+def normalize_energy(text: str):
+    return parse_query(text).energy_name
 
-    # 🎯 top3 / top 5
-    m = re.search(r"top\s*(\d+)", text)
-    if m:
-        return int(m.group(1))
 
-    # 🎯 前幾（中文數字）
-    if "前五" in text:
-        return 5
-    if "前三" in text:
-        return 3
-    if "前十" in text:
-        return 10
+def extract_departments(text: str):
+    return list(parse_query(text).departments)
 
-    return 5  # 預設
+
+def detect_intent(user_text, year=None, department=None, energy_name=None):
+    return classify_intent(
+        parse_query(user_text),
+        year=year,
+        department=department,
+        energy_name=energy_name,
+    )
 
 
 # =====================================================
-# 年份抽取
+# 向量檢索
 # =====================================================
-def extract_year(text: str):
-    text = text.strip()
+def _search_result(idx, similarity, match):
+    item = store[idx]
+    item["similarity"] = similarity
+    item["score"] = round(similarity * 100, 2)
+    item["match"] = match
+    return item
 
-    # 民國85年 / 113年
-    m = re.search(r"(?:民國)?(\d{2,3})年", text)
-    if m:
-        year = int(m.group(1))
-        if 1 <= year <= 300:
-            return year
 
-    # 西元年 1996年 -> 民國85年
-    m = re.search(r"(19\d{2}|20\d{2})年", text)
-    if m:
-        ad_year = int(m.group(1))
-        roc_year = ad_year - 1911
-        if 1 <= roc_year <= 300:
-            return roc_year
+def _lexical_stage(question: str, k: int, year_ids):
+    """
+    字詞檢索（BM25）→ (lexical_hits, 直接可回傳的結果或 None)
+    """
+    lexical_hits = lexical_index.search(question, k=k, ids=year_ids)
 
-    # 單獨數字
-    m = re.search(r"\b(8[0-9]|9[0-9]|10[0-9]|11[0-9])\b", text)
-    if m:
-        return int(m.group(1))
+    # 查詢字詞幾乎都命中 → 直接回傳，省下 embedding
+    decisive = [h for h in lexical_hits if h[2] >= LEXICAL_FAST_COVERAGE]
 
-    return None
+    if len(decisive) >= min(k, LEXICAL_FAST_MIN_HITS):
+        return lexical_hits, [
+            _search_result(idx, coverage, "lexical") for idx, _, coverage in decisive
+        ]
 
+    return lexical_hits, None
 
-# =====================================================
-# 正規化部門
-# =====================================================
-def normalize_department(text: str):
-    # 先找正式名稱
-    for dept in DEPARTMENTS:
-        if dept in text:
-            return dept
 
-    # 再找同義詞
-    for alias, canonical in sorted(
-        DEPARTMENT_SYNONYMS.items(), key=lambda x: len(x[0]), reverse=True
-    ):
-        if alias in text:
-            return canonical
+def _fuse(distances, indices, lexical_hits, k: int):
+    """
+    向量 + 字詞結果以 Reciprocal Rank Fusion 合併
+    """
+    fused = {}
 
-    return None
+    for rank, (dist, idx) in enumerate(zip(distances, indices)):
+        if 0 <= idx < len(store):
+            entry = fused.setdefault(
+                int(idx), {"rrf": 0.0, "vector": 0.0, "lexical": 0.0}
+            )
+            entry["rrf"] += 1 / (RRF_K + rank + 1)
+            entry["vector"] = 1 / (1 + float(dist))
 
+    for rank, (idx, _, coverage) in enumerate(lexical_hits):
+        entry = fused.setdefault(idx, {"rrf": 0.0, "vector": 0.0, "lexical": 0.0})
+        entry["rrf"] += 1 / (RRF_K + rank + 1)
+        entry["lexical"] = coverage
 
-# =====================================================
-# 正規化能源
-# =====================================================
-def normalize_energy(text: str):
-    # 先找正式名稱
-    for name in ENERGY_NAMES:
-        if name and name in text:
-            return name
+    results = []
 
-    # 再找同義詞
-    for alias, canonical in sorted(
-        ENERGY_SYNONYMS.items(), key=lambda x: len(x[0]), reverse=True
-    ):
-        if alias in text:
-            # 如果 canonical 本身在正式能源名稱中，直接回傳
-            if canonical in ENERGY_NAMES:
-                return canonical
+    for idx, entry in sorted(fused.items(), key=lambda x: x[1]["rrf"], reverse=True):
+        similarity = max(entry["vector"], entry["lexical"])
 
-            # 否則試著找包含 canonical 的正式名稱
-            for name in ENERGY_NAMES:
-                if canonical and canonical in name:
-                    return name
+        if similarity < 0.4:
+            continue
 
-    return None
+        if entry["vector"] and entry["lexical"]:
+            match = "hybrid"
+        elif entry["vector"]:
+            match = "vector"
+        else:
+            match = "lexical"
 
+        results.append(_search_result(idx, similarity, match))
 
-def extract_years(text: str):
-    years = re.findall(r"(?:民國)?(\d{2,3})年", text)
-    years = [int(y) for y in years]
+    return results[:k]
 
-    # 補：支援單獨數字（85 113）
-    years2 = re.findall(r"\b(8[0-9]|9[0-9]|10[0-9]|11[0-9])\b", text)
-    years += [int(y) for y in years2]
 
-    return sorted(list(set(years)))
+def search_energy_records_batch(questions, k: int = 20, years=None):
+    """
+    多個問題一起檢索：字詞檢索逐題做，
+    需要向量檢索的問題只呼叫一次 embedding，同年份的問題一起查 FAISS
+    """
+    years = list(years) if years is not None else [None] * len(questions)
+    results = [[] for _ in questions]
 
+    lexical = {}
+    need_vector = []
 
-# =====================================================
-# 問題意圖判斷
-# =====================================================
-def detect_intent(user_text: str, year=None, department=None, energy_name=None):
-    text = user_text.strip()
-    years = extract_years(text)
-    departments = extract_departments(text)
-    # 0. 多年份整體最多能源
-    if (
-        len(years) >= 2
-        and ("最多" in text or "最大" in text)
-        and ("能源" in text or "資源" in text)
-        and (
-            "分別" in text
-            or "各自" in text
-            or "各年" in text
-            or "跟" in text
-            or "和" in text
-        )
-    ):
-        return "top_energy_overall"
-
-    # 0. 多年份整體能源比較
-    if (
-        len(years) >= 2
-        and ("比較" in text or "差異" in text or "差別" in text)
-        and ("能源" in text or "資源" in text)
-        and department is None
-    ):
-        return "compare_years_overall"
-
-    # 1. 同部門跨年份比較
-    if (
-        len(years) >= 2
-        and department
-        and ("差" in text or "比較" in text or "差異" in text)
-    ):
-        return "compare_department_across_years"
-
-    # 2. 同年份跨部門比較
-    if len(departments) >= 2 and ("差" in text or "比較" in text or "差異" in text):
-        return "compare_departments_same_year"
-
-    # 3. 問整體最多能源
-    if (
-        (
-            "最多" in text
-            or "最大" in text
-            or "排名" in text
-            or "前" in text  # ⭐關鍵！
-            or "top" in text.lower()
-        )
-        and (
-            "能源" in text
-            or "使用量" in text
-            or energy_name is not None
-            or "資源" in text
-        )
-        and department is None
-    ):
-        return "top_energy_overall"
-
-    # 4. 問某部門主要用哪些能源
-    if department and (
-        "主要使用" in text
-        or "使用哪些能源" in text
-        or "用哪些能源" in text
-        or "主要用什麼能源" in text
-        or "都用什麼" in text
-        or ("部門" in text and "能源" in text and "哪些" in text)
-        or ("部門" in text and "前五" in text)
-        or ("部門" in text and "最多" in text)
-    ):
-        return "top_energy_by_department"
-
-    # 5. 問某能源用在哪些部門
-    if energy_name and (
-        "哪些部門使用" in text
-        or "用在哪些部門" in text
-        or "有哪些部門" in text
-        or "哪些部門有用" in text
-        or "誰在用" in text
-        or "哪些部門有用到" in text
-        or "哪些人用" in text
-        or ("部門" in text and ("使用" in text or "有用" in text or "有用到" in text))
-    ):
-        return "top_department_by_energy"
-
-    # 6. 問某部門有沒有使用某能源
-    if (
-        department
-        and energy_name
-        and (
-            "有沒有使用" in text
-            or "有沒有用" in text
-            or "有用嗎" in text
-            or "有用到嗎" in text
-            or "是否使用" in text
-            or "有沒有" in text
-            or ("是否" in text and "使用" in text)
-        )
-    ):
-        return "check_usage"
+    for n, (question, year) in enumerate(zip(questions, years)):
+        year_ids = None
 
-    # 7. 如果有能源且問部門，但沒明確句型，也視為能源→部門
-    if energy_name and department is None and "部門" in text:
-        return "top_department_by_energy"
+        if year is not None:
+            year_ids = YEAR_IDS.get(year)
 
-    # 8. 如果有部門但沒明確句型，也常常是部門→能源
-    if department and energy_name is None and ("能源" in text or "資源" in text):
-        return "top_energy_by_department"
-
-    #  fallback（避免掉到 semantic_search）
-    if year and ("能源" in text or "使用量" in text or "前" in text):
-        return "top_energy_overall"
+            # 該年份沒有任何資料，不必做向量檢索
+            if year_ids is None:
+                continue
 
-    return "semantic_search"
+        lexical_hits, fast = _lexical_stage(question, k, year_ids)
 
+        if fast is not None:
+            results[n] = fast
+        else:
+            lexical[n] = lexical_hits
+            need_vector.append(n)
 
-# =====================================================
-# 向量檢索
-# =====================================================
-def search_energy_records(question: str, k: int = 20):
-    q_emb = model.encode([question], convert_to_numpy=True).astype("float32")
-    distances, indices = index.search(q_emb, k)
+    if not need_vector:
+        return results
 
-    results = []
+    q_emb = embedder.encode([questions[n] for n in need_vector])
 
-    for dist, idx in zip(distances[0], indices[0]):
-        if 0 <= idx < len(records):
-            item = records[idx].copy()
+    by_year = {}
+    for row, n in enumerate(need_vector):
+        by_year.setdefault(years[n], []).append((row, n))
 
-            similarity = 1 / (1 + float(dist))
-            item["similarity"] = similarity
-            item["score"] = round(similarity * 100, 2)
+    for year, items in by_year.items():
+        selector = YEAR_SELECTORS.get(year) if year is not None else None
+        rows = [row for row, _ in items]
 
-            if similarity < 0.4:
-                continue
+        distances, indices = search_index(index, q_emb[rows], k, selector=selector)
 
-            results.append(item)
+        for i, (_, n) in enumerate(items):
+            results[n] = _fuse(distances[i], indices[i], lexical[n], k)
 
     return results
 
 
+def search_energy_records(question: str, k: int = 20, year=None):
+    return search_energy_records_batch([question], k=k, years=[year])[0]
+
+
 # =====================================================
 # ratio 資料篩選
 # =====================================================
-def get_ratio_records(year=None, department=None, energy_name=None):
-    result = [
-        r
-        for r in records
-        if (
-            r.get("record_type") == "ratio"
-            and r.get("sheet") == "總比例換算"
-            # 🔥 排除總計
-            and str(r.get("supply_code", "")).strip() != "S54"
-            # 🔥 排除 D1
-            and str(r.get("demand_code", "")).strip() != "D1"
-            # 🔥 排除名稱型總計（保險）
-            and "總計" not in str(r.get("supply_name_zh", ""))
-            and "能源消費" not in str(r.get("demand_name", ""))
-        )
-    ]
+RATIO_MASK = (
+    store.equals("record_type", "ratio")
+    & store.equals("sheet", "總比例換算")
+    # 🔥 排除總計
+    & ~store.match("supply_code", lambda v: str(v).strip() == "S54")
+    # 🔥 排除 D1
+    & ~store.match("demand_code", lambda v: str(v).strip() == "D1")
+    # 🔥 排除名稱型總計（保險）
+    & ~store.match("supply_name_zh", lambda v: "總計" in str(v))
+    & ~store.match("demand_name", lambda v: "能源消費" in str(v))
+)
+
+
+# 批次回答時共用的掃描結果：year（None = 全部年份）-> 符合 RATIO_MASK 的 row id
+# 每個年份只掃描一次，部門 / 能源再在這些 row 上各自過濾
+_batch_scans = contextvars.ContextVar("batch_scans", default=None)
+
+
+def _ratio_rows(year):
+    scans = _batch_scans.get()
+
+    if scans is not None and year in scans:
+        return scans[year]
+
+    mask = RATIO_MASK
 
     if year is not None:
-        result = [r for r in result if r.get("year") == year]
+        mask = mask & store.equals("year", year)
+
+    rows = store.where(mask)
+
+    if scans is not None:
+        scans[year] = rows
+
+    return rows
+
+
+def get_ratio_records(year=None, department=None, energy_name=None):
+    # 只在欄位上過濾，最後才展開符合的 records
+    rows = _ratio_rows(year)
 
     if department is not None:
-        result = [
-            r
-            for r in result
-            if str(r.get("demand_name", "")).strip() == department.strip()
+        rows = rows[
+            store.match(
+                "demand_name", lambda v: str(v).strip() == department.strip(), rows
+            )
         ]
 
     if energy_name is not None:
-        result = [
-            r
-            for r in result
-            if str(r.get("supply_name_zh", "")).strip() == energy_name.strip()
+        rows = rows[
+            store.match(
+                "supply_name_zh", lambda v: str(v).strip() == energy_name.strip(), rows
+            )
         ]
 
-    return result
+    return store.rows(rows)
 
 
 # =====================================================
 # 某年某部門主要能源
 # =====================================================
-def answer_top_energy_by_department(department: str, year=None, top_n: int = 5):
+def answer_top_energy_by_department(
+    department: str, year=None, top_n: int = 5, lang: str = DEFAULT_LANG
+):
     ratio_records = get_ratio_records(year=year, department=department)
+    department_text = department_label(department, lang)
 
     if not ratio_records:
-        year_text = f"{year}年" if year else "指定年度"
         return {
             "success": False,
-            "answer": f"找不到「{year_text}{department}」的能源資料。",
+            "answer": render(
+                "department_not_found",
+                lang,
+                year=year_label(year, lang),
+                department=department_text,
+            ),
             "sources": [],
             "results": [],
         }
@@ -538,24 +344,20 @@ def answer_top_energy_by_department(department: str, year=None, top_n: int = 5):
     ratio_records = sorted(ratio_records, key=lambda x: x.get("value", 0), reverse=True)
     top = ratio_records[:top_n]
 
-    year_text = f"{year}年" if year else "各年度"
-    answer = (
-        f"根據{year_text}已生成的能源資料，{department}主要使用的能源包括："
-        + "、".join(
-            [
-                f"{r['supply_name_zh']}"
-                f"（比例 {round(r['value'],2)}%"
-                f"｜使用量 {round(r.get('total_supply',0) * r['value'] / 1000,2):,}公噸油當量（toe））"
-                for r in top
-            ]
-        )
-        + "。"
+    answer = render(
+        "top_by_department",
+        lang,
+        year=year_label(year, lang, missing="all_years"),
+        department=department_text,
+        items=join_items(
+            [usage_item(energy_label(r, lang), r, lang) for r in top], lang
+        ),
     )
 
     return {
         "success": True,
         "answer": answer,
-        "sources": ["energy_rag_all_years_meta.json", "energy_rag_all_years.index"],
+        "sources": ["energy_rag_all_years_store", "energy_rag_all_years.index"],
         "results": top,
     }
 
@@ -563,14 +365,21 @@ def answer_top_energy_by_department(department: str, year=None, top_n: int = 5):
 # =====================================================
 # 某年某能源主要用在哪些部門
 # =====================================================
-def answer_top_department_by_energy(energy_name: str, year=None, top_n: int = 5):
+def answer_top_department_by_energy(
+    energy_name: str, year=None, top_n: int = 5, lang: str = DEFAULT_LANG
+):
     ratio_records = get_ratio_records(year=year, energy_name=energy_name)
+    energy_text = energy_name_label(energy_name, lang, ratio_records)
 
     if not ratio_records:
-        year_text = f"{year}年" if year else "指定年度"
         return {
             "success": False,
-            "answer": f"找不到「{year_text}{energy_name}」的資料。",
+            "answer": render(
+                "energy_not_found",
+                lang,
+                year=year_label(year, lang),
+                energy=energy_text,
+            ),
             "sources": [],
             "results": [],
         }
@@ -585,22 +394,21 @@ def answer_top_department_by_energy(energy_name: str, year=None, top_n: int = 5)
         if dept not in seen:
             seen.add(dept)
             answer_parts.append(
-                f"{dept}"
-                f"（比例 {round(r['value'],2)}%"
-                f"｜使用量 {round(r.get('total_supply',0) * r['value'] / 1000,2):,}公噸油當量（toe））"
+                usage_item(department_label(dept, lang, r.get("demand_code")), r, lang)
             )
 
-    year_text = f"{year}年" if year else "各年度"
-    answer = (
-        f"根據{year_text}已生成的能源資料，{energy_name}主要使用於："
-        + "、".join(answer_parts)
-        + "。"
+    answer = render(
+        "top_by_energy",
+        lang,
+        year=year_label(year, lang, missing="all_years"),
+        energy=energy_text,
+        items=join_items(answer_parts, lang),
     )
 
     return {
         "success": True,
         "answer": answer,
-        "sources": ["energy_rag_all_years_meta.json", "energy_rag_all_years.index"],
+        "sources": ["energy_rag_all_years_store", "energy_rag_all_years.index"],
         "results": top,
     }
 
@@ -608,18 +416,27 @@ def answer_top_department_by_energy(energy_name: str, year=None, top_n: int = 5)
 # =====================================================
 # 某年某部門有沒有使用某能源
 # =====================================================
-def answer_check_usage(department: str, energy_name: str, year=None):
+def answer_check_usage(
+    department: str, energy_name: str, year=None, lang: str = DEFAULT_LANG
+):
     matches = get_ratio_records(
         year=year, department=department, energy_name=energy_name
     )
 
-    year_text = f"{year}年" if year else "指定年度"
+    year_text = year_label(year, lang)
+    department_text = department_label(department, lang)
 
     if not matches:
         return {
             "success": True,
-            "answer": f"根據{year_text}已生成的能源資料，{department}沒有使用{energy_name}。",
-            "sources": ["energy_rag_all_years_meta.json"],
+            "answer": render(
+                "not_uses_energy",
+                lang,
+                year=year_text,
+                department=department_text,
+                energy=energy_name_label(energy_name, lang),
+            ),
+            "sources": ["energy_rag_all_years_store"],
             "results": [],
         }
 
@@ -628,8 +445,14 @@ def answer_check_usage(department: str, energy_name: str, year=None):
 
     return {
         "success": True,
-        "answer": f"根據{year_text}已生成的能源資料，{department}有使用{energy_name}（比例{round(best['value'],2)}%）｜使用量 {round(best.get('total_supply',0) * best['value'] / 1000,2):,}公噸油當量（toe））。",
-        "sources": ["energy_rag_all_years_meta.json"],
+        "answer": render(
+            "uses_energy",
+            lang,
+            year=year_text,
+            department=department_text,
+            item=usage_item(energy_label(best, lang), best, lang),
+        ),
+        "sources": ["energy_rag_all_years_store"],
         "results": [best],
     }
 
@@ -637,14 +460,13 @@ def answer_check_usage(department: str, energy_name: str, year=None):
 # =====================================================
 # 某年整體最多能源
 # =====================================================
-def answer_top_energy_overall(year=None, top_n: int = 5):
+def answer_top_energy_overall(year=None, top_n: int = 5, lang: str = DEFAULT_LANG):
     ratio_records = get_ratio_records(year=year)
 
     if not ratio_records:
-        year_text = f"{year}年" if year else "指定年度"
         return {
             "success": False,
-            "answer": f"找不到「{year_text}」的整體能源資料。",
+            "answer": render("overall_not_found", lang, year=year_label(year, lang)),
             "sources": [],
             "results": [],
         }
@@ -658,6 +480,7 @@ def answer_top_energy_overall(year=None, top_n: int = 5):
         if name not in agg:
             agg[name] = {
                 "supply_name_zh": name,
+                "supply_name_en": r.get("supply_name_en", ""),
                 "supply_code": code,
                 "value": 0,
                 "total_supply": r.get("total_supply", 0),
@@ -667,24 +490,19 @@ def answer_top_energy_overall(year=None, top_n: int = 5):
     sorted_items = sorted(agg.values(), key=lambda x: x["value"], reverse=True)
     top = sorted_items[:top_n]
 
-    year_text = f"民國{year}年" if year else "指定年度"
-    answer = (
-        f"根據{year_text}已生成的能源資料，使用量最多的能源包括："
-        + "、".join(
-            [
-                f"{r['supply_name_zh']}"
-                f"（比例 {round(r['value'],2)}%"
-                f"｜使用量 {round(r.get('total_supply',0) * r['value'] / 1000,2):,}公噸油當量（toe））"
-                for r in top
-            ]
-        )
-        + "。"
+    answer = render(
+        "top_overall",
+        lang,
+        year=year_label(year, lang, roc=True),
+        items=join_items(
+            [usage_item(energy_label(r, lang), r, lang) for r in top], lang
+        ),
     )
 
     return {
         "success": True,
         "answer": answer,
-        "sources": ["energy_rag_all_years_meta.json"],
+        "sources": ["energy_rag_all_years_store"],
         "results": top,
         "card_type": "energy_cards",
     }
@@ -699,11 +517,17 @@ def get_top_energies_for_department(department: str, year=None, top_n: int = 5):
     return ratio_records[:top_n]
 
 
-def answer_multi_year_top_energy(years, top_n=5):
+def _usage_items(records, lang):
+    return join_items(
+        [usage_item(energy_label(e, lang), e, lang) for e in records], lang
+    )
+
+
+def answer_multi_year_top_energy(years, top_n=5, lang: str = DEFAULT_LANG):
     results = []
 
     for y in years:
-        r = answer_top_energy_overall(year=y, top_n=top_n)
+        r = answer_top_energy_overall(year=y, top_n=top_n, lang=lang)
 
         if r["success"]:
             results.append({"year": y, "top": r["results"]})
@@ -711,20 +535,22 @@ def answer_multi_year_top_energy(years, top_n=5):
     if not results:
         return {
             "success": False,
-            "answer": "找不到多年份資料",
+            "answer": render("multi_year_not_found", lang),
             "results": [],
         }
 
-    answer = "各年度使用量最多能源如下：\n\n"
+    answer = render("multi_year_title", lang)
 
     for r in results:
-        names = "、".join(
-            [
-                f"{e['supply_name_zh']}（比例 {round(e['value'],2)}%｜使用量 {round(e.get('total_supply',0) * e['value'] / 1000,2):,}"
-                for e in r["top"]
-            ]
+        answer += (
+            render(
+                "labeled_line",
+                lang,
+                label=year_label(r["year"], lang),
+                items=_usage_items(r["top"], lang),
+            )
+            + "\n"
         )
-        answer += f"{r['year']}年：{names}\n"
 
     return {
         "success": True,
@@ -732,37 +558,33 @@ def answer_multi_year_top_energy(years, top_n=5):
         "years": [r["year"] for r in results],
         "results": results,
         "card_type": "multi_year",
-        "sources": ["energy_rag_all_years_meta.json", "energy_rag_all_years.index"],
+        "sources": ["energy_rag_all_years_store", "energy_rag_all_years.index"],
     }
 
 
-def answer_compare_years_overall(years, top_n=5):
+def answer_compare_years_overall(years, top_n=5, lang: str = DEFAULT_LANG):
     years = sorted(years)
 
     results = []
 
     for y in years:
-        r = answer_top_energy_overall(year=y, top_n=top_n)
+        r = answer_top_energy_overall(year=y, top_n=top_n, lang=lang)
         if r["success"]:
             results.append({"year": y, "top": r["results"]})
 
     if not results:
         return {
             "success": False,
-            "answer": "找不到相關年份資料。",
+            "answer": render("years_not_found", lang),
             "results": [],
         }
 
-    answer = "### 多年度能源比較\n\n"
+    answer = render("compare_years_title", lang)
 
     for r in results:
-        answer += f"\n**{r['year']}年**\n\n"
+        answer += f"\n**{year_label(r['year'], lang)}**\n\n"
         for e in r["top"]:
-            answer += (
-                f"- {e['supply_name_zh']}"
-                f"（比例 {round(e['value'],2)}%"
-                f"｜使用量 {round(e.get('total_supply',0) * e['value'] / 1000,2):,}公噸油當量（toe））\n"
-            )
+            answer += f"- {usage_item(energy_label(e, lang), e, lang)}\n"
 
     return {
         "success": True,
@@ -777,7 +599,9 @@ def answer_compare_years_overall(years, top_n=5):
 # 問題：同部門跨年份比較
 # 例：85年和113年工業部門主要能源差異
 # =====================================================
-def answer_compare_department_across_years(department, years, top_n=5):
+def answer_compare_department_across_years(
+    department, years, top_n=5, lang: str = DEFAULT_LANG
+):
     years = sorted(years)
 
     results = []
@@ -786,16 +610,22 @@ def answer_compare_department_across_years(department, years, top_n=5):
         top = get_top_energies_for_department(department, year=y, top_n=top_n)
         results.append({"year": y, "top": top})
 
-    answer = f"### {department} 多年度能源比較\n\n"
+    answer = render(
+        "compare_department_title",
+        lang,
+        department=department_label(department, lang),
+    )
 
     for r in results:
-        names = "、".join(
-            [
-                f"{e['supply_name_zh']}（比例 {round(e['value'],2)}%｜使用量 {round(e.get('total_supply',0) * e['value'] / 1000,2):,}公噸油當量（toe））"
-                for e in r["top"]
-            ]
+        answer += (
+            render(
+                "labeled_line",
+                lang,
+                label=year_label(r["year"], lang),
+                items=_usage_items(r["top"], lang),
+            )
+            + "\n\n"
         )
-        answer += f"{r['year']}年：{names}\n\n"
 
     return {
         "success": True,
@@ -810,24 +640,27 @@ def answer_compare_department_across_years(department, years, top_n=5):
 # 問題：同年份跨部門比較
 # 例：113年工業部門和住宅部門主要能源差異
 # =====================================================
-def answer_compare_departments_same_year(departments, year=None, top_n=5):
+def answer_compare_departments_same_year(
+    departments, year=None, top_n=5, lang: str = DEFAULT_LANG
+):
     results = []
 
     for dept in departments:
         top = get_top_energies_for_department(dept, year=year, top_n=top_n)
         results.append({"department": dept, "top": top})
 
-    year_text = f"{year}年" if year else "指定年度"
-    answer = f"### {year_text} 多部門能源比較\n\n"
+    answer = render("compare_departments_title", lang, year=year_label(year, lang))
 
     for r in results:
-        names = "、".join(
-            [
-                f"{e['supply_name_zh']}（比例 {round(e['value'],2)}%｜使用量 {round(e.get('total_supply',0) * e['value'] / 1000,2)}公噸油當量（toe））"
-                for e in r["top"]
-            ]
+        answer += (
+            render(
+                "labeled_line",
+                lang,
+                label=department_label(r["department"], lang),
+                items=_usage_items(r["top"], lang),
+            )
+            + "\n\n"
         )
-        answer += f"{r['department']}：{names}\n\n"
 
     return {
         "success": True,
@@ -838,52 +671,49 @@ def answer_compare_departments_same_year(departments, year=None, top_n=5):
 
 
 # =====================================================
-# 抽兩個部門
+# fallback：語意檢索
 # =====================================================
-def extract_departments(text: str):
-    found = []
-    for dept in DEPARTMENTS:
-        if dept in text and dept not in found:
-            found.append(dept)
-
-    for alias, canonical in sorted(
-        DEPARTMENT_SYNONYMS.items(), key=lambda x: len(x[0]), reverse=True
-    ):
-        if alias in text and canonical not in found:
-            found.append(canonical)
+def answer_by_semantic_search(user_text: str, year=None, lang: str = DEFAULT_LANG):
+    retrieved = search_energy_records(user_text, k=12, year=year)
+    return _semantic_answer(retrieved, year, lang)
 
-    return found
 
+def _semantic_line(r, lang):
+    # 中文直接用 record 原文；其他語系只有 ratio record 有足夠欄位可以套模板
+    if lang == DEFAULT_LANG or r.get("record_type") != "ratio":
+        return r["text"]
 
-# =====================================================
-# fallback：語意檢索
-# =====================================================
-def answer_by_semantic_search(user_text: str, year=None):
-    retrieved = search_energy_records(user_text, k=12)
+    return render(
+        "semantic_ratio",
+        lang,
+        year=year_label(r.get("year"), lang, missing="related_years"),
+        department=department_label(r.get("demand_name"), lang, r.get("demand_code")),
+        item=usage_item(energy_label(r, lang), r, lang),
+    )
 
-    if year is not None:
-        retrieved = [r for r in retrieved if r.get("year") == year]
 
+def _semantic_answer(retrieved, year=None, lang: str = DEFAULT_LANG):
     ratio_first = [r for r in retrieved if r.get("record_type") == "ratio"]
     final_results = ratio_first[:5] if ratio_first else retrieved[:5]
 
     if not final_results:
         return {
             "success": False,
-            "answer": "找不到相關能源資料。",
+            "answer": render("semantic_not_found", lang),
             "sources": [],
             "results": [],
         }
 
-    year_text = f"{year}年" if year else "相關年度"
-    answer = f"根據{year_text}已生成的能源資料，找到以下相關內容：\n" + "\n".join(
-        [f"- {r['text']}" for r in final_results]
-    )
+    answer = render(
+        "semantic_intro",
+        lang,
+        year=year_label(year, lang, missing="related_years"),
+    ) + "\n".join([f"- {_semantic_line(r, lang)}" for r in final_results])
 
     return {
         "success": True,
         "answer": answer,
-        "sources": ["energy_rag_all_years_meta.json", "energy_rag_all_years.index"],
+        "sources": ["energy_rag_all_years_store", "energy_rag_all_years.index"],
         "results": final_results,
     }
 
@@ -891,53 +721,167 @@ def answer_by_semantic_search(user_text: str, year=None):
 # =====================================================
 # 主路由
 # =====================================================
-def answer_energy_question(user_text: str):
-    year = extract_year(user_text)
-    years = extract_years(user_text)
-    department = normalize_department(user_text)
-    departments = extract_departments(user_text)
-    energy_name = normalize_energy(user_text)
-    intent = detect_intent(
-        user_text, year=year, department=department, energy_name=energy_name
-    )
-    top_n = extract_top_n(user_text)
+def resolve_answer_route(user_text):
+    """
+    問題（字串或 ParsedQuery）→ (回答函式, 參數)
+
+    參數只保留該函式真正會用到的欄位，
+    不同問法只要解析結果相同就會得到同一組 key
+    """
+    q = parse_query(user_text)
+
+    year = q.year
+    years = q.years
+    department = q.department
+    departments = q.departments
+    energy_name = q.energy_name
+    intent = q.intent
+    top_n = q.top_n
+    lang = q.lang
 
     if intent == "compare_years_overall":
-        return answer_compare_years_overall(years, top_n=top_n)
+        return answer_compare_years_overall, {
+            "years": years,
+            "top_n": top_n,
+            "lang": lang,
+        }
 
     if intent == "compare_department_across_years":
         target_department = department or (departments[0] if departments else None)
         if target_department and len(years) >= 2:
-            return answer_compare_department_across_years(
-                target_department,
-                years,
-                top_n=top_n,
-            )
+            return answer_compare_department_across_years, {
+                "department": target_department,
+                "years": years,
+                "top_n": top_n,
+                "lang": lang,
+            }
 
     if intent == "compare_departments_same_year":
         if len(departments) >= 2:
-            return answer_compare_departments_same_year(
-                departments,
-                year=year,
-                top_n=top_n,
-            )
+            return answer_compare_departments_same_year, {
+                "departments": departments,
+                "year": year,
+                "top_n": top_n,
+                "lang": lang,
+            }
 
     if intent == "top_energy_overall":
 
         # ⭐ 多年份
         if len(years) >= 2:
-            return answer_multi_year_top_energy(years, top_n=top_n)
+            return answer_multi_year_top_energy, {
+                "years": years,
+                "top_n": top_n,
+                "lang": lang,
+            }
 
         # ⭐ 單年份
-        return answer_top_energy_overall(year=year, top_n=top_n)
+        return answer_top_energy_overall, {"year": year, "top_n": top_n, "lang": lang}
 
     if intent == "top_energy_by_department":
-        return answer_top_energy_by_department(department, year=year, top_n=top_n)
+        return answer_top_energy_by_department, {
+            "department": department,
+            "year": year,
+            "top_n": top_n,
+            "lang": lang,
+        }
 
     if intent == "top_department_by_energy":
-        return answer_top_department_by_energy(energy_name, year=year, top_n=top_n)
+        return answer_top_department_by_energy, {
+            "energy_name": energy_name,
+            "year": year,
+            "top_n": top_n,
+            "lang": lang,
+        }
 
     if intent == "check_usage":
-        return answer_check_usage(department, energy_name, year=year)
+        return answer_check_usage, {
+            "department": department,
+            "energy_name": energy_name,
+            "year": year,
+            "lang": lang,
+        }
+
+    # 語意檢索依賴原句，只有完全相同的問題才會命中快取
+    return answer_by_semantic_search, {
+        "user_text": q.text,
+        "year": year,
+        "lang": lang,
+    }
+
+
+def _answer_key(handler, kwargs):
+    return (DATA_VERSION, handler.__name__, tuple(sorted(kwargs.items())))
+
+
+def answer_energy_question(user_text):
+    handler, kwargs = resolve_answer_route(user_text)
+
+    key = _answer_key(handler, kwargs)
+    cached = answer_cache.get(key)
+
+    if cached is None:
+        cached = handler(**kwargs)
+        answer_cache.set(key, cached)
+
+    # 回傳副本，避免呼叫端修改到快取內容
+    return copy.deepcopy(cached)
+
+
+# =====================================================
+# 批次回答
+# =====================================================
+def answer_energy_questions(questions):
+    """
+    多個問題一起回答，依輸入順序回傳
+
+    - 解析結果相同（同一組 route）的問題只算一次
+    - 查表類問題每個年份只掃描一次 ratio rows，部門 / 能源再各自過濾
+    - 語意檢索的問題一次批次 embedding
+    """
+    routes = [resolve_answer_route(q) for q in questions]
+    keys = [_answer_key(handler, kwargs) for handler, kwargs in routes]
+
+    answers = {}
+    pending = {}
+
+    for key, route in zip(keys, routes):
+        if key in answers or key in pending:
+            continue
+
+        cached = answer_cache.get(key)
+        if cached is None:
+            pending[key] = route
+        else:
+            answers[key] = cached
+
+    semantic = []
+    token = _batch_scans.set({})
+
+    try:
+        # 依意圖分組，同類問題連續執行
+        for key, (handler, kwargs) in sorted(
+            pending.items(), key=lambda x: x[1][0].__name__
+        ):
+            if handler is answer_by_semantic_search:
+                semantic.append((key, kwargs))
+            else:
+                answers[key] = handler(**kwargs)
+    finally:
+        _batch_scans.reset(token)
+
+    if semantic:
+        retrieved = search_energy_records_batch(
+            [kwargs["user_text"] for _, kwargs in semantic],
+            k=12,
+            years=[kwargs["year"] for _, kwargs in semantic],
+        )
+
+        for (key, kwargs), records in zip(semantic, retrieved):
+            answers[key] = _semantic_answer(records, kwargs["year"], kwargs["lang"])
+
+    for key in pending:
+        answer_cache.set(key, answers[key])
 
-    return answer_by_semantic_search(user_text, year=year)
+    # 重複的問題各自拿一份副本
+    return [copy.deepcopy(answers[key]) for key in keys]
@@ -0,0 +1,466 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# =====================================================
+# 資料來源（前端 src/data）
+# =====================================================
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.getenv("ENERGY_DATA_DIR", BASE_DIR.parent / "src" / "data"))
+
+YEAR_FILE_RE = re.compile(r"^(\d{2,3})_energy_demand_supply\.json$")
+DEMAND_RATIO_FILE = "Demand_ratio_yearly.json"
+HIERARCHY_FILE = "hierarchy.json"
+SUPPLY_CATALOG_FILE = "supply_catalog.json"
+
+# Demand_ratio_yearly（各部門總計）放在 S54 這一欄
+TOTAL_SUPPLY_CODE = "S54"
+
+DIMS = ("year", "d", "s")
+AGGS = ("sum", "share", "rank", "yoy")
+
+# 可投影的欄位
+LABEL_FIELDS = {
+    "d_name": ("d", "name_zh"),
+    "d_name_en": ("d", "name_en"),
+    "d_level": ("d", "level"),
+    "d_parent": ("d", "parent"),
+    "s_name": ("s", "name_zh"),
+    "s_name_en": ("s", "name_en"),
+    "s_category": ("s", "category"),
+}
+
+
+def _code_key(code):
+    return int(code[1:]) if code[1:].isdigit() else 10**6
+
+
+def _as_list(value):
+    """
+    "D2,D4" / ["D2", "D4"] / "D2" → ["D2", "D4"]
+    """
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(",")
+
+    items = [str(v).strip() for v in items if str(v).strip()]
+    return items or None
+
+
+def _parse_years(value):
+    """
+    100-113 / "100,105" / [100, 105] / {"from": 100, "to": 113} → 排序後的年份 tuple
+    """
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, dict):
+        return ("range", int(value.get("from", 0)), int(value.get("to", 10**4)))
+
+    years = set()
+    for item in _as_list(value) or []:
+        if "-" in item:
+            start, end = item.split("-", 1)
+            years.update(range(int(start), int(end) + 1))
+        else:
+            years.add(int(item))
+
+    return tuple(sorted(years))
+
+
+def normalize_query(params):
+    """
+    GET 參數或 JSON → 正規化的查詢（也用來算 ETag）
+    """
+    params = params or {}
+
+    if not isinstance(params, dict):
+        raise ValueError("查詢必須是 JSON 物件")
+
+    try:
+        years = _parse_years(params.get("years"))
+        d_level = _as_list(params.get("d_level"))
+        d_level = tuple(sorted(int(v) for v in d_level)) if d_level else None
+        top = params.get("top")
+        top = int(top) if top not in (None, "") else None
+    except (TypeError, ValueError):
+        raise ValueError("years / d_level / top 必須是整數")
+
+    if top is not None and top <= 0:
+        raise ValueError("top 必須是正整數")
+
+    d_parent = params.get("d_parent")
+    if isinstance(d_parent, (list, tuple, dict)):
+        raise ValueError("d_parent 只能指定一個部門代碼")
+    d_parent = str(d_parent).strip() if d_parent is not None else ""
+
+    group_by = _as_list(params.get("group_by"))
+    group_by = tuple(d for d in DIMS if d in group_by) if group_by else ("year",)
+
+    unknown = set(_as_list(params.get("group_by")) or []) - set(DIMS)
+    if unknown:
+        raise ValueError(f"group_by 只能是 {', '.join(DIMS)}")
+
+    agg = str(params.get("agg") or "sum").lower()
+    if agg not in AGGS:
+        raise ValueError(f"agg 只能是 {', '.join(AGGS)}")
+
+    if agg == "yoy" and "year" not in group_by:
+        raise ValueError("agg=yoy 需要 group_by 包含 year")
+
+    fields = _as_list(params.get("fields"))
+
+    return {
+        "years": years,
+        "d": tuple(_as_list(params.get("d")) or ()) or None,
+        "d_level": d_level,
+        "d_parent": d_parent or None,
+        "s": tuple(_as_list(params.get("s")) or ()) or None,
+        "s_category": tuple(_as_list(params.get("s_category")) or ()) or None,
+        "group_by": group_by,
+        "agg": agg,
+        "fields": tuple(fields) if fields else None,
+        "top": top,
+        "include_zero": str(params.get("include_zero", "false")).lower() == "true",
+    }
+
+
+def query_key(q):
+    return json.dumps(q, ensure_ascii=False, sort_keys=True, default=list)
+
+
+# =====================================================
+# year × D × S cube
+# =====================================================
+class EnergyCube:
+    """
+    values[year, d, s]：各年度部門（D）使用能源（S）的比例
+
+    - S54 為 Demand_ratio_yearly 的部門總計，只有明確指定 s=S54 才會選到
+    - D 同時包含上下層（例如 D2 與其子部門），跨部門加總時請搭配 d_level
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self.version = self.signature(self.data_dir)
+
+        year_files = {}
+        for path in self.data_dir.iterdir():
+            m = YEAR_FILE_RE.match(path.name)
+            if m:
+                year_files[int(m.group(1))] = path
+
+        raw = {
+            year: json.loads(path.read_text(encoding="utf-8"))
+            for year, path in sorted(year_files.items())
+        }
+        demand = self._read_json(DEMAND_RATIO_FILE) or {}
+
+        self.d_meta = self._demand_hierarchy(self._read_json(HIERARCHY_FILE) or {})
+        self.s_meta = {
+            code: {
+                "name_zh": item.get("name_zh"),
+                "name_en": item.get("name_en"),
+                "category": item.get("category"),
+            }
+            for code, item in (self._read_json(SUPPLY_CATALOG_FILE) or {}).items()
+        }
+        self.s_meta.setdefault(
+            TOTAL_SUPPLY_CODE,
+            {"name_zh": "總計", "name_en": "Total", "category": "Total"},
+        )
+
+        d_codes = set(self.d_meta)
+        s_codes = {TOTAL_SUPPLY_CODE}
+        for rows in raw.values():
+            d_codes.update(rows)
+            for row in rows.values():
+                s_codes.update(row)
+        for rows in demand.values():
+            d_codes.update(rows)
+
+        self.years = sorted(set(raw) | {int(y) for y in demand})
+        self.d_codes = sorted(d_codes, key=_code_key)
+        self.s_codes = sorted(s_codes, key=_code_key)
+
+        self.year_pos = {y: n for n, y in enumerate(self.years)}
+        self.d_pos = {c: n for n, c in enumerate(self.d_codes)}
+        self.s_pos = {c: n for n, c in enumerate(self.s_codes)}
+
+        self.values = np.zeros(
+            (len(self.years), len(self.d_codes), len(self.s_codes)), dtype=np.float64
+        )
+
+        for year, rows in raw.items():
+            y = self.year_pos[year]
+            for d, row in rows.items():
+                for s, v in row.items():
+                    self.values[y, self.d_pos[d], self.s_pos[s]] = float(v or 0)
+
+        total = self.s_pos[TOTAL_SUPPLY_CODE]
+        for year, row in demand.items():
+            y = self.year_pos[int(year)]
+            for d, v in row.items():
+                self.values[y, self.d_pos[d], total] = float(v or 0)
+
+    # -------------------------------------------------
+    # 載入
+    # -------------------------------------------------
+    @staticmethod
+    def signature(data_dir):
+        """
+        來源檔案名稱 / 大小 / 修改時間 → 版本字串（也是 ETag 的一部分）
+        """
+        digest = hashlib.blake2b(digest_size=12)
+
+        for path in sorted(Path(data_dir).iterdir()):
+            if YEAR_FILE_RE.match(path.name) or path.name in (
+                DEMAND_RATIO_FILE,
+                HIERARCHY_FILE,
+                SUPPLY_CATALOG_FILE,
+            ):
+                stat = path.stat()
+                digest.update(
+                    f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode()
+                )
+
+        return digest.hexdigest()
+
+    def _read_json(self, name):
+        path = self.data_dir / name
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def _demand_hierarchy(tree, parent=None, out=None):
+        out = {} if out is None else out
+
+        for code, node in tree.items():
+            out[code] = {
+                "name_zh": node.get("name_zh"),
+                "name_en": node.get("name_en"),
+                "level": node.get("level"),
+                "parent": parent,
+            }
+            EnergyCube._demand_hierarchy(node.get("children", {}), code, out)
+
+        return out
+
+    # -------------------------------------------------
+    # 維度
+    # -------------------------------------------------
+    def descendants(self, code):
+        found = []
+        frontier = [code]
+
+        while frontier:
+            parent = frontier.pop()
+            children = [c for c, m in self.d_meta.items() if m["parent"] == parent]
+            found.extend(children)
+            frontier.extend(children)
+
+        return found
+
+    def meta(self):
+        d_fields = ("name_zh", "name_en", "level", "parent")
+        s_fields = ("name_zh", "name_en", "category")
+
+        return {
+            "version": self.version,
+            "years": self.years,
+            "d": {
+                "code": self.d_codes,
+                **{
+                    f: [self.d_meta.get(c, {}).get(f) for c in self.d_codes]
+                    for f in d_fields
+                },
+            },
+            "s": {
+                "code": self.s_codes,
+                **{
+                    f: [self.s_meta.get(c, {}).get(f) for c in self.s_codes]
+                    for f in s_fields
+                },
+            },
+        }
+
+    def _select(self, q):
+        # 年份
+        if q["years"] is None:
+            years = self.years
+        elif q["years"] and q["years"][0] == "range":
+            _, start, end = q["years"]
+            years = [y for y in self.years if start <= y <= end]
+        else:
+            years = [y for y in q["years"] if y in self.year_pos]
+
+        # 部門
+        d_codes = list(q["d"]) if q["d"] else list(self.d_codes)
+        if q["d_parent"]:
+            under = set(self.descendants(q["d_parent"])) | {q["d_parent"]}
+            d_codes = [c for c in d_codes if c in under]
+        if q["d_level"]:
+            d_codes = [
+                c
+                for c in d_codes
+                if self.d_meta.get(c, {}).get("level") in q["d_level"]
+            ]
+        d_codes = [c for c in d_codes if c in self.d_pos]
+
+        # 能源（S54 總計只在明確指定時選到）
+        if q["s"]:
+            s_codes = [c for c in q["s"] if c in self.s_pos]
+        else:
+            s_codes = [c for c in self.s_codes if c != TOTAL_SUPPLY_CODE]
+        if q["s_category"]:
+            s_codes = [
+                c
+                for c in s_codes
+                if self.s_meta.get(c, {}).get("category") in q["s_category"]
+            ]
+
+        return years, d_codes, s_codes
+
+    # -------------------------------------------------
+    # 查詢
+    # -------------------------------------------------
+    def query(self, q):
+        """
+        q 為 normalize_query 的結果，回傳欄位式結果
+        {"columns": [...], "data": {欄位: [...]}, "rows": n}
+        """
+        years, d_codes, s_codes = self._select(q)
+        group_by, agg = q["group_by"], q["agg"]
+
+        labels = {
+            "year": years,
+            "d": d_codes,
+            "s": s_codes,
+        }
+
+        # 全部年份一起算（yoy 需要前一年）
+        arr = self.values[:, [self.d_pos[c] for c in d_codes]][
+            :, :, [self.s_pos[c] for c in s_codes]
+        ]
+
+        axes = tuple(n for n, dim in enumerate(DIMS) if dim not in group_by and n)
+        if axes:
+            arr = arr.sum(axis=axes, keepdims=True)
+
+        extra = None
+
+        if agg == "yoy":
+            prev = np.full_like(arr, np.nan)
+            for n, year in enumerate(self.years):
+                if year - 1 in self.year_pos:
+                    prev[n] = arr[self.year_pos[year - 1]]
+            extra = arr - prev
+
+        rows = [self.year_pos[y] for y in years]
+        arr = arr[rows]
+        if extra is not None:
+            extra = extra[rows]
+
+        if "year" not in group_by:
+            arr = arr.sum(axis=0, keepdims=True)
+
+        # 年份內（或整體）的名次：值大的排前面
+        flat = arr.reshape(arr.shape[0], -1)
+        order = np.argsort(-flat, axis=1, kind="stable")
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(1, flat.shape[1] + 1)[None, :], axis=1)
+        rank = rank.reshape(arr.shape)
+
+        if agg == "share":
+            denom = arr.sum(axis=(1, 2), keepdims=True)
+            extra = np.divide(
+                arr * 100, denom, out=np.full_like(arr, np.nan), where=denom != 0
+            )
+        elif agg == "rank":
+            extra = rank
+
+        # 篩選
+        keep = np.ones(arr.shape, dtype=bool)
+        if not q["include_zero"]:
+            keep &= arr != 0
+            if agg == "yoy":
+                keep |= np.nan_to_num(extra) != 0
+        if q["top"]:
+            keep &= rank <= q["top"]
+
+        idx = np.nonzero(keep)
+
+        # 名次排序時，依年份 → 名次
+        if agg == "rank" or q["top"]:
+            sort = np.lexsort((rank[idx], idx[0]))
+            idx = tuple(i[sort] for i in idx)
+
+        columns = {}
+
+        for n, dim in enumerate(DIMS):
+            if dim in group_by:
+                values = labels[dim]
+                columns[dim] = [values[i] for i in idx[n]]
+
+        columns["value"] = [round(float(v), 6) for v in arr[idx]]
+
+        if agg != "sum":
+            columns[agg] = [
+                (
+                    None
+                    if np.isnan(v)
+                    else (int(v) if agg == "rank" else round(float(v), 6))
+                )
+                for v in np.asarray(extra[idx], dtype=np.float64)
+            ]
+
+        for field, (dim, key) in LABEL_FIELDS.items():
+            if dim in group_by:
+                meta = self.d_meta if dim == "d" else self.s_meta
+                columns[field] = [meta.get(c, {}).get(key) for c in columns[dim]]
+
+        # 投影
+        default = [d for d in DIMS if d in group_by] + ["value"]
+        if agg != "sum":
+            default.append(agg)
+
+        fields = list(q["fields"]) if q["fields"] else default
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"無法投影的欄位：{', '.join(unknown)}")
+
+        return {
+            "columns": fields,
+            "data": {f: columns[f] for f in fields},
+            "rows": len(columns["value"]),
+        }
+
+
+# =====================================================
+# 共用實例（來源檔案變動時重新載入）
+# =====================================================
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_cube():
+    global _cube
+
+    version = EnergyCube.signature(DATA_DIR)
+
+    if _cube is None or _cube.version != version:
+        with _cube_lock:
+            if _cube is None or _cube.version != version:
+                _cube = EnergyCube(DATA_DIR)
+
+    return _cube
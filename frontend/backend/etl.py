@@ -0,0 +1,295 @@
+"""
+yearly Excel → 所有衍生資料（一次讀取）
+
+每個 Excel 只開一次、只解析一次，得到中介結果：
+  - demand_supply : {D: {S: 比例}}（總比例換算，排除 D1 / S54）
+  - s54           : {D: S54 合計比例}
+  - records       : RAG records（5 張比例類工作表）
+
+再由中介結果輸出：
+  - {year}_energy_demand_supply.json      （取代 src/scripts/convert.py）
+  - {year}_energy_euclidean_distance.json （取代 src/scripts/build_distance.py）
+  - Demand_ratio_yearly.json              （取代 src/scripts/extract_S54.py）
+  - historical_cost_pressure.json         （取代 scripts/build_cost_pressure.py）
+  - RAG store + manifest                  （同 build_energy_rag_all_years.py）
+
+用法：
+  python etl.py                       # 全部
+  python etl.py --only demand_supply distance
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from build_energy_rag_all_years import (
+    INGEST_WORKERS,
+    OUTPUT_STORE,
+    SUPPLY_CATALOG_PATH,
+    YEARLY_DIR,
+    extract_year_from_filename,
+    ingest_sheets,
+    load_workbook_sheets,
+    print_changes,
+    write_outputs,
+)
+from energy_cube import DATA_DIR, DEMAND_RATIO_FILE
+from ingest_manifest import (
+    changed_years,
+    diff_workbooks,
+    file_hash,
+    ingest_signature,
+    load_manifest,
+)
+from ratio_sheet import demand_supply_from_frame, s54_from_frame
+from scripts.build_cost_pressure import (
+    YEARS as COST_PRESSURE_YEARS,
+    build_cost_pressure,
+    load_cost_map,
+    write_cost_pressure,
+)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# src/scripts/build_distance.py（純函式，直接共用）
+sys.path.insert(0, str(BASE_DIR.parent / "src" / "scripts"))
+
+from build_distance import build_distance  # noqa: E402
+
+RATIO_SHEET = "總比例換算"
+
+ARTIFACTS = ("demand_supply", "distance", "s54", "cost_pressure", "rag")
+
+
+# =====================================================
+# 單一 Excel → 中介結果（在 worker process 執行）
+# =====================================================
+def parse_workbook(excel_path, year, supply_catalog_map, with_records=True):
+    """
+    回傳 dict：name / year / hash / size / demand_supply / s54 / records / logs
+
+    讀不到的部分為 None（records 為 []），原因寫在 logs
+    """
+    result = {
+        "name": excel_path.name,
+        "year": year,
+        "hash": file_hash(excel_path),
+        "size": excel_path.stat().st_size,
+        "demand_supply": None,
+        "s54": None,
+        "records": [],
+        "logs": [f"📘 處理 {excel_path.name}（{year}）"],
+    }
+
+    try:
+        sheets = load_workbook_sheets(excel_path)
+    except Exception as e:
+        result["logs"].append(f"❌ 讀取失敗: {e}")
+        return result
+
+    ratio = sheets.get(RATIO_SHEET)
+
+    if ratio is None:
+        result["logs"].append(f"  ❌ 找不到工作表 {RATIO_SHEET}")
+    else:
+        result["demand_supply"] = demand_supply_from_frame(ratio)
+        result["s54"] = s54_from_frame(ratio)
+
+        if result["s54"] is None:
+            result["logs"].append("  ⚠️ 找不到 S54")
+
+    if with_records:
+        result["records"], logs = ingest_sheets(sheets, year, supply_catalog_map)
+        result["logs"].extend(logs)
+
+    return result
+
+
+def parse_workbooks(jobs, supply_catalog_map, with_records=True, workers=INGEST_WORKERS):
+    """
+    jobs：[(year, excel_path)]，依 jobs 順序 yield 中介結果
+    """
+    workers = max(1, min(workers, len(jobs)))
+
+    if workers == 1:
+        for year, excel_path in jobs:
+            yield parse_workbook(excel_path, year, supply_catalog_map, with_records)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+
+        futures = [
+            pool.submit(
+                parse_workbook, excel_path, year, supply_catalog_map, with_records
+            )
+            for year, excel_path in jobs
+        ]
+
+        for future in futures:
+            yield future.result()
+
+
+# =====================================================
+# 輸出
+# =====================================================
+def write_json(path, data, **kwargs):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, **kwargs)
+
+
+def emit_demand_supply(parsed, output_dir):
+    for p in parsed:
+        if p["demand_supply"] is not None:
+            write_json(
+                output_dir / f"{p['year']}_energy_demand_supply.json",
+                p["demand_supply"],
+                ensure_ascii=False,
+            )
+
+
+def emit_distance(parsed, output_dir):
+    for p in parsed:
+        if p["demand_supply"]:
+            write_json(
+                output_dir / f"{p['year']}_energy_euclidean_distance.json",
+                {"Supply": build_distance(p["demand_supply"])},
+            )
+
+
+def emit_s54(parsed, output_dir):
+    write_json(
+        output_dir / DEMAND_RATIO_FILE,
+        {str(p["year"]): p["s54"] for p in parsed if p["s54"]},
+        ensure_ascii=False,
+    )
+
+
+def emit_cost_pressure(parsed, output_dir):
+    yearly_data = {
+        p["year"]: p["demand_supply"]
+        for p in parsed
+        if p["demand_supply"] is not None and p["year"] in COST_PRESSURE_YEARS
+    }
+
+    write_cost_pressure(
+        build_cost_pressure(yearly_data, load_cost_map(DATA_DIR)), str(output_dir)
+    )
+
+
+def emit_rag(parsed):
+    """
+    全部重新解析後整包寫入 store，manifest 一併更新（build_index 依此判斷要不要重建）
+    """
+    manifest = load_manifest()
+    signature = ingest_signature(SUPPLY_CATALOG_PATH)
+
+    previous = manifest.get("workbooks", {})
+
+    current = {}
+    all_records = []
+
+    for p in parsed:
+        current[p["name"]] = {
+            "year": p["year"],
+            # 有錯誤的 Excel 不記 hash，下次再重試
+            "hash": None if any("❌" in line for line in p["logs"]) else p["hash"],
+            "size": p["size"],
+            "start": len(all_records),
+            "count": len(p["records"]),
+        }
+        all_records.extend(p["records"])
+
+    changes = diff_workbooks(previous, current)
+    years = changed_years(changes, previous, current)
+
+    print_changes(changes, years)
+
+    meta = write_outputs(all_records, manifest, signature, current, changes, years)
+
+    print(f"📄 RAG records = {len(all_records)}（version {meta['version']}）")
+
+
+# =====================================================
+# main
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="yearly Excel → 所有衍生資料")
+    parser.add_argument("--only", nargs="+", choices=ARTIFACTS, default=ARTIFACTS)
+    parser.add_argument("--output-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    yearly_files = sorted(YEARLY_DIR.glob("*.xlsx"))
+
+    if not yearly_files:
+        raise FileNotFoundError(f"找不到 Excel：{YEARLY_DIR}")
+
+    supply_catalog_map = {}
+
+    if SUPPLY_CATALOG_PATH.exists():
+        supply_catalog_map = json.loads(
+            SUPPLY_CATALOG_PATH.read_text(encoding="utf-8")
+        )
+
+    jobs = []
+
+    for excel_path in yearly_files:
+
+        year = extract_year_from_filename(excel_path.name)
+
+        if year is None:
+            print(f"⚠️ skip {excel_path.name}")
+            continue
+
+        jobs.append((year, excel_path))
+
+    jobs.sort(key=lambda job: job[0])
+
+    # =========================
+    # 每個 Excel 解析一次（多個 process 平行處理，依年份合併）
+    # =========================
+    parsed = []
+
+    for p in parse_workbooks(
+        jobs, supply_catalog_map, with_records="rag" in args.only, workers=args.workers
+    ):
+        print("\n".join(p["logs"]))
+        parsed.append(p)
+
+    print(f"\n⏱️ 解析 {len(parsed)} 個 Excel：{time.perf_counter() - started:.1f}s")
+
+    # =========================
+    # 輸出
+    # =========================
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    if "demand_supply" in args.only:
+        emit_demand_supply(parsed, args.output_dir)
+        print(f"✅ demand_supply → {args.output_dir}")
+
+    if "distance" in args.only:
+        emit_distance(parsed, args.output_dir)
+        print(f"✅ distance → {args.output_dir}")
+
+    if "s54" in args.only:
+        emit_s54(parsed, args.output_dir)
+        print(f"✅ {DEMAND_RATIO_FILE} → {args.output_dir}")
+
+    if "cost_pressure" in args.only:
+        emit_cost_pressure(parsed, args.output_dir)
+        print(f"✅ historical_cost_pressure.json → {args.output_dir}")
+
+    if "rag" in args.only:
+        emit_rag(parsed)
+        print(f"✅ RAG store → {OUTPUT_STORE}")
+
+    print(f"\n🎉 完成（{time.perf_counter() - started:.1f}s）")
+
+
+if __name__ == "__main__":
+    main()
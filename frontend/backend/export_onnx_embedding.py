@@ -0,0 +1,226 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from embedding import (
+    EMBED_MODEL_NAME,
+    MAX_SEQ_LENGTH,
+    ONNX_DIR,
+    ONNX_FP32_FILE,
+    ONNX_INT8_FILE,
+    TOKENIZER_FILE,
+    OnnxEmbedder,
+    TorchEmbedder,
+)
+from rag_store import META_FILE, RecordStore, resolve_store_dir
+
+BASE_DIR = Path(__file__).resolve().parent
+PROCESSED_DIR = BASE_DIR / "processed"
+
+INPUT_STORE = PROCESSED_DIR / "energy_rag_all_years_store"
+
+BENCH_QUERIES = [
+    "113年工業部門主要使用哪些能源",
+    "85年和113年工業部門主要能源差異",
+    "天然氣用在哪些部門",
+    "住宅部門有沒有使用太陽光電",
+    "113年使用量最多的能源前五",
+    "煤及煤產品 D2",
+    "Which sector uses the most natural gas?",
+    "電力使用比例",
+]
+
+
+# =====================================================
+# 匯出 ONNX
+# =====================================================
+def export_onnx(model_name: str, onnx_dir: Path):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    dummy = tokenizer(
+        ["Energy Sphere ONNX export"],
+        padding=True,
+        truncation=True,
+        max_length=MAX_SEQ_LENGTH,
+        return_tensors="pt",
+    )
+
+    input_names = ["input_ids", "attention_mask"]
+    args = (dummy["input_ids"], dummy["attention_mask"])
+
+    if "token_type_ids" in dummy:
+        input_names.append("token_type_ids")
+        args = args + (dummy["token_type_ids"],)
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = onnx_dir / ONNX_FP32_FILE
+
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            args,
+            str(model_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            do_constant_folding=True,
+        )
+
+    # tokenizer.json（fast tokenizer）
+    tokenizer.backend_tokenizer.save(str(onnx_dir / TOKENIZER_FILE))
+
+    print(f"✅ ONNX 匯出完成：{model_path}")
+
+    return model_path
+
+
+def quantize_int8(onnx_dir: Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    src = onnx_dir / ONNX_FP32_FILE
+    dst = onnx_dir / ONNX_INT8_FILE
+
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+
+    print(f"✅ int8 量化完成：{dst}")
+
+    return dst
+
+
+# =====================================================
+# 一致性檢查
+# =====================================================
+def parity_check(reference, candidate, texts, k: int = 10):
+    ref = reference.encode(texts)
+    cand = candidate.encode(texts)
+
+    # 兩邊都已 L2 normalize → 內積即 cosine
+    cosine = np.sum(ref * cand, axis=1)
+
+    # 以 reference 向量建索引，比較 top-k 鄰居重疊率
+    k = min(k, len(texts))
+    index = faiss.IndexFlatL2(ref.shape[1])
+    index.add(ref)
+
+    _, ref_nn = index.search(ref, k)
+    _, cand_nn = index.search(cand, k)
+
+    overlap = np.mean(
+        [len(set(a) & set(b)) / k for a, b in zip(ref_nn.tolist(), cand_nn.tolist())]
+    )
+
+    return {
+        "backend": candidate.backend,
+        "texts": len(texts),
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(ref - cand).max()),
+        f"top{k}_overlap": float(overlap),
+    }
+
+
+# =====================================================
+# 效能測試
+# =====================================================
+def benchmark(embedder, texts, rounds: int = 50):
+    # warm up
+    embedder.encode(BENCH_QUERIES[:2])
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        embedder.encode([BENCH_QUERIES[i % len(BENCH_QUERIES)]])
+    qps = rounds / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    embeddings = embedder.encode(texts)
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    build_seconds = time.perf_counter() - start
+
+    return {
+        "backend": embedder.backend,
+        "queries_per_sec": round(qps, 1),
+        "index_build_sec": round(build_seconds, 2),
+        "records": len(texts),
+    }
+
+
+def load_texts(limit=None):
+    # 版本化的 store：meta.json 在 CURRENT 指向的目錄下
+    if not (resolve_store_dir(INPUT_STORE) / META_FILE).exists():
+        print(f"⚠️ 找不到 {INPUT_STORE}，改用測試問句")
+        return list(BENCH_QUERIES)
+
+    store = RecordStore(INPUT_STORE)
+    n = min(limit, len(store)) if limit else len(store)
+
+    return [store.text(i) for i in range(n)]
+
+
+# =====================================================
+# main
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="匯出 ONNX embedding 並檢查一致性")
+    parser.add_argument("--model", default=EMBED_MODEL_NAME)
+    parser.add_argument("--output", default=str(ONNX_DIR))
+    parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument("--no-int8", action="store_true")
+    parser.add_argument("--parity-samples", type=int, default=2000)
+    parser.add_argument("--skip-bench", action="store_true")
+    args = parser.parse_args()
+
+    onnx_dir = Path(args.output)
+
+    if not args.skip_export:
+        export_onnx(args.model, onnx_dir)
+
+        if not args.no_int8:
+            quantize_int8(onnx_dir)
+
+    torch_embedder = TorchEmbedder(args.model)
+    candidates = [OnnxEmbedder(args.model, onnx_dir=onnx_dir, quantized=False)]
+
+    # int8 比 fp32 舊（例如 --no-int8 重新匯出 fp32）：不是由目前的模型量化的
+    int8_path = onnx_dir / ONNX_INT8_FILE
+    fp32_path = onnx_dir / ONNX_FP32_FILE
+
+    if int8_path.exists():
+        if int8_path.stat().st_mtime >= fp32_path.stat().st_mtime:
+            candidates.append(
+                OnnxEmbedder(args.model, onnx_dir=onnx_dir, quantized=True)
+            )
+        else:
+            print(f"⚠️ {int8_path.name} 比 {fp32_path.name} 舊，不列入比較")
+
+    texts = load_texts()
+    parity_texts = texts[: args.parity_samples]
+
+    print("\n===== 一致性檢查（對照 torch） =====")
+    for cand in candidates:
+        print(json.dumps(parity_check(torch_embedder, cand, parity_texts), ensure_ascii=False))
+
+    if args.skip_bench:
+        return
+
+    print("\n===== 效能測試 =====")
+    for embedder in [torch_embedder] + candidates:
+        print(json.dumps(benchmark(embedder, texts), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
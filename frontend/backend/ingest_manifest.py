@@ -0,0 +1,153 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import xxhash
+
+BASE_DIR = Path(__file__).resolve().parent
+PROCESSED_DIR = Path(os.getenv("RAG_PROCESSED_DIR", BASE_DIR / "processed"))
+
+MANIFEST_PATH = PROCESSED_DIR / "energy_rag_all_years_manifest.json"
+
+MANIFEST_FORMAT = 1
+
+# 解析程式改了，舊的 records 也要重算
+PARSER_SOURCES = (
+    BASE_DIR / "build_energy_rag_all_years.py",
+    BASE_DIR / "build_energy_rag_core.py",
+    BASE_DIR / "ratio_sheet.py",
+)
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+# =====================================================
+# hash
+# =====================================================
+def file_hash(path):
+    h = xxhash.xxh3_128()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def ingest_signature(*extra_paths):
+    """
+    解析程式 + 額外輸入（例如 supply_catalog.json）的 hash
+    """
+    h = xxhash.xxh3_128()
+
+    for path in (*PARSER_SOURCES, *extra_paths):
+        path = Path(path)
+        h.update(path.name.encode("utf-8"))
+        h.update(file_hash(path).encode("ascii") if path.exists() else b"-")
+
+    return h.hexdigest()
+
+
+# =====================================================
+# manifest
+# =====================================================
+def load_manifest(path=MANIFEST_PATH):
+    """
+    {
+      "format": 1,
+      "signature": 解析程式 / catalog 的 hash,
+      "store_version": store 的 version,
+      "workbooks": {檔名: {year, hash, size, start, count}},
+      "changes": 上一次 ingest 的變動,
+      "index": build_index 最後一次建立時的 store_version 等
+    }
+    """
+    path = Path(path)
+
+    if not path.exists():
+        return {}
+
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return {}
+
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    manifest = {"format": MANIFEST_FORMAT, **manifest}
+
+    # 先寫暫存檔再取代，中斷時不會留下半個 manifest
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def diff_workbooks(previous, current):
+    """
+    previous / current：{檔名: {"hash": ..., ...}}
+
+    回傳 {"added", "changed", "removed", "unchanged"}（檔名 list）
+    """
+    changes = {"added": [], "changed": [], "removed": [], "unchanged": []}
+
+    for name, entry in current.items():
+        old = previous.get(name)
+
+        if old is None:
+            changes["added"].append(name)
+        elif old.get("hash") != entry["hash"] or old.get("year") != entry["year"]:
+            changes["changed"].append(name)
+        else:
+            changes["unchanged"].append(name)
+
+    changes["removed"] = [name for name in previous if name not in current]
+
+    return changes
+
+
+def changed_years(changes, previous, current):
+    """
+    有變動的年份（新增 / 修改 / 刪除的 Excel）
+    """
+    years = set()
+
+    for key in ("added", "changed"):
+        years.update(current[name]["year"] for name in changes[key])
+
+    years.update(previous[name]["year"] for name in changes["removed"])
+
+    return sorted(years)
+
+
+def record_index_build(store_version, **info):
+    """
+    build_index 完成後記下它用的是哪一版 store
+    """
+    manifest = load_manifest()
+
+    manifest["index"] = {
+        "store_version": store_version,
+        "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        **info,
+    }
+
+    save_manifest(manifest)
+
+
+def index_is_current(store_version, index_path, **info):
+    """
+    索引檔存在，且上次是用同一版 store、同樣設定（例如 index_type、embed_model）建立的
+    """
+    built = load_manifest().get("index", {})
+
+    return (
+        Path(index_path).exists()
+        and built.get("store_version") == store_version
+        and all(built.get(k) == v for k, v in info.items())
+    )
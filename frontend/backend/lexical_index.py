@@ -0,0 +1,277 @@
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from rag_store import resolve_store_dir, write_versioned
+
+# 中文字元 / 英數代碼（D2、S1、LNG、113）
+CJK_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+NGRAM_SIZES = (2, 3)
+
+VOCAB_FILE = "vocab.json"
+
+
+# =====================================================
+# 斷詞：中文字 bigram / trigram + 英數 token
+# =====================================================
+def token_spans(text: str, ngram_sizes=NGRAM_SIZES):
+    """
+    回傳 [(token, start, end)]，位置用來計算查詢字元覆蓋率
+    """
+    text = (text or "").lower()
+    spans = [(m.group(), m.start(), m.end()) for m in WORD_RE.finditer(text)]
+
+    for m in CJK_RE.finditer(text):
+        run, offset = m.group(), m.start()
+
+        # 單一中文字（例如「煤」「油」「電」）
+        if len(run) == 1:
+            spans.append((run, offset, offset + 1))
+            continue
+
+        for n in ngram_sizes:
+            spans.extend(
+                (run[i : i + n], offset + i, offset + i + n)
+                for i in range(len(run) - n + 1)
+            )
+
+    return spans
+
+
+def tokenize(text: str, ngram_sizes=NGRAM_SIZES):
+    return [token for token, _, _ in token_spans(text, ngram_sizes)]
+
+
+def record_to_document(record: dict):
+    """
+    record 的全文 + 代碼欄位（代碼也當作獨立 token）
+    """
+    return " ".join(
+        str(record.get(field) or "")
+        for field in (
+            "text",
+            "demand_code",
+            "demand_name",
+            "supply_code",
+            "supply_name_zh",
+            "supply_name_en",
+        )
+    )
+
+
+# =====================================================
+# BM25 倒排索引
+# =====================================================
+class NgramBM25Index:
+    """
+    postings 以 CSR 形式存放（offsets + doc_ids + weights），
+    存檔後可 memory-map，多個 worker 共用同一份 page cache
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0
+
+        # token -> posting 編號；offsets[i]:offsets[i+1] 為該 token 的 posting
+        self.vocab = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.idf = np.zeros(0, dtype=np.float32)
+
+        # 依 token 串接的 doc id（各段已排序）與預先算好的 BM25 權重
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+
+        # 由哪一版 RAG store 建立（載入時用來判斷是否過期）
+        self.store_version = None
+
+    # -------------------------------------------------
+    # 建立
+    # -------------------------------------------------
+    @classmethod
+    def build(cls, documents, k1: float = 1.2, b: float = 0.75):
+        self = cls(k1=k1, b=b)
+
+        doc_ids = {}
+        doc_tfs = {}
+        doc_len = []
+
+        for doc_id, doc in enumerate(documents):
+            counts = Counter(tokenize(doc))
+            doc_len.append(sum(counts.values()))
+
+            for token, tf in counts.items():
+                doc_ids.setdefault(token, []).append(doc_id)
+                doc_tfs.setdefault(token, []).append(tf)
+
+        self.n_docs = len(doc_len)
+        doc_len = np.asarray(doc_len, dtype=np.float32)
+        avgdl = float(doc_len.mean()) if self.n_docs else 1.0
+        norm = k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))
+
+        offsets = [0]
+        idfs = []
+        all_ids = []
+        all_weights = []
+
+        for n, (token, ids) in enumerate(doc_ids.items()):
+            ids = np.asarray(ids, dtype=np.int32)
+            tf = np.asarray(doc_tfs[token], dtype=np.float32)
+
+            df = len(ids)
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+            self.vocab[token] = n
+            idfs.append(idf)
+            all_ids.append(ids)
+            all_weights.append(idf * tf * (k1 + 1) / (tf + norm[ids]))
+            offsets.append(offsets[-1] + df)
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.idf = np.asarray(idfs, dtype=np.float32)
+
+        if all_ids:
+            self.doc_ids = np.concatenate(all_ids).astype(np.int32)
+            self.weights = np.concatenate(all_weights).astype(np.float32)
+
+        return self
+
+    @classmethod
+    def from_records(cls, records):
+        self = cls.build(record_to_document(r) for r in records)
+        self.store_version = getattr(records, "version", None)
+
+        return self
+
+    def posting(self, token):
+        n = self.vocab[token]
+        start, end = self.offsets[n], self.offsets[n + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    # -------------------------------------------------
+    # 搜尋
+    # -------------------------------------------------
+    def search(self, query: str, k: int = 20, ids=None):
+        """
+        回傳 [(doc_id, bm25, coverage)]
+
+        coverage：查詢字元被文件中命中的 token 覆蓋的比例，0 ~ 1
+                  （跨詞的 n-gram 沒命中不影響，真正沒出現的字才會拉低）
+        ids：只在這些 doc id 中搜尋（例如指定年份）
+        """
+        spans = token_spans(query)
+        tokens = [t for t in dict.fromkeys(t for t, _, _ in spans) if t in self.vocab]
+
+        if not tokens:
+            return []
+
+        postings = {token: self.posting(token) for token in tokens}
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+
+        for doc_ids, weights in postings.values():
+            scores[doc_ids] += weights
+
+        if ids is not None:
+            ids = np.asarray(ids, dtype=np.int64)
+            candidates = ids[scores[ids] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+
+        if len(candidates) == 0:
+            return []
+
+        if len(candidates) > k:
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        # 每個候選文件命中了哪些查詢 token（posting 的 doc id 已排序）
+        hit = {}
+        for token, (doc_ids, _) in postings.items():
+            pos = np.searchsorted(doc_ids, candidates)
+            pos = np.minimum(pos, len(doc_ids) - 1)
+            hit[token] = doc_ids[pos] == candidates
+
+        query_chars = {i for _, start, end in spans for i in range(start, end)}
+        total = len(query_chars) or 1
+
+        results = []
+
+        for n, doc_id in enumerate(candidates):
+            covered = {
+                i
+                for token, start, end in spans
+                if token in hit and hit[token][n]
+                for i in range(start, end)
+            }
+            results.append((int(doc_id), float(scores[doc_id]), len(covered) / total))
+
+        return results
+
+    # -------------------------------------------------
+    # 存檔 / 讀檔（目錄：vocab.json + *.npy）
+    # -------------------------------------------------
+    def save(self, index_dir):
+        """
+        寫成 index_dir/v-<version>/，完成後才切換 CURRENT
+        （與 rag_store 相同：worker 不會讀到新舊混在一起的檔案）
+        """
+        arrays = {
+            "offsets.npy": self.offsets,
+            "idf.npy": self.idf,
+            "doc_ids.npy": self.doc_ids,
+            "weights.npy": self.weights,
+        }
+
+        meta = {
+            "k1": self.k1,
+            "b": self.b,
+            "n_docs": self.n_docs,
+            "store_version": self.store_version,
+            "tokens": list(self.vocab),
+        }
+        vocab = json.dumps(meta, ensure_ascii=False)
+
+        h = hashlib.blake2b(vocab.encode("utf-8"), digest_size=16)
+        for arr in arrays.values():
+            h.update(np.ascontiguousarray(arr).tobytes())
+
+        def write(tmp_dir):
+            for name, arr in arrays.items():
+                np.save(tmp_dir / name, arr)
+
+            (tmp_dir / VOCAB_FILE).write_text(vocab, encoding="utf-8")
+
+            return {"version": h.hexdigest()}
+
+        write_versioned(index_dir, write)
+
+    @classmethod
+    def load(cls, index_dir, mmap: bool = True):
+        index_dir = resolve_store_dir(index_dir)
+        mmap_mode = "r" if mmap else None
+
+        meta = json.loads((index_dir / VOCAB_FILE).read_text(encoding="utf-8"))
+
+        self = cls(k1=meta["k1"], b=meta["b"])
+        self.n_docs = meta["n_docs"]
+        self.store_version = meta.get("store_version")
+        self.vocab = {token: n for n, token in enumerate(meta["tokens"])}
+
+        self.offsets = np.load(index_dir / "offsets.npy", mmap_mode=mmap_mode)
+        self.idf = np.load(index_dir / "idf.npy", mmap_mode=mmap_mode)
+        self.doc_ids = np.load(index_dir / "doc_ids.npy", mmap_mode=mmap_mode)
+        self.weights = np.load(index_dir / "weights.npy", mmap_mode=mmap_mode)
+
+        return self
+
+    @staticmethod
+    def exists(index_dir):
+        return (resolve_store_dir(index_dir) / VOCAB_FILE).exists()
@@ -0,0 +1,455 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+
+import xxhash
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+# openai : 直接呼叫 OpenAI
+# record : 呼叫 OpenAI，並把 request / response 存到 LLM_RECORD_PATH
+# replay : 不連網，回放錄下的 response（可加模擬延遲）
+# stub   : 不連網，固定規則產生的回覆（壓力測試 / 開發用）
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").strip().lower()
+
+LLM_RECORD_PATH = Path(
+    os.getenv("LLM_RECORD_PATH", BASE_DIR / "processed" / "llm_recordings.jsonl")
+)
+
+# replay 延遲：recorded = 錄製時的實際耗時；數字 = 固定毫秒
+LLM_REPLAY_LATENCY_MS = os.getenv("LLM_REPLAY_LATENCY_MS", "recorded")
+# replay 找不到對應的錄製內容時：stub（改用 stub 回覆）/ error
+LLM_REPLAY_MISS = os.getenv("LLM_REPLAY_MISS", "stub").strip().lower()
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+# 模擬串流時每個 delta 的字數
+LLM_STREAM_CHUNK_CHARS = int(os.getenv("LLM_STREAM_CHUNK_CHARS", "8"))
+
+BACKENDS = ("openai", "record", "replay", "stub")
+
+RESPONSES_API = "responses"
+CHAT_API = "chat.completions"
+
+
+# =====================================================
+# request → key
+# =====================================================
+def request_key(api: str, kwargs: dict):
+    """
+    同一個 API + 同樣參數（不含 stream）→ 同一個 key
+    """
+    payload = {k: v for k, v in kwargs.items() if k != "stream"}
+
+    return xxhash.xxh3_128_hexdigest(
+        json.dumps(
+            [api, payload], ensure_ascii=False, sort_keys=True, default=str
+        ).encode("utf-8")
+    )
+
+
+def _last_user_text(kwargs: dict):
+    messages = kwargs.get("input", kwargs.get("messages", ""))
+
+    if isinstance(messages, str):
+        return messages
+
+    for message in reversed(messages or []):
+        if message.get("role") == "user":
+            content = message.get("content", "")
+            return content if isinstance(content, str) else json.dumps(content)
+
+    return ""
+
+
+# =====================================================
+# 回放用的 response 物件（與 openai SDK 相同的屬性）
+# =====================================================
+def _to_obj(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_obj(v) for k, v in value.items()})
+
+    if isinstance(value, list):
+        return [_to_obj(v) for v in value]
+
+    return value
+
+
+def make_response(api: str, text: str, model: str, annotations=()):
+    """
+    只有文字（與來源網址）的最小 response
+    """
+    if api == RESPONSES_API:
+        return {
+            "object": "response",
+            "model": model,
+            "output_text": text,
+            "output": [
+                {
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [
+                        {
+                            "type": "output_text",
+                            "text": text,
+                            "annotations": list(annotations),
+                        }
+                    ],
+                }
+            ],
+        }
+
+    return {
+        "object": "chat.completion",
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": text},
+            }
+        ],
+    }
+
+
+def response_text(api: str, response: dict):
+    if api == RESPONSES_API:
+        return response.get("output_text") or ""
+
+    return response["choices"][0]["message"]["content"] or ""
+
+
+def _chat_chunk(model: str, content, finish_reason=None):
+    return SimpleNamespace(
+        object="chat.completion.chunk",
+        model=model,
+        choices=[
+            SimpleNamespace(
+                index=0,
+                delta=SimpleNamespace(content=content),
+                finish_reason=finish_reason,
+            )
+        ],
+    )
+
+
+def _stream_events(api: str, response: dict, latency: float):
+    """
+    把完整 response 切成 delta 事件（與 create(stream=True) 相同）
+
+    responses：response.output_text.delta …… response.completed
+    chat.completions：chat.completion.chunk（最後一個帶 finish_reason）
+    """
+    text = response_text(api, response)
+    size = max(1, LLM_STREAM_CHUNK_CHARS)
+    chunks = [text[i : i + size] for i in range(0, len(text), size)] or [""]
+
+    # 延遲平均分配到每個 delta（第一個 delta ≈ time to first token）
+    delay = latency / len(chunks)
+
+    if api != RESPONSES_API:
+        model = response.get("model")
+
+        for chunk in chunks:
+            time.sleep(delay)
+            yield _chat_chunk(model, chunk)
+
+        yield _chat_chunk(model, None, "stop")
+        return
+
+    for chunk in chunks:
+        time.sleep(delay)
+        yield SimpleNamespace(type="response.output_text.delta", delta=chunk)
+
+    done = "response.completed"
+    if response.get("status") == "incomplete":
+        done = "response.incomplete"
+
+    yield SimpleNamespace(type=done, response=_to_obj(response))
+
+
+def _error_message(event):
+    """
+    response.failed / error 事件 → 錯誤訊息
+    """
+    error = getattr(getattr(event, "response", None), "error", None) or event
+
+    return getattr(error, "message", None) or str(error)
+
+
+def _failed_events(api: str, message: str, latency: float):
+    """
+    錄到的是失敗的串流：回放同樣的 response.failed（chat.completions 直接丟錯）
+    """
+    time.sleep(latency)
+
+    if api != RESPONSES_API:
+        raise RuntimeError(message)
+
+    yield SimpleNamespace(
+        type="response.failed",
+        response=SimpleNamespace(
+            status="failed", error=SimpleNamespace(message=message)
+        ),
+    )
+
+
+def _serialize(response, api: str):
+    data = response.model_dump(mode="json")
+
+    # output_text 是 SDK 的 property，model_dump 不會輸出
+    if api == RESPONSES_API:
+        data["output_text"] = response.output_text
+
+    return data
+
+
+# =====================================================
+# backend
+# =====================================================
+class _Endpoint:
+    """
+    client.responses / client.chat.completions
+    """
+
+    def __init__(self, backend, api):
+        self._backend = backend
+        self._api = api
+
+    def create(self, **kwargs):
+        return self._backend.create(self._api, kwargs)
+
+
+class LLMClient(ABC):
+    """
+    與 openai.OpenAI 相同的呼叫方式：
+      client.responses.create(...) / client.chat.completions.create(...)
+    """
+
+    def __init__(self, name: str):
+        self.backend = name
+
+        self.responses = _Endpoint(self, RESPONSES_API)
+        self.chat = SimpleNamespace(completions=_Endpoint(self, CHAT_API))
+
+    @abstractmethod
+    def create(self, api: str, kwargs: dict):
+        """
+        api：RESPONSES_API / CHAT_API；kwargs：create() 的參數
+        """
+
+
+class StubClient(LLMClient):
+    """
+    依問題內容產生固定回覆：相同問題永遠得到相同答案，回覆語種跟著問題走
+    """
+
+    def __init__(self, latency_ms: float = LLM_STUB_LATENCY_MS):
+        super().__init__("stub")
+        self.latency = latency_ms / 1000
+
+    def respond(self, api: str, kwargs: dict):
+        question = " ".join(_last_user_text(kwargs).split())
+
+        text = f"[stub {request_key(api, kwargs)[:8]}] {question[:200]}"
+
+        return make_response(api, text, kwargs.get("model", "stub"))
+
+    def create(self, api: str, kwargs: dict):
+        response = self.respond(api, kwargs)
+
+        if kwargs.get("stream"):
+            return _stream_events(api, response, self.latency)
+
+        time.sleep(self.latency)
+        return _to_obj(response)
+
+
+class ReplayClient(LLMClient):
+    """
+    LLM_RECORD_PATH 的 request key → 錄下的 response
+    """
+
+    def __init__(
+        self,
+        path=LLM_RECORD_PATH,
+        latency_ms=LLM_REPLAY_LATENCY_MS,
+        on_miss: str = LLM_REPLAY_MISS,
+    ):
+        super().__init__("replay")
+
+        self.path = Path(path)
+        self.latency_ms = latency_ms
+        self.on_miss = on_miss
+        self.stub = StubClient(0)
+
+        self.recordings = {}
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recordings[entry["key"]] = entry
+
+        self.hits = 0
+        self.misses = 0
+
+    def _latency(self, entry):
+        if str(self.latency_ms).lower() == "recorded":
+            return entry.get("latency", 0) if entry else 0
+
+        return float(self.latency_ms) / 1000
+
+    def create(self, api: str, kwargs: dict):
+        entry = self.recordings.get(request_key(api, kwargs))
+
+        if entry is None:
+            self.misses += 1
+
+            if self.on_miss != "stub":
+                raise KeyError(f"沒有錄製內容：{_last_user_text(kwargs)[:80]}")
+
+            response = self.stub.respond(api, kwargs)
+        else:
+            self.hits += 1
+            response = entry.get("response")
+
+        latency = self._latency(entry)
+
+        if entry is not None and "error" in entry:
+            if kwargs.get("stream"):
+                return _failed_events(api, entry["error"], latency)
+
+            time.sleep(latency)
+            raise RuntimeError(entry["error"])
+
+        if kwargs.get("stream"):
+            return _stream_events(api, response, latency)
+
+        time.sleep(latency)
+        return _to_obj(response)
+
+
+class RecordingClient(LLMClient):
+    """
+    呼叫 OpenAI，並把每組 request / response 追加到 JSONL
+    """
+
+    def __init__(self, client, path=LLM_RECORD_PATH):
+        super().__init__("record")
+
+        self.client = client
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _save(self, api, kwargs, latency, response: dict = None, error: str = None):
+        """
+        response 與 error 擇一：失敗的請求也錄下來，回放時重現同樣的錯誤
+        """
+        entry = {
+            "key": request_key(api, kwargs),
+            "api": api,
+            "request": {k: v for k, v in kwargs.items() if k != "stream"},
+            "latency": round(latency, 3),
+        }
+
+        if error is None:
+            entry["response"] = response
+        else:
+            entry["error"] = error
+
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _endpoint(self, api):
+        if api == RESPONSES_API:
+            return self.client.responses
+
+        return self.client.chat.completions
+
+    def _record_stream(self, api, kwargs, events, started):
+        # completed / incomplete 都有 response；failed / error 錄成錯誤
+        for event in events:
+            latency = time.perf_counter() - started
+
+            if event.type in ("response.completed", "response.incomplete"):
+                self._save(
+                    api, kwargs, latency, response=_serialize(event.response, api)
+                )
+
+            elif event.type in ("response.failed", "error"):
+                self._save(api, kwargs, latency, error=_error_message(event))
+
+            yield event
+
+    def _record_chat_stream(self, api, kwargs, chunks, started):
+        # chat.completions 串流沒有完整 response：把 delta 接起來存成一般回覆
+        parts = []
+        model = kwargs.get("model")
+
+        for chunk in chunks:
+            for choice in chunk.choices:
+                parts.append(choice.delta.content or "")
+
+            model = chunk.model or model
+            yield chunk
+
+        self._save(
+            api,
+            kwargs,
+            time.perf_counter() - started,
+            response=make_response(api, "".join(parts), model),
+        )
+
+    def create(self, api: str, kwargs: dict):
+        started = time.perf_counter()
+        result = self._endpoint(api).create(**kwargs)
+
+        if kwargs.get("stream"):
+            if api != RESPONSES_API:
+                return self._record_chat_stream(api, kwargs, result, started)
+
+            return self._record_stream(api, kwargs, result, started)
+
+        self._save(
+            api, kwargs, time.perf_counter() - started, response=_serialize(result, api)
+        )
+        return result
+
+
+# =====================================================
+# 建立 client
+# =====================================================
+def load_llm_client(backend: str = LLM_BACKEND):
+    backend = (backend or "openai").strip().lower()
+
+    if backend in ("openai", "record"):
+        from openai import OpenAI
+
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+        return client if backend == "openai" else RecordingClient(client)
+
+    if backend == "replay":
+        return ReplayClient()
+
+    if backend == "stub":
+        return StubClient()
+
+    raise ValueError(f"不支援的 LLM backend：{backend}（可用：{', '.join(BACKENDS)}）")
+
+
+@lru_cache(maxsize=None)
+def get_llm_client(backend: str = LLM_BACKEND):
+    return load_llm_client(backend)
@@ -1,11 +1,12 @@
 from typing import Tuple
 import os, tempfile
-from openai import OpenAI
 from moviepy.editor import VideoFileClip, AudioFileClip
 import whisper
 import re
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_backend import get_llm_client
+
+client = get_llm_client()
 CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o")
 
 _model = None
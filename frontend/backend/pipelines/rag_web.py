@@ -2,9 +2,9 @@ from typing import Tuple, Optional
 import os
 import requests
 from bs4 import BeautifulSoup
-from openai import OpenAI
+from llm_backend import get_llm_client
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_llm_client()
 CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
 
 
@@ -0,0 +1,706 @@
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+# =====================================================
+# 基本資料
+# =====================================================
+DEPARTMENTS = [
+    "工業部門",
+    "運輸部門",
+    "農業部門",
+    "服務業部門",
+    "住宅部門",
+]
+
+# 部門同義詞：口語 / 簡稱 -> 正式名稱
+DEPARTMENT_SYNONYMS = {
+    "工業": "工業部門",
+    "工業部門": "工業部門",
+    "運輸": "運輸部門",
+    "交通": "運輸部門",
+    "運輸部門": "運輸部門",
+    "農業": "農業部門",
+    "農業部門": "農業部門",
+    "服務業": "服務業部門",
+    "商業": "服務業部門",
+    "服務部門": "服務業部門",
+    "服務業部門": "服務業部門",
+    "住宅": "住宅部門",
+    "住家": "住宅部門",
+    "家庭": "住宅部門",
+    "民生": "住宅部門",
+    "住宅部門": "住宅部門",
+}
+
+# 能源同義詞：口語 / 簡稱 -> 正式名稱
+ENERGY_SYNONYMS = {
+    "天然氣": "天然氣",
+    "瓦斯": "天然氣",
+    "液化天然氣": "天然氣",
+    "lng": "天然氣",
+    "LNG": "天然氣",
+    "電力": "電力",
+    "用電": "電力",
+    "電": "電力",
+    "煤": "煤及煤產品",
+    "煤炭": "煤及煤產品",
+    "煤及煤產品": "煤及煤產品",
+    "石油": "原油及石油產品",
+    "油": "原油及石油產品",
+    "原油": "原油及石油產品",
+    "原油及石油產品": "原油及石油產品",
+    "太陽能": "太陽光電",
+    "光電": "太陽光電",
+    "太陽光電": "太陽光電",
+    "風電": "風力",
+    "風能": "風力",
+    "風力": "風力",
+    "熱": "熱能",
+    "熱能": "熱能",
+    "核電": "核能",
+    "核能": "核能",
+    "水電": "水力",
+    "水力": "水力",
+    "生質能": "生質能",
+    "廢棄物": "廢棄物",
+}
+
+
+# =====================================================
+# 關鍵字（全部放進同一個 automaton，一次掃描）
+# =====================================================
+# --- 意圖 ---
+TOP_WORDS = ("最多", "最大", "排名", "前", "top")
+MAX_WORDS = ("最多", "最大")
+RESOURCE_WORDS = ("能源", "資源")
+USAGE_WORDS = ("能源", "使用量", "資源")
+EACH_WORDS = ("分別", "各自", "各年", "跟", "和")
+COMPARE_WORDS = ("比較", "差異", "差別")
+DIFF_WORDS = ("差", "比較", "差異")
+
+DEPT_TO_ENERGY_WORDS = (
+    "主要使用",
+    "使用哪些能源",
+    "用哪些能源",
+    "主要用什麼能源",
+    "都用什麼",
+)
+ENERGY_TO_DEPT_WORDS = (
+    "哪些部門使用",
+    "用在哪些部門",
+    "有哪些部門",
+    "哪些部門有用",
+    "誰在用",
+    "哪些部門有用到",
+    "哪些人用",
+)
+DEPT_USE_WORDS = ("使用", "有用", "有用到")
+CHECK_USAGE_WORDS = (
+    "有沒有使用",
+    "有沒有用",
+    "有用嗎",
+    "有用到嗎",
+    "是否使用",
+    "有沒有",
+)
+
+# --- 是否走 Energy RAG ---
+GENERAL_WORDS = (
+    "是不是",
+    "怎樣",
+    "是什麼",
+    "為什麼",
+    "介紹",
+    "說明",
+    "解釋",
+    "概念",
+    "原因",
+    "影響",
+    "未來",
+    "適合",
+    "發展",
+    "可以發展",
+)
+DEPT_QUESTION_WORDS = (
+    "主要使用",
+    "使用哪些能源",
+    "用哪些能源",
+    "主要用什麼",
+    "最多",
+    "前幾",
+    "排名",
+)
+ENERGY_QUESTION_WORDS = ("哪些部門", "誰在用", "用在哪", "使用情況")
+ENERGY_TOPIC_WORDS = (
+    "能源",
+    "用電",
+    "耗能",
+    "電力",
+    "天然氣",
+    "石油",
+    "煤",
+    "再生能源",
+    "使用量",
+    "比例",
+    "結構",
+)
+
+# --- /chat 問題來源 ---
+# Energy RAG 可以回答，但其實是在問概念 / 看法
+OPEN_QUESTION_WORDS = (
+    "是什麼",
+    "什麼是",
+    "是不是",
+    "為什麼",
+    "怎麼",
+    "如何",
+    "介紹",
+    "解釋",
+    "未來",
+    "適合",
+    "發展",
+    "哪些再生能源",
+    "可以發展",
+)
+KNOWLEDGE_WORDS = (
+    "是什麼",
+    "是甚麼",
+    "什麼是",
+    "是啥",
+    "介紹",
+    "解釋",
+    "原理",
+    "用途",
+    "優點",
+    "缺點",
+    "how",
+    "what is",
+    "explain",
+)
+REALTIME_WORDS = (
+    # 中文
+    "即時發電",
+    "及時發電",
+    "即時供電",
+    "即時電力",
+    "目前發電",
+    "目前供電",
+    "現在發電",
+    "現在供電",
+    "最新發電",
+    "今日供電",
+    "備轉容量",
+    "台電即時",
+    # English
+    "real-time power",
+    "real-time generation",
+    "current generation",
+    "current power",
+    "live generation",
+)
+HISTORY_WORDS = (
+    "比例",
+    "占比",
+    "使用量",
+    "總量",
+    "排名",
+    "最多",
+    "最高",
+    "最低",
+    "民國",
+    "年份",
+    "哪一年",
+    "前五",
+    "前十",
+    "top",
+    "ratio",
+    "percentage",
+    "ranking",
+    "highest",
+    "lowest",
+)
+
+# --- 回答模式 ---
+ANALYSIS_WORDS = ("分析", "詳細", "整理", "趨勢", "report", "analysis")
+PRECISE_WORDS = ("最多", "哪個", "找出", "最高", "最低", "多少", "which", "max", "top")
+
+KEYWORD_GROUPS = (
+    TOP_WORDS,
+    MAX_WORDS,
+    RESOURCE_WORDS,
+    USAGE_WORDS,
+    EACH_WORDS,
+    COMPARE_WORDS,
+    DIFF_WORDS,
+    DEPT_TO_ENERGY_WORDS,
+    ENERGY_TO_DEPT_WORDS,
+    DEPT_USE_WORDS,
+    CHECK_USAGE_WORDS,
+    GENERAL_WORDS,
+    DEPT_QUESTION_WORDS,
+    ENERGY_QUESTION_WORDS,
+    ENERGY_TOPIC_WORDS,
+    OPEN_QUESTION_WORDS,
+    KNOWLEDGE_WORDS,
+    REALTIME_WORDS,
+    HISTORY_WORDS,
+    ANALYSIS_WORDS,
+    PRECISE_WORDS,
+    ("部門", "是否", "前五", "前三", "前十", "哪些"),
+)
+
+# =====================================================
+# 年份
+# =====================================================
+# 民國年（前面不能接數字，避免 2024年 被當成 24年）
+ROC_YEAR_RE = re.compile(r"(?<!\d)(?:民國)?(\d{2,3})年")
+AD_YEAR_RE = re.compile(r"(19\d{2}|20\d{2})年")
+BARE_YEAR_RE = re.compile(r"\b(8[0-9]|9[0-9]|10[0-9]|11[0-9])\b")
+
+# /chat 來源判斷用（西元 / 民國數字）
+AD_NUMBER_RE = re.compile(r"\b(19|20)\d{2}\b")
+ROC_NUMBER_RE = re.compile(r"\b1\d{2}\b")
+
+TOP_N_RE = re.compile(r"前(\d+)")
+TOP_EN_RE = re.compile(r"top\s*(\d+)")
+
+
+def _roc_year(ad_year: int):
+    roc_year = ad_year - 1911
+    return roc_year if 1 <= roc_year <= 300 else None
+
+
+def extract_year(text: str):
+    text = text.strip()
+
+    # 民國85年 / 113年
+    for m in ROC_YEAR_RE.finditer(text):
+        year = int(m.group(1))
+        if 1 <= year <= 300:
+            return year
+
+    # 西元年 1996年 -> 民國85年
+    m = AD_YEAR_RE.search(text)
+    if m and _roc_year(int(m.group(1))):
+        return _roc_year(int(m.group(1)))
+
+    # 單獨數字
+    m = BARE_YEAR_RE.search(text)
+    if m:
+        return int(m.group(1))
+
+    return None
+
+
+def extract_years(text: str):
+    years = {int(y) for y in ROC_YEAR_RE.findall(text)}
+    years.update(
+        _roc_year(int(y)) for y in AD_YEAR_RE.findall(text) if _roc_year(int(y))
+    )
+
+    # 補：支援單獨數字（85 113）
+    years.update(int(y) for y in BARE_YEAR_RE.findall(text))
+
+    return sorted(years)
+
+
+def extract_top_n(text: str):
+    text = text.lower()
+
+    # 🎯 最多 / 最大 → 1筆
+    if "最多" in text or "最大" in text:
+        return 1
+
+    # 🎯 前幾（中文）
+    m = TOP_N_RE.search(text)
+    if m:
+        return int(m.group(1))
+
+    # 🎯 top3 / top 5
+    m = TOP_EN_RE.search(text)
+    if m:
+        return int(m.group(1))
+
+    # 🎯 前幾（中文數字）
+    if "前五" in text:
+        return 5
+    if "前三" in text:
+        return 3
+    if "前十" in text:
+        return 10
+
+    return 5  # 預設
+
+
+# =====================================================
+# 語種（回答模板 / 翻譯判斷共用）
+# =====================================================
+DEFAULT_LANG = "zh-TW"
+
+KANA_RE = re.compile(r"[\u3040-\u30ff]")
+HANGUL_RE = re.compile(r"[\uac00-\ud7af]")
+HAN_RE = re.compile(r"[\u4e00-\u9fff]")
+
+
+def detect_lang(text: str):
+    # 日文常夾帶漢字，先看假名
+    if KANA_RE.search(text):
+        return "ja"
+
+    if HANGUL_RE.search(text):
+        return "ko"
+
+    if HAN_RE.search(text):
+        return DEFAULT_LANG
+
+    return "en"
+
+
+# =====================================================
+# Aho-Corasick 多字串比對
+# =====================================================
+class KeywordAutomaton:
+    """
+    一次掃描找出文字中出現的所有 pattern（可重疊）
+
+    patterns 在建立時一律轉小寫，比對時文字也轉小寫
+    """
+
+    def __init__(self, patterns):
+        self.patterns = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for pattern in dict.fromkeys(p.lower() for p in patterns if p):
+            self._add(pattern)
+
+        self._build()
+
+    def _add(self, pattern):
+        state = 0
+
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = nxt
+
+        self._output[state] += (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _build(self):
+        # BFS 建立 failure link，並把 failure 狀態的輸出併進來
+        queue = list(self._goto[0].values())
+
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] += self._output[self._fail[nxt]]
+
+    def find_all(self, text: str):
+        """
+        {pattern: 第一次出現的起始位置}
+        """
+        found = {}
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+
+        for i, ch in enumerate(text.lower()):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            for n in output[state]:
+                pattern = self.patterns[n]
+                if pattern not in found:
+                    found[pattern] = i - len(pattern) + 1
+
+        return found
+
+
+# =====================================================
+# 解析結果
+# =====================================================
+@dataclass(frozen=True)
+class ParsedQuery:
+    text: str
+    year: int = None
+    years: tuple = ()
+    department: str = None
+    departments: tuple = ()
+    energy_name: str = None
+    energies: tuple = ()
+    keywords: frozenset = frozenset()
+    intent: str = "semantic_search"
+    top_n: int = 5
+    use_rag: bool = False
+    # /chat 問題來源：history / realtime / general
+    source: str = "general"
+    # 回答模式：analysis / precise / normal
+    mode: str = "normal"
+    # 回答語種：zh-TW / en / ja / ko
+    lang: str = DEFAULT_LANG
+
+    def has(self, *words):
+        # words 必須是 KEYWORD_GROUPS / 部門 / 能源中的 pattern（小寫）
+        return not self.keywords.isdisjoint(words)
+
+
+def classify_intent(q: ParsedQuery, year=None, department=None, energy_name=None):
+    """
+    規則順序即優先順序；year / department / energy_name 以參數為準
+    """
+    has = q.has
+    years = q.years
+
+    # 0. 多年份整體最多能源
+    if (
+        len(years) >= 2
+        and has(*MAX_WORDS)
+        and has(*RESOURCE_WORDS)
+        and has(*EACH_WORDS)
+    ):
+        return "top_energy_overall"
+
+    # 0. 多年份整體能源比較
+    if (
+        len(years) >= 2
+        and has(*COMPARE_WORDS)
+        and has(*RESOURCE_WORDS)
+        and department is None
+    ):
+        return "compare_years_overall"
+
+    # 1. 同部門跨年份比較
+    if len(years) >= 2 and department and has(*DIFF_WORDS):
+        return "compare_department_across_years"
+
+    # 2. 同年份跨部門比較
+    if len(q.departments) >= 2 and has(*DIFF_WORDS):
+        return "compare_departments_same_year"
+
+    # 3. 問整體最多能源
+    if (
+        has(*TOP_WORDS)
+        and (has(*USAGE_WORDS) or energy_name is not None)
+        and department is None
+    ):
+        return "top_energy_overall"
+
+    # 4. 問某部門主要用哪些能源
+    if department and (
+        has(*DEPT_TO_ENERGY_WORDS)
+        or (has("部門") and has("能源") and has("哪些"))
+        or (has("部門") and has("前五"))
+        or (has("部門") and has("最多"))
+    ):
+        return "top_energy_by_department"
+
+    # 5. 問某能源用在哪些部門
+    if energy_name and (
+        has(*ENERGY_TO_DEPT_WORDS) or (has("部門") and has(*DEPT_USE_WORDS))
+    ):
+        return "top_department_by_energy"
+
+    # 6. 問某部門有沒有使用某能源
+    if (
+        department
+        and energy_name
+        and (has(*CHECK_USAGE_WORDS) or (has("是否") and has("使用")))
+    ):
+        return "check_usage"
+
+    # 7. 如果有能源且問部門，但沒明確句型，也視為能源→部門
+    if energy_name and department is None and has("部門"):
+        return "top_department_by_energy"
+
+    # 8. 如果有部門但沒明確句型，也常常是部門→能源
+    if department and energy_name is None and has(*RESOURCE_WORDS):
+        return "top_energy_by_department"
+
+    #  fallback（避免掉到 semantic_search）
+    if year and has("能源", "使用量", "前"):
+        return "top_energy_overall"
+
+    return "semantic_search"
+
+
+def classify_rag(q: ParsedQuery, intent: str):
+    has = q.has
+
+    if has(*GENERAL_WORDS) and q.year is None and len(q.years) == 0:
+        return False
+
+    # 🎯 1. 明確查數據（最重要）
+    if q.year is not None or len(q.years) >= 2:
+        if intent != "semantic_search":
+            return True
+
+    # 🎯 2. 部門 + 能源（一定是查表）
+    if q.department and q.energy_name:
+        return True
+
+    # 🎯 3. 部門 → 問能源
+    if q.department and has(*DEPT_QUESTION_WORDS):
+        return True
+
+    # 🎯 4. 能源 → 問部門
+    if q.energy_name and has(*ENERGY_QUESTION_WORDS):
+        return True
+
+    # 🎯 5. 有「能源語意」但沒完全命中
+    if has(*ENERGY_TOPIC_WORDS):
+        return True
+
+    # 其餘（含明顯聊天）：保守不走 RAG
+    return False
+
+
+def classify_source(q: ParsedQuery, use_rag: bool):
+    has = q.has
+
+    # Energy RAG 優先
+    if use_rag and not has(*OPEN_QUESTION_WORDS):
+        return "history"
+
+    # 知識型問題（優先）
+    if has(*KNOWLEDGE_WORDS):
+        return "general"
+
+    # 即時資料
+    if has(*REALTIME_WORDS):
+        return "realtime"
+
+    # 歷史 JSON
+    if has(*HISTORY_WORDS):
+        return "history"
+
+    # 西元年份 / 民國年份
+    if AD_NUMBER_RE.search(q.text) or ROC_NUMBER_RE.search(q.text):
+        return "history"
+
+    return "general"
+
+
+def classify_mode(q: ParsedQuery):
+    if q.has(*ANALYSIS_WORDS):
+        return "analysis"
+
+    if q.has(*PRECISE_WORDS):
+        return "precise"
+
+    return "normal"
+
+
+# =====================================================
+# Parser
+# =====================================================
+class QueryParser:
+    """
+    每則訊息只掃描一次：部門 / 能源 / 所有關鍵字共用一個 automaton
+
+    比對優先順序與舊版逐一 `in` 判斷相同：
+      部門：正式名稱（DEPARTMENTS 順序）→ 同義詞（長的優先）
+      能源：正式名稱（長的優先）→ 同義詞（長的優先）
+    """
+
+    def __init__(self, energy_names, cache_size: int = 4096):
+        self.energy_names = list(energy_names)
+
+        # pattern -> [(rank, canonical)]
+        self._departments = {}
+        self._energies = {}
+
+        rank = 0
+        for dept in DEPARTMENTS:
+            self._departments.setdefault(dept.lower(), []).append((rank, dept))
+            rank += 1
+        for alias, canonical in sorted(
+            DEPARTMENT_SYNONYMS.items(), key=lambda x: len(x[0]), reverse=True
+        ):
+            self._departments.setdefault(alias.lower(), []).append((rank, canonical))
+            rank += 1
+
+        rank = 0
+        for name in self.energy_names:
+            if name:
+                self._energies.setdefault(name.lower(), []).append((rank, name))
+            rank += 1
+        for alias, canonical in sorted(
+            ENERGY_SYNONYMS.items(), key=lambda x: len(x[0]), reverse=True
+        ):
+            resolved = self._resolve_energy(canonical)
+            if resolved:
+                self._energies.setdefault(alias.lower(), []).append((rank, resolved))
+            rank += 1
+
+        keywords = [w for group in KEYWORD_GROUPS for w in group]
+        self.automaton = KeywordAutomaton(
+            keywords + list(self._departments) + list(self._energies)
+        )
+
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _resolve_energy(self, canonical):
+        # 同義詞的正式名稱不在資料中時，找包含它的正式名稱
+        if canonical in self.energy_names:
+            return canonical
+
+        for name in self.energy_names:
+            if canonical and canonical in name:
+                return name
+
+        return None
+
+    @staticmethod
+    def _ranked(found, table):
+        hits = sorted(
+            hit for pattern in found if pattern in table for hit in table[pattern]
+        )
+        return tuple(dict.fromkeys(canonical for _, canonical in hits))
+
+    def _parse(self, user_text: str):
+        text = user_text.strip()
+        found = self.automaton.find_all(text)
+
+        departments = self._ranked(found, self._departments)
+        energies = self._ranked(found, self._energies)
+
+        q = ParsedQuery(
+            text=text,
+            year=extract_year(text),
+            years=tuple(extract_years(text)),
+            department=departments[0] if departments else None,
+            departments=departments,
+            energy_name=energies[0] if energies else None,
+            energies=energies,
+            keywords=frozenset(found),
+            top_n=extract_top_n(text),
+            lang=detect_lang(text),
+        )
+
+        # 後面的判斷依賴前面的結果
+        intent = classify_intent(
+            q, year=q.year, department=q.department, energy_name=q.energy_name
+        )
+        use_rag = classify_rag(q, intent)
+
+        return replace(
+            q,
+            intent=intent,
+            use_rag=use_rag,
+            source=classify_source(q, use_rag),
+            mode=classify_mode(q),
+        )
@@ -0,0 +1,140 @@
+import math
+import os
+
+import faiss
+import numpy as np
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+# flat : IndexFlatL2（暴力搜尋，資料量小時最準）
+# ivf  : IndexIVFFlat（資料量大時使用）
+# hnsw : IndexHNSWFlat（資料量大時使用，不需訓練）
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat").strip().lower()
+
+IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+IVF_TRAIN_MIN = int(os.getenv("RAG_IVF_TRAIN_MIN", "10000"))
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# 唯讀 mmap 開啟索引（多 worker 共用 page cache，不各自複製一份）
+INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "true").lower() == "true"
+
+
+# =====================================================
+# 建立索引
+# =====================================================
+def ivf_nlist(n: int):
+    # 經驗值 4·sqrt(n)，且每個 centroid 至少 39 筆訓練資料
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def ivf_train_size(n: int):
+    # IVF 只用抽樣資料訓練 centroid，不必整份向量都在記憶體
+    return min(n, max(IVF_TRAIN_MIN, 64 * ivf_nlist(n)))
+
+
+def create_faiss_index(dim: int, n: int, index_type: str = INDEX_TYPE):
+    """
+    建立空索引；n 為預計筆數（決定 IVF 的 nlist）
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    if index_type == "ivf":
+        nlist = ivf_nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+        index.nprobe = min(IVF_NPROBE, nlist)
+        return index
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    raise ValueError(f"不支援的索引類型：{index_type}（可用：{', '.join(INDEX_TYPES)}）")
+
+
+def build_faiss_index(embeddings, index_type: str = INDEX_TYPE):
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+
+    index = create_faiss_index(dim, n, index_type)
+
+    if not index.is_trained:
+        index.train(embeddings)
+
+    index.add(embeddings)
+
+    return index
+
+
+# =====================================================
+# 寫入 / 讀取索引
+# =====================================================
+def write_index(index, path):
+    """
+    先寫到 *.tmp 再 os.replace：正在 mmap 舊檔的 worker 不受影響
+    """
+    path = str(path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+
+    faiss.write_index(index, tmp)
+    os.replace(tmp, path)
+
+
+def load_index(path, mmap: bool = INDEX_MMAP):
+    if not mmap:
+        return faiss.read_index(str(path))
+
+    # IO_FLAG_MMAP：IVF inverted lists
+    # IO_FLAG_MMAP_IFC：flat / HNSW 的向量 codes
+    flags = faiss.IO_FLAG_READ_ONLY | faiss.IO_FLAG_MMAP
+    flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+    return faiss.read_index(str(path), flags)
+
+
+# =====================================================
+# 依 metadata 過濾的搜尋參數
+# =====================================================
+def build_id_selector(ids):
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+
+
+def make_search_params(index, selector=None, k: int = 1):
+    """
+    依索引類型建立 SearchParameters，
+    selector 會讓 FAISS 在計算距離前就略過不符合的 id
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+
+    if ivf is not None:
+        return faiss.SearchParametersIVF(
+            sel=selector, nprobe=min(IVF_NPROBE, ivf.nlist)
+        )
+
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(
+            sel=selector, efSearch=max(HNSW_EF_SEARCH, k)
+        )
+
+    if selector is None:
+        return None
+
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_index(index, q_emb, k: int, selector=None):
+    params = make_search_params(index, selector, k)
+
+    if params is None:
+        return index.search(q_emb, k)
+
+    return index.search(q_emb, k, params=params)
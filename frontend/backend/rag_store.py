@@ -0,0 +1,364 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# =====================================================
+# 欄位型態
+# =====================================================
+# text  : UTF-8 blob + offsets
+# float : float64（None → NaN）
+# 其他  : dictionary encoding（int32 代碼，-1 = 沒有這個欄位）
+TEXT_COLUMNS = ("text",)
+FLOAT_COLUMNS = ("value", "total_supply")
+
+META_FILE = "meta.json"
+TEXT_BLOB_FILE = "text.bin"
+TEXT_OFFSETS_FILE = "text_offsets.npy"
+
+# store 目錄下每次寫入一個 v-<version> 子目錄，CURRENT 指向目前版本
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+TMP_PREFIX = ".tmp-"
+
+# 保留的版本數（含目前版本）：還沒重新開啟的 worker 仍在 mmap 舊版本
+KEEP_VERSIONS = 2
+
+MISSING = -1
+
+
+# =====================================================
+# 寫入
+# =====================================================
+def _dictionary_key(v):
+    # 區分 1 / 1.0 / True，list 等不可 hash 的值用 JSON 字串
+    try:
+        hash(v)
+        return (type(v).__name__, v)
+    except TypeError:
+        return json.dumps(v, ensure_ascii=False, sort_keys=True)
+
+
+def resolve_store_dir(store_dir):
+    """
+    CURRENT 指向的版本目錄；舊版（檔案直接放在 store 目錄下）回傳 store 目錄本身
+    """
+    store_dir = Path(store_dir)
+    current = store_dir / CURRENT_FILE
+
+    if current.exists():
+        return store_dir / current.read_text(encoding="utf-8").strip()
+
+    return store_dir
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def _prune_versions(store_dir, current):
+    """
+    刪除舊版本與舊版格式的檔案
+
+    Linux 上刪除已 mmap 的檔案不影響讀取中的 worker；
+    Windows 上刪不掉的（仍被開啟）就留到下次
+    """
+    versions = sorted(
+        (d for d in store_dir.glob(f"{VERSION_PREFIX}*") if d.name != current),
+        key=lambda d: d.stat().st_mtime,
+        reverse=True,
+    )
+
+    for d in versions[KEEP_VERSIONS - 1 :]:
+        shutil.rmtree(d, ignore_errors=True)
+
+    for path in store_dir.iterdir():
+        if path.is_file() and path.name != CURRENT_FILE:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def write_versioned(target_dir, write):
+    """
+    write(暫存目錄) 寫入全部檔案，回傳含 "version" 的 dict
+
+    完成後改名成 v-<version> 再切換 CURRENT，
+    不會覆寫任何 worker 正在 mmap 的檔案（store、lexical index 共用）
+    """
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    tmp_dir = target_dir / f"{TMP_PREFIX}{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+
+    try:
+        meta = write(tmp_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    version_dir = target_dir / f"{VERSION_PREFIX}{meta['version']}"
+
+    # 內容完全相同的版本已存在就直接沿用
+    if version_dir.exists():
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        tmp_dir.replace(version_dir)
+
+    _write_atomic(target_dir / CURRENT_FILE, version_dir.name)
+    _prune_versions(target_dir, version_dir.name)
+
+    return meta
+
+
+def write_store(records, store_dir):
+    """
+    records（list of dict）→ 欄位式儲存目錄（版本化，見 write_versioned）
+    """
+    return write_versioned(store_dir, lambda tmp_dir: _write_columns(records, tmp_dir))
+
+
+def _write_columns(records, store_dir):
+    """
+    把欄位檔、text blob 與 meta.json 寫進 store_dir
+    """
+    field_order = []
+    dictionaries = {}
+    lookups = {}
+    codes = {}
+    floats = {}
+
+    offsets = [0]
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(store_dir / TEXT_BLOB_FILE, "wb") as blob:
+
+        for n, r in enumerate(records):
+
+            for key in r:
+                if key in field_order:
+                    continue
+
+                field_order.append(key)
+
+                if key in FLOAT_COLUMNS:
+                    floats[key] = [np.nan] * n
+                elif key not in TEXT_COLUMNS:
+                    dictionaries[key] = []
+                    lookups[key] = {}
+                    codes[key] = [MISSING] * n
+
+            # text
+            data = (r.get("text") or "").encode("utf-8")
+            blob.write(data)
+            offsets.append(offsets[-1] + len(data))
+
+            # float
+            for key, column in floats.items():
+                v = r.get(key)
+                column.append(np.nan if v is None else float(v))
+
+            # dictionary
+            for key, column in codes.items():
+                if key not in r:
+                    column.append(MISSING)
+                    continue
+
+                v = r[key]
+                lookup = lookups[key]
+                token = _dictionary_key(v)
+
+                if token not in lookup:
+                    lookup[token] = len(dictionaries[key])
+                    dictionaries[key].append(v)
+
+                column.append(lookup[token])
+
+    count = len(offsets) - 1
+
+    arrays = {TEXT_OFFSETS_FILE: np.asarray(offsets, dtype=np.int64)}
+
+    for key, column in floats.items():
+        arrays[f"{key}.npy"] = np.asarray(column, dtype=np.float64)
+
+    for key, column in codes.items():
+        arrays[f"{key}.npy"] = np.asarray(column, dtype=np.int32)
+
+    for name, arr in arrays.items():
+        np.save(store_dir / name, arr)
+        digest.update(name.encode("utf-8"))
+        digest.update(arr.tobytes())
+
+    digest.update((store_dir / TEXT_BLOB_FILE).read_bytes())
+
+    meta = {
+        "version": digest.hexdigest(),
+        "count": count,
+        "field_order": field_order,
+        "text_columns": [k for k in TEXT_COLUMNS if k in field_order],
+        "float_columns": list(floats),
+        "dictionaries": dictionaries,
+    }
+
+    (store_dir / META_FILE).write_text(
+        json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+    )
+
+    return meta
+
+
+# =====================================================
+# 讀取（memory-mapped）
+# =====================================================
+class RecordStore:
+    """
+    欄位式 RAG metadata
+
+    - store[i]            → dict（依 FAISS id O(1) 取得）
+    - store.equals(...)   → bool mask，只比對 dictionary 不展開 records
+    - store.rows(ids)     → 只展開需要的 records
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = resolve_store_dir(store_dir)
+
+        meta = json.loads((self.store_dir / META_FILE).read_text(encoding="utf-8"))
+
+        self.version = meta["version"]
+        self.count = meta["count"]
+        self.field_order = meta["field_order"]
+        self.dictionaries = meta["dictionaries"]
+        self.float_columns = meta["float_columns"]
+
+        self.codes = {
+            key: np.load(self.store_dir / f"{key}.npy", mmap_mode="r")
+            for key in self.dictionaries
+        }
+        self.floats = {
+            key: np.load(self.store_dir / f"{key}.npy", mmap_mode="r")
+            for key in self.float_columns
+        }
+
+        self.text_offsets = np.load(self.store_dir / TEXT_OFFSETS_FILE, mmap_mode="r")
+
+        if self.text_offsets[-1] > 0:
+            self.text_blob = np.memmap(
+                self.store_dir / TEXT_BLOB_FILE, dtype=np.uint8, mode="r"
+            )
+        else:
+            self.text_blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    # -------------------------------------------------
+    # row access
+    # -------------------------------------------------
+    def text(self, i):
+        start, end = self.text_offsets[i], self.text_offsets[i + 1]
+        return bytes(self.text_blob[start:end]).decode("utf-8")
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+
+        row = {}
+
+        for key in self.field_order:
+
+            if key == "text":
+                row[key] = self.text(i)
+
+            elif key in self.floats:
+                v = float(self.floats[key][i])
+                row[key] = None if np.isnan(v) else v
+
+            else:
+                code = int(self.codes[key][i])
+                if code != MISSING:
+                    row[key] = self.dictionaries[key][code]
+
+        return row
+
+    def rows(self, ids):
+        return [self[int(i)] for i in ids]
+
+    # -------------------------------------------------
+    # 欄位查詢（不展開 records）
+    # -------------------------------------------------
+    def match(self, key, predicate, ids=None):
+        """
+        predicate 只套用在 dictionary 上，再用代碼比對整欄
+
+        ids：只比對這些 row，回傳與 ids 等長的 mask
+        """
+        if key not in self.codes:
+            return np.zeros(self.count if ids is None else len(ids), dtype=bool)
+
+        hits = [n for n, v in enumerate(self.dictionaries[key]) if predicate(v)]
+        codes = self.codes[key] if ids is None else self.codes[key][ids]
+
+        return np.isin(codes, np.asarray(hits, dtype=np.int32))
+
+    def equals(self, key, value):
+        return self.match(key, lambda v: v == value)
+
+    def where(self, mask):
+        return np.flatnonzero(mask)
+
+    def unique(self, key):
+        return list(self.dictionaries.get(key, []))
+
+    def group_ids(self, key):
+        """
+        {欄位值: 該值的所有 row id}
+        """
+        if key not in self.codes:
+            return {}
+
+        codes = np.asarray(self.codes[key])
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+
+        groups = {}
+        for code in np.unique(sorted_codes):
+            if code == MISSING:
+                continue
+
+            start, end = np.searchsorted(sorted_codes, [code, code + 1])
+            groups[self.dictionaries[key][code]] = order[start:end].astype(np.int64)
+
+        return groups
+
+
+# =====================================================
+# 開啟（舊版 meta JSON 自動轉換）
+# =====================================================
+def open_store(store_dir, legacy_json=None):
+    store_dir = Path(store_dir)
+
+    if not (resolve_store_dir(store_dir) / META_FILE).exists():
+
+        if legacy_json is None or not Path(legacy_json).exists():
+            raise FileNotFoundError(f"找不到 RAG store：{store_dir}")
+
+        print(f"⚠️ 找不到 {store_dir}，由 {legacy_json} 轉換中...")
+        records = json.loads(Path(legacy_json).read_text(encoding="utf-8"))
+        write_store(records, store_dir)
+
+    return RecordStore(store_dir)
@@ -0,0 +1,165 @@
+"""
+比例類工作表（列 = 需求部門 D，欄 = 能源 S）的向量化轉換
+
+整塊數值一次轉型 → 非 0 遮罩 → 攤平成長表，
+不再逐列逐格 iloc / iterrows
+
+共用：build_energy_rag_core.py、etl.py、rag/ingest_excel.py、
+      src/scripts/convert.py、src/scripts/extract_S54.py
+"""
+
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# utils
+# =========================
+def norm_values(values):
+    """
+    向量化的 norm：NaN → ""，其他轉字串去空白
+    """
+    arr = np.asarray(list(values), dtype=object)
+    arr[pd.isna(arr)] = ""
+
+    return np.char.strip(arr.astype(str))
+
+
+def ffill_frame(df):
+    """
+    與 df.ffill() 相同，但整張表一次在 object 矩陣上處理（欄位多時快很多）
+    """
+    arr = df.to_numpy(dtype=object)
+    missing = pd.isna(arr)
+
+    # 每格往上找最近一個有值的列
+    rows = np.where(missing, 0, np.arange(len(arr))[:, None])
+    rows = np.maximum.accumulate(rows, axis=0)
+
+    filled = arr[rows, np.arange(arr.shape[1])[None, :]]
+
+    return pd.DataFrame(filled, index=df.index, columns=df.columns)
+
+
+def numeric_block(df, first_row=0, first_col=0):
+    """
+    df.iloc[first_row:, first_col:] → float64 矩陣（無法轉數值的格子為 NaN）
+    """
+    block = df.iloc[first_row:, first_col:].to_numpy(dtype=object)
+
+    values = pd.to_numeric(pd.Series(block.ravel()), errors="coerce")
+
+    return values.to_numpy(dtype=np.float64).reshape(block.shape)
+
+
+# =========================
+# 寬表 → 長表
+# =========================
+def ratio_cells(df, first_row=0, first_col=2, code_col=0, col_mask=None):
+    """
+    回傳長表 DataFrame：row / col（在 df 中的位置）/ value
+
+    - 只保留 code_col 不是空白、且數值不是 0 的格子
+    - col_mask：只看這些欄（長度同 df.iloc[:, first_col:]）
+    - 順序與逐列、逐欄走訪相同
+    """
+    values = numeric_block(df, first_row, first_col)
+    codes = norm_values(df.iloc[first_row:, code_col])
+
+    mask = ~np.isnan(values) & (values != 0)
+    mask &= (codes != "")[:, None]
+
+    if col_mask is not None:
+        mask &= np.asarray(col_mask, dtype=bool)[None, :]
+
+    rows, cols = np.nonzero(mask)
+
+    return pd.DataFrame(
+        {
+            "row": rows + first_row,
+            "col": cols + first_col,
+            "value": values[rows, cols],
+        }
+    )
+
+
+def take(values, positions):
+    """
+    依位置取值（values 可以是 list / Series / Index）
+    """
+    return np.asarray(list(values), dtype=object)[np.asarray(positions)]
+
+
+def join_text(*parts):
+    """
+    向量化字串串接：每個 part 可以是字串常數或等長的序列
+    """
+    text = None
+
+    for p in parts:
+        p = p if isinstance(p, str) else np.asarray(p, dtype=object).astype(str)
+        text = p if text is None else np.char.add(text, p)
+
+    return text
+
+
+# =========================
+# 總比例換算（header=None）→ JSON 用的巢狀 dict
+# =========================
+def _header_cells(df, col_mask, row_ok):
+    """
+    第一列當欄名：回傳 (D 代碼, S 代碼, 長表)，長表只含 row_ok(D 代碼) 的列
+    """
+    demand_codes = norm_values(df.iloc[:, 0])
+    supply_codes = norm_values(df.iloc[0])
+
+    cells = ratio_cells(
+        df, first_row=1, first_col=1, col_mask=col_mask(supply_codes[1:])
+    )
+    cells = cells[row_ok(demand_codes)[cells["row"].to_numpy()]]
+
+    return demand_codes.tolist(), supply_codes.tolist(), cells
+
+
+def demand_supply_from_frame(df, digits=3):
+    """
+    {D: {S: 比例}}：排除 D1 列與 S54（合計）欄，只留非 0 數值
+    """
+    demand_codes, supply_codes, cells = _header_cells(
+        df,
+        col_mask=lambda s: np.char.startswith(s, "S") & (s != "S54"),
+        row_ok=lambda d: np.char.startswith(d, "D") & (d != "D1"),
+    )
+
+    result = {}
+
+    for row, items in groupby(
+        zip(cells["row"].tolist(), cells["col"].tolist(), cells["value"].tolist()),
+        key=lambda item: item[0],
+    ):
+        result[demand_codes[row]] = {
+            supply_codes[col]: round(val, digits) for _, col, val in items
+        }
+
+    return result
+
+
+def s54_from_frame(df, digits=2):
+    """
+    {D: S54 合計比例}（含 D1），找不到 S54 欄回傳 None
+    """
+    demand_codes, supply_codes, cells = _header_cells(
+        df,
+        col_mask=lambda s: s == "S54",
+        row_ok=lambda d: np.char.startswith(d, "D"),
+    )
+
+    if "S54" not in supply_codes:
+        return None
+
+    return {
+        demand_codes[row]: round(val, digits)
+        for row, val in zip(cells["row"].tolist(), cells["value"].tolist())
+    }
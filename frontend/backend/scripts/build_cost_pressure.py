@@ -7,51 +7,34 @@ import os
 
 BASE_DIR = os.path.dirname(__file__)
 
-DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "../../src/data"))
+DATA_DIR = os.path.abspath(
+    os.getenv("ENERGY_DATA_DIR", os.path.join(BASE_DIR, "../../src/data"))
+)
+
+YEARS = range(80, 114)
 
 # =========================
 # 🔥 讀取成本對照表
 # =========================
 
-with open(
-    os.path.join(DATA_DIR, "energy_cost_mapping.json"), "r", encoding="utf-8"
-) as f:
 
-    cost_map = json.load(f)
+def load_cost_map(data_dir=DATA_DIR):
 
-# =========================
-# 🔥 結果
-# =========================
+    with open(
+        os.path.join(data_dir, "energy_cost_mapping.json"), "r", encoding="utf-8"
+    ) as f:
+
+        return json.load(f)
 
-results = []
 
 # =========================
-# 🔥 跑 80~113 年
+# 🔥 統計供給總量
 # =========================
 
-for year in range(80, 114):
-
-    print(f"🔥 處理 {year} 年")
-
-    file_path = os.path.join(DATA_DIR, f"{year}_energy_demand_supply.json")
-
-    # 檔案不存在就跳過
-    if not os.path.exists(file_path):
-        print("❌ 找不到檔案")
-        continue
-
-    # =========================
-    # 🔥 讀取資料
-    # =========================
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # =========================
-    # 🔥 統計供給總量
-    # =========================
+def supply_totals(data):
 
-    supply_totals = {}
+    totals = {}
 
     for demand_data in data.values():
 
@@ -67,19 +50,25 @@ for year in range(80, 114):
             except:
                 value = 0
 
-            if supply_code not in supply_totals:
-                supply_totals[supply_code] = 0
+            if supply_code not in totals:
+                totals[supply_code] = 0
 
-            supply_totals[supply_code] += value
+            totals[supply_code] += value
+
+    return totals
+
+
+# =========================
+# 🔥 計算成本壓力
+# =========================
 
-    # =========================
-    # 🔥 計算成本壓力
-    # =========================
+
+def cost_pressure(totals, cost_map):
 
     total_energy = 0
     total_cost = 0
 
-    for supply_code, amount in supply_totals.items():
+    for supply_code, amount in totals.items():
 
         mapping = cost_map.get(supply_code)
 
@@ -98,25 +87,68 @@ for year in range(80, 114):
     # =========================
 
     if total_energy == 0:
-        cost_pressure = 0
-    else:
-        cost_pressure = round((total_cost / total_energy) * 50, 2)
+        return 0
 
-    # =========================
-    # 🔥 存結果
-    # =========================
+    return round((total_cost / total_energy) * 50, 2)
 
-    results.append({"year": year, "costPressure": cost_pressure})
 
-    print(f"✅ {year} 年成本壓力 = {cost_pressure}")
+def build_cost_pressure(yearly_data, cost_map):
+    """
+    yearly_data：{year: {D: {S: 比例}}}（依年份排序）
+    """
+
+    results = []
+
+    for year, data in yearly_data.items():
+
+        value = cost_pressure(supply_totals(data), cost_map)
+
+        results.append({"year": year, "costPressure": value})
+
+        print(f"✅ {year} 年成本壓力 = {value}")
+
+    return results
+
+
+def write_cost_pressure(results, data_dir=DATA_DIR):
+
+    output_path = os.path.join(data_dir, "historical_cost_pressure.json")
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    return output_path
+
 
 # =========================
-# 🔥 輸出 JSON
+# 🔥 跑 80~113 年
 # =========================
 
-output_path = os.path.join(DATA_DIR, "historical_cost_pressure.json")
 
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(results, f, ensure_ascii=False, indent=2)
+def main():
+
+    cost_map = load_cost_map()
+
+    yearly_data = {}
+
+    for year in YEARS:
+
+        print(f"🔥 處理 {year} 年")
+
+        file_path = os.path.join(DATA_DIR, f"{year}_energy_demand_supply.json")
+
+        # 檔案不存在就跳過
+        if not os.path.exists(file_path):
+            print("❌ 找不到檔案")
+            continue
+
+        with open(file_path, "r", encoding="utf-8") as f:
+            yearly_data[year] = json.load(f)
+
+    write_cost_pressure(build_cost_pressure(yearly_data, cost_map))
+
+    print("\n🔥 historical_cost_pressure.json 建立完成")
+
 
-print("\n🔥 historical_cost_pressure.json 建立完成")
+if __name__ == "__main__":
+    main()
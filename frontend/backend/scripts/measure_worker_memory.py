@@ -0,0 +1,119 @@
+"""
+量測 N 個 worker 載入 RAG 檔案後的實際記憶體（Linux /proc/<pid>/smaps_rollup）
+
+  copy : faiss.read_index + json.loads（舊做法，每個 worker 各一份）
+  mmap : load_index(mmap) + RecordStore + lexical mmap（共用 page cache）
+
+PSS 會把共用頁面平均分給共用的 process，加總即為 N 個 worker 的真實用量。
+
+用法：
+  python scripts/measure_worker_memory.py --workers 4
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+PROCESSED_DIR = BACKEND_DIR / "processed"
+STORE_DIR = PROCESSED_DIR / "energy_rag_all_years_store"
+INDEX_PATH = PROCESSED_DIR / "energy_rag_all_years.index"
+LEXICAL_DIR = PROCESSED_DIR / "energy_rag_all_years_lexical"
+
+
+def read_smaps_rollup(pid):
+    result = {}
+
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                result[parts[0].rstrip(":")] = int(parts[1])
+
+    return result
+
+
+def worker(mode, ready, done):
+    import faiss
+    import numpy as np
+
+    from lexical_index import NgramBM25Index
+    from rag_index import load_index
+    from rag_store import RecordStore
+
+    if mode == "copy":
+        index = faiss.read_index(str(INDEX_PATH))
+
+        # 等同舊版 json.loads(meta) 得到的 list of dict（每個 worker 各一份）
+        records = json.loads(
+            json.dumps(list(RecordStore(STORE_DIR)), ensure_ascii=False)
+        )
+        lexical = NgramBM25Index.load(LEXICAL_DIR, mmap=False)
+    else:
+        index = load_index(INDEX_PATH, mmap=True)
+        records = RecordStore(STORE_DIR)
+        lexical = NgramBM25Index.load(LEXICAL_DIR, mmap=True)
+
+        # 讀過所有頁面，共用頁面才會計入 PSS
+        np.asarray(records.text_blob).sum()
+        for column in list(records.codes.values()) + list(records.floats.values()):
+            np.nansum(column)
+
+    np.asarray(lexical.weights).sum()
+
+    # flat 索引會掃過全部向量
+    q = np.zeros((1, index.d), dtype="float32")
+    index.search(q, 10)
+
+    ready.set()
+    done.wait()
+
+
+def measure(mode, workers):
+    ctx = mp.get_context("spawn")
+    done = ctx.Event()
+    procs = []
+
+    for _ in range(workers):
+        ready = ctx.Event()
+        p = ctx.Process(target=worker, args=(mode, ready, done))
+        p.start()
+        procs.append((p, ready))
+
+    for _, ready in procs:
+        ready.wait()
+
+    totals = {"Rss": 0, "Pss": 0}
+    for p, _ in procs:
+        stats = read_smaps_rollup(p.pid)
+        for key in totals:
+            totals[key] += stats.get(key, 0)
+
+    done.set()
+    for p, _ in procs:
+        p.join()
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "rss_mb": round(totals["Rss"] / 1024, 1),
+        "pss_mb": round(totals["Pss"] / 1024, 1),
+        "pss_per_worker_mb": round(totals["Pss"] / 1024 / workers, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    for mode in ("copy", "mmap"):
+        print(json.dumps(measure(mode, args.workers), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
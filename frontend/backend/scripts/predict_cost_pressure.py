@@ -11,7 +11,9 @@ print("🔥 predict_cost_pressure.py 啟動")
 
 BASE_DIR = os.path.dirname(__file__)
 
-DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "../../src/data"))
+DATA_DIR = os.path.abspath(
+    os.getenv("ENERGY_DATA_DIR", os.path.join(BASE_DIR, "../../src/data"))
+)
 
 # =========================
 # 🔥 讀取歷史成本壓力
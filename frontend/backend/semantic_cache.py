@@ -0,0 +1,301 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+SEMANTIC_CACHE_ENABLED = os.getenv("CHAT_SEMANTIC_CACHE", "true").lower() == "true"
+SEMANTIC_CACHE_SIZE = int(os.getenv("CHAT_SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_TTL = float(os.getenv("CHAT_SEMANTIC_CACHE_TTL", "86400"))
+# cosine 相似度門檻（越高越保守）
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("CHAT_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+# 清除事件的 channel（透過共用的 session store 廣播給所有 worker）
+PURGE_CHANNEL = "semantic_cache_purge"
+
+# 問題前後的標點 / 語助詞不影響語意
+_EDGE_RE = re.compile(r"^[\W_]+|[\W_]+$")
+_SPACE_RE = re.compile(r"\s+")
+
+
+# 答案會隨時間改變的問題（今天天氣、最新消息…）不進快取
+TIME_SENSITIVE_RE = re.compile(
+    # 中文 / 日文
+    r"今天|今日|今晚|今年|明天|昨天|現在|目前|最新|即時|剛剛|本週|這週|本月|這個月"
+    r"|天氣|天気|氣溫|股價|匯率|新聞"
+    # 韓文
+    r"|오늘|지금|현재|최신|날씨"
+    # English
+    r"|\b(?:today|tonight|now|current|currently|latest|recent|recently|live"
+    r"|real-?time|yesterday|tomorrow|this (?:week|month|year)|weather|news"
+    r"|stock price|exchange rate)\b"
+)
+
+
+def normalize_question(text: str):
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _SPACE_RE.sub(" ", text).strip()
+
+    return _EDGE_RE.sub("", text)
+
+
+# 依賴前文的追問（「那明年呢」「它的比例」）單獨看不出在問什麼，不走快取
+FOLLOW_UP_RE = re.compile(
+    r"^(?:那|那麼|所以|然後|還有|另外|至於)"
+    r"|這個|那個|這些|那些|它|他們|上述|剛才|前面|同樣"
+    r"|^(?:and|so|then|also|what about|how about)\b"
+    r"|\b(?:it|its|they|them|those|these|the above|previous|same)\b"
+)
+
+
+# 問題中的數字（含中文數字：「前五」「前十」）
+NUMBER_RE = re.compile(r"\d+|[零〇一二兩三四五六七八九十百千萬]+")
+
+
+def is_time_sensitive(text: str):
+    return TIME_SENSITIVE_RE.search(normalize_question(text)) is not None
+
+
+def is_follow_up(text: str):
+    return FOLLOW_UP_RE.search(normalize_question(text)) is not None
+
+
+def is_cacheable(text: str):
+    """
+    只看問題本身：與時間有關、或依賴前文的問題不走快取
+    """
+    return not is_time_sensitive(text) and not is_follow_up(text)
+
+
+def cache_guard(parsed, text: str):
+    """
+    只差年份 / 部門 / 能源 / 數字的問題向量很接近，答案卻不同：
+    這些解析結果（與問題中的數字）也必須完全相同才算命中
+    """
+    return (
+        parsed.intent,
+        parsed.top_n,
+        parsed.years,
+        parsed.departments,
+        parsed.energies,
+        tuple(NUMBER_RE.findall(text)),
+    )
+
+
+# =====================================================
+# 語意快取：相似問題直接回傳上次的答案
+# =====================================================
+class SemanticCache:
+    """
+    (scope, 問題向量) → 答案
+
+    scope 例如 (語言, 模式, 模型)，不同 scope 的答案不會互相命中
+
+    - 正規化後完全相同的問題直接命中，不必 encode
+    - 其餘以 cosine 相似度找最接近的問題，超過門檻才算命中
+    - guard（例如年份 / 部門 / 能源）也要完全相同：
+      只差年份或部門的問題向量很接近，但答案不同
+    - 超過容量時淘汰最久沒用的，過期（TTL）的在查詢時丟棄
+    - events（有 publish / read_events 的 session store）：
+      purge 寫成事件，每個 worker 查詢前先套用還沒處理的清除
+    """
+
+    def __init__(
+        self,
+        embedder,
+        maxsize: int = SEMANTIC_CACHE_SIZE,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        scope_fields=(),
+        events=None,
+    ):
+        self.embedder = embedder
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        # scope 每個位置的名稱，purge(lang="en") 依名稱比對
+        self.scope_fields = tuple(scope_fields)
+        self.events = events
+        self._event_seq = 0
+
+        # 第 i 列向量屬於 slot i；_slots 依最近使用排序
+        self._vectors = None
+        self._scopes = np.full(maxsize, -1, dtype=np.int64)
+        self._guards = np.zeros(maxsize, dtype=np.int64)
+        self._slots = OrderedDict()
+        self._exact = {}
+        self._scope_ids = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.purged = 0
+
+    def _encode(self, question):
+        vec = np.asarray(self.embedder.encode([question]), dtype=np.float32)[0]
+        norm = np.linalg.norm(vec)
+
+        return vec / norm if norm else vec
+
+    def _free(self, slot):
+        entry = self._slots.pop(slot)
+        self._exact.pop((entry["scope"], entry["question"]), None)
+        self._scopes[slot] = -1
+
+    def _hit(self, slot, now):
+        entry = self._slots[slot]
+
+        if entry["expires_at"] < now:
+            self._free(slot)
+            return None
+
+        self._slots.move_to_end(slot)
+        return entry
+
+    def get(self, question, scope, guard=()):
+        """
+        回傳 (答案, 相似度, 向量)；沒命中時答案為 None
+
+        向量可交給 set() 重用，不必再 encode 一次
+        """
+        self._sync()
+
+        question = normalize_question(question)
+        now = time.monotonic()
+
+        with self._lock:
+            slot = self._exact.get((scope, question))
+
+            if slot is not None and self._hit(slot, now):
+                self.hits += 1
+                self.exact_hits += 1
+                return self._slots[slot]["value"], 1.0, None
+
+        vec = self._encode(question)
+
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+
+            if scope_id is not None and self._slots:
+                sims = self._vectors @ vec
+                other = (self._scopes != scope_id) | (self._guards != hash(guard))
+                sims[other] = -np.inf
+
+                slot = int(np.argmax(sims))
+                score = float(sims[slot])
+
+                if score >= self.threshold and self._hit(slot, now):
+                    self.hits += 1
+                    return self._slots[slot]["value"], score, vec
+
+            self.misses += 1
+            return None, 0.0, vec
+
+    def set(self, question, scope, value, vec=None, guard=()):
+        question = normalize_question(question)
+
+        if vec is None:
+            vec = self._encode(question)
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vec.shape[0]), dtype=np.float32)
+
+            slot = self._exact.get((scope, question))
+
+            if slot is None:
+                if len(self._slots) >= self.maxsize:
+                    self._free(next(iter(self._slots)))
+
+                slot = int(np.argmax(self._scopes == -1))
+
+            scope_id = self._scope_ids.setdefault(scope, len(self._scope_ids))
+
+            self._vectors[slot] = vec
+            self._scopes[slot] = scope_id
+            self._guards[slot] = hash(guard)
+            self._slots[slot] = {
+                "scope": scope,
+                "question": question,
+                "value": value,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._slots.move_to_end(slot)
+            self._exact[(scope, question)] = slot
+
+    def _purge_local(self, where):
+        fields = {self.scope_fields.index(k): v for k, v in where.items()}
+
+        with self._lock:
+            slots = [
+                slot
+                for slot, entry in self._slots.items()
+                if all(entry["scope"][i] == v for i, v in fields.items())
+            ]
+
+            for slot in slots:
+                self._free(slot)
+
+            self.purged += len(slots)
+            return len(slots)
+
+    def _sync(self):
+        """
+        套用其他 worker 發出的清除事件
+        """
+        if self.events is None:
+            return 0
+
+        purged = 0
+
+        for seq, payload in self.events.read_events(PURGE_CHANNEL, self._event_seq):
+            purged += self._purge_local(json.loads(payload))
+            self._event_seq = max(self._event_seq, seq)
+
+        return purged
+
+    def purge(self, **where):
+        """
+        scope 欄位符合 where 的全部刪除（例如 lang="en"）；不指定 = 全部
+
+        有 events 時寫成事件，其他 worker 下次查詢前套用；
+        回傳值只算這個 worker 刪掉的筆數
+        """
+        unknown = set(where) - set(self.scope_fields)
+
+        if unknown:
+            raise ValueError(f"未知的 scope 欄位：{', '.join(sorted(unknown))}")
+
+        if self.events is None:
+            return self._purge_local(where)
+
+        self.events.publish(PURGE_CHANNEL, json.dumps(where, ensure_ascii=False))
+
+        return self._sync()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def stats(self):
+        total = self.hits + self.misses
+
+        return {
+            "size": len(self._slots),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "purged": self.purged,
+            "purge_events": self._event_seq,
+        }
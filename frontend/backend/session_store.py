@@ -0,0 +1,657 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+# memory：單一 process（預設）
+# sqlite：同一台機器的多個 worker 共用，重啟後保留
+# redis ：任何 Redis 相容（RESP）的服務，跨機器共用
+SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory").lower()
+
+# 最後一次對話後保留多久（秒）
+SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "86400"))
+SESSION_MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+SESSION_DB_PATH = Path(
+    os.getenv("CHAT_SESSION_DB", BASE_DIR / "processed" / "chat_sessions.db")
+)
+SESSION_REDIS_URL = os.getenv("CHAT_SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
+SESSION_KEY_PREFIX = "chat:session:"
+EVENT_KEY_PREFIX = "chat:events:"
+
+# 事件記錄（語意快取清除等）每個 channel 只保留最近幾筆，
+# redis 上整串事件在最後一次寫入後 SESSION_TTL 秒過期
+EVENT_LOG_MAX = int(os.getenv("CHAT_EVENT_LOG_MAX", "1000"))
+
+# 超過才壓縮（短訊息壓縮後反而變大）
+COMPRESS_MIN_BYTES = 512
+
+# sqlite：每幾次寫入清一次過期 / 超量的 session
+PURGE_EVERY = 256
+
+
+# =====================================================
+# 編碼：[(role, content)] ↔ bytes
+# =====================================================
+# 第一個 byte 標示格式：j = 緊湊 JSON、z = zlib 壓縮的 JSON
+def encode_messages(messages):
+    raw = json.dumps(
+        [list(m) for m in messages], ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+
+        if len(packed) < len(raw):
+            return b"z" + packed
+
+    return b"j" + raw
+
+
+def decode_messages(blob):
+    if not blob:
+        return []
+
+    blob = bytes(blob)
+    raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+
+    return [tuple(m) for m in json.loads(raw)]
+
+
+# =====================================================
+# memory：LRU + TTL + 記憶體上限
+# =====================================================
+class MemorySessionStore:
+    """
+    session_id → 編碼後的訊息（bytes），依最近使用排序
+
+    超過 session 數或總 bytes 上限時，從最久沒用的開始淘汰
+    """
+
+    backend = "memory"
+
+    def __init__(
+        self,
+        max_messages: int,
+        ttl: float = SESSION_TTL,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        max_bytes: int = SESSION_MAX_BYTES,
+    ):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._events = {}
+        self._lock = threading.Lock()
+
+        self.evicted = 0
+        self.expired = 0
+
+    def _pop(self, session_id):
+        blob, _ = self._data.pop(session_id)
+        self._bytes -= len(blob)
+
+    def _live(self, session_id, now):
+        item = self._data.get(session_id)
+
+        if item is None:
+            return None
+
+        if item[1] < now:
+            self._pop(session_id)
+            self.expired += 1
+            return None
+
+        return item[0]
+
+    def get(self, session_id):
+        with self._lock:
+            blob = self._live(session_id, time.monotonic())
+
+            if blob is None:
+                return []
+
+            self._data.move_to_end(session_id)
+
+        return decode_messages(blob)
+
+    def append(self, session_id, *messages):
+        now = time.monotonic()
+
+        with self._lock:
+            current = decode_messages(self._live(session_id, now))
+            blob = encode_messages((current + list(messages))[-self.max_messages :])
+
+            if session_id in self._data:
+                self._pop(session_id)
+
+            self._data[session_id] = (blob, now + self.ttl)
+            self._bytes += len(blob)
+
+            # 最久沒用的在前面：先清過期，再淘汰到上限以內（保留剛寫入的）
+            while len(self._data) > 1:
+                oldest, (_, expires_at) = next(iter(self._data.items()))
+
+                if expires_at < now:
+                    self.expired += 1
+                elif (
+                    len(self._data) > self.max_sessions
+                    or self._bytes > self.max_bytes
+                ):
+                    self.evicted += 1
+                else:
+                    break
+
+                self._pop(oldest)
+
+    def delete(self, session_id):
+        with self._lock:
+            if session_id in self._data:
+                self._pop(session_id)
+
+    # 事件記錄（例如語意快取清除）：memory 只有單一 process，不需要廣播
+    def publish(self, channel, payload: str):
+        with self._lock:
+            seq, log = self._events.get(channel, (0, None))
+            log = log if log is not None else deque(maxlen=EVENT_LOG_MAX)
+
+            seq += 1
+            log.append((seq, payload))
+            self._events[channel] = (seq, log)
+
+            return seq
+
+    def read_events(self, channel, after: int = 0):
+        """
+        回傳 seq > after 的 [(seq, payload)]（只保留最近 EVENT_LOG_MAX 筆）
+        """
+        with self._lock:
+            _, log = self._events.get(channel, (0, ()))
+
+            return [(seq, payload) for seq, payload in log if seq > after]
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "sessions": len(self._data),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+
+# =====================================================
+# sqlite：WAL，多個 worker 共用同一個檔案
+# =====================================================
+class SQLiteSessionStore:
+    """
+    chat_sessions(session_id, messages BLOB, expires_at, updated_at)
+
+    過期與超量（session 數 / 總 bytes）依 updated_at 由舊到新刪除
+    """
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        max_messages: int,
+        ttl: float = SESSION_TTL,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        max_bytes: int = SESSION_MAX_BYTES,
+        path=SESSION_DB_PATH,
+    ):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.path = Path(path)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        self._writes = 0
+
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                messages BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated"
+            " ON chat_sessions(updated_at)"
+        )
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        # sqlite3 連線不能跨 thread，每個 thread 一條
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    def get(self, session_id):
+        row = (
+            self._conn()
+            .execute(
+                "SELECT messages FROM chat_sessions"
+                " WHERE session_id = ? AND expires_at >= ?",
+                (session_id, time.time()),
+            )
+            .fetchone()
+        )
+
+        return decode_messages(row[0]) if row else []
+
+    def append(self, session_id, *messages):
+        conn = self._conn()
+        now = time.time()
+
+        # 讀 + 寫在同一個 transaction，多個 worker 同時寫也不會互蓋
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            row = conn.execute(
+                "SELECT messages FROM chat_sessions"
+                " WHERE session_id = ? AND expires_at >= ?",
+                (session_id, now),
+            ).fetchone()
+
+            current = decode_messages(row[0]) if row else []
+            blob = encode_messages((current + list(messages))[-self.max_messages :])
+
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?, ?)",
+                (session_id, blob, now + self.ttl, now),
+            )
+            conn.execute("COMMIT")
+
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    def purge(self):
+        conn = self._conn()
+
+        conn.execute("DELETE FROM chat_sessions WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            """
+            DELETE FROM chat_sessions WHERE session_id IN (
+                SELECT session_id FROM (
+                    SELECT
+                        session_id,
+                        ROW_NUMBER() OVER w AS n,
+                        SUM(LENGTH(messages)) OVER w AS total
+                    FROM chat_sessions
+                    WINDOW w AS (ORDER BY updated_at DESC)
+                )
+                WHERE n > ? OR total > ?
+            )
+            """,
+            (self.max_sessions, self.max_bytes),
+        )
+
+    def delete(self, session_id):
+        self._conn().execute(
+            "DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)
+        )
+
+    # 事件記錄：同一個檔案的所有 worker 都讀得到
+    def publish(self, channel, payload: str):
+        conn = self._conn()
+
+        seq = conn.execute(
+            "INSERT INTO chat_events (channel, payload) VALUES (?, ?)",
+            (channel, payload),
+        ).lastrowid
+
+        # 只保留最近 EVENT_LOG_MAX 筆（AUTOINCREMENT：刪掉的 seq 不會重複使用）
+        conn.execute(
+            "DELETE FROM chat_events WHERE channel = ? AND seq <= ?",
+            (channel, seq - EVENT_LOG_MAX),
+        )
+
+        return seq
+
+    def read_events(self, channel, after: int = 0):
+        return (
+            self._conn()
+            .execute(
+                "SELECT seq, payload FROM chat_events"
+                " WHERE channel = ? AND seq > ? ORDER BY seq",
+                (channel, after),
+            )
+            .fetchall()
+        )
+
+    def stats(self):
+        sessions, size = (
+            self._conn()
+            .execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(messages)), 0) FROM chat_sessions")
+            .fetchone()
+        )
+
+        return {
+            "backend": self.backend,
+            "path": str(self.path),
+            "sessions": sessions,
+            "bytes": size,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# =====================================================
+# redis：RESP 協定（Redis / Valkey / 任何相容的服務）
+# =====================================================
+class RedisError(Exception):
+    pass
+
+
+class RespConnection:
+    """
+    最小的 RESP client（不需要安裝 redis 套件）
+    """
+
+    def __init__(self, url: str, timeout: float = 5):
+        parsed = urlparse(url)
+
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.timeout = timeout
+
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+
+        if self.password:
+            auth = [self.username, self.password] if self.username else [self.password]
+            self._send([["AUTH", *auth]])
+
+        if self.db:
+            self._send([["SELECT", self.db]])
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+
+        self._sock = None
+        self._file = None
+
+    @staticmethod
+    def _pack(args):
+        out = [b"*%d\r\n" % len(args)]
+
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+
+        return b"".join(out)
+
+    def _read(self):
+        line = self._file.readline()
+
+        if not line:
+            raise ConnectionError("連線已關閉")
+
+        kind, body = line[:1], line[1:-2]
+
+        if kind == b"+":
+            return body.decode("utf-8")
+
+        if kind == b"-":
+            return RedisError(body.decode("utf-8"))
+
+        if kind == b":":
+            return int(body)
+
+        if kind == b"$":
+            size = int(body)
+            return None if size < 0 else self._file.read(size + 2)[:-2]
+
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read() for _ in range(size)]
+
+        raise RedisError(f"無法解析的回應：{line!r}")
+
+    def _send(self, commands):
+        self._sock.sendall(b"".join(self._pack(c) for c in commands))
+
+        return self._replies(commands)
+
+    def _replies(self, commands):
+        replies = [self._read() for _ in commands]
+
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+
+        return replies
+
+    def pipeline(self, *commands):
+        """
+        一次送出多個指令，依序回傳結果
+
+        連線 / 送出失敗時重連一次；送出後讀回應才斷線就直接丟錯，
+        服務端可能已經執行過（例如 RPUSH），重送會重複寫入
+        """
+        payload = b"".join(self._pack(c) for c in commands)
+
+        for attempt in range(2):
+            try:
+                if self._sock is None:
+                    self._connect()
+
+                self._sock.sendall(payload)
+                break
+
+            except OSError:
+                self.close()
+
+                if attempt:
+                    raise
+
+        try:
+            return self._replies(commands)
+
+        except OSError:
+            self.close()
+            raise
+
+
+class RedisSessionStore:
+    """
+    每個 session 一個 list（每則訊息一個元素），RPUSH + LTRIM + EXPIRE
+
+    LRU / 記憶體上限交給服務端（maxmemory + allkeys-lru）
+    """
+
+    backend = "redis"
+
+    def __init__(
+        self,
+        max_messages: int,
+        ttl: float = SESSION_TTL,
+        url: str = SESSION_REDIS_URL,
+        prefix: str = SESSION_KEY_PREFIX,
+    ):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.url = url
+        self.prefix = prefix
+
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = self._local.conn = RespConnection(self.url)
+
+        return conn
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    def get(self, session_id):
+        (items,) = self._conn().pipeline(["LRANGE", self._key(session_id), 0, -1])
+
+        return [m for item in items or [] for m in decode_messages(item)]
+
+    def append(self, session_id, *messages):
+        key = self._key(session_id)
+
+        self._conn().pipeline(
+            ["RPUSH", key, *(encode_messages([m]) for m in messages)],
+            ["LTRIM", key, -self.max_messages, -1],
+            ["PEXPIRE", key, int(self.ttl * 1000)],
+        )
+
+    def delete(self, session_id):
+        self._conn().pipeline(["DEL", self._key(session_id)])
+
+    # 事件記錄：一個 channel 一個 list（"seq:payload"），seq 由 INCR 產生
+    # list 只保留最近 EVENT_LOG_MAX 筆並設 TTL；seq 計數器只是一個整數，不過期
+    def publish(self, channel, payload: str):
+        key = f"{EVENT_KEY_PREFIX}{channel}"
+        conn = self._conn()
+
+        (seq,) = conn.pipeline(["INCR", f"{key}:seq"])
+        conn.pipeline(
+            ["RPUSH", key, f"{seq}:{payload}"],
+            ["LTRIM", key, -EVENT_LOG_MAX, -1],
+            ["PEXPIRE", key, int(self.ttl * 1000)],
+        )
+
+        return seq
+
+    def read_events(self, channel, after: int = 0):
+        (items,) = self._conn().pipeline(
+            ["LRANGE", f"{EVENT_KEY_PREFIX}{channel}", 0, -1]
+        )
+
+        events = []
+
+        for item in items or []:
+            seq, payload = item.decode("utf-8").split(":", 1)
+
+            if int(seq) > after:
+                events.append((int(seq), payload))
+
+        return events
+
+    def stats(self):
+        conn = self._conn()
+
+        # 只算 prefix 開頭的 key（同一個 db 可能還有其他資料）
+        sessions = 0
+        cursor = b"0"
+
+        while True:
+            ((cursor, keys),) = conn.pipeline(
+                ["SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", 1000]
+            )
+            sessions += len(keys)
+
+            if cursor in (b"0", "0"):
+                break
+
+        return {
+            "backend": self.backend,
+            "server": f"{conn.host}:{conn.port}/{conn.db}",
+            "sessions": sessions,
+        }
+
+
+# =====================================================
+# 依設定建立
+# =====================================================
+SESSION_BACKENDS = {
+    "memory": MemorySessionStore,
+    "sqlite": SQLiteSessionStore,
+    "redis": RedisSessionStore,
+}
+
+
+def create_session_store(max_messages: int, backend: str = SESSION_BACKEND):
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(
+            f"未知的 CHAT_SESSION_BACKEND：{backend}（{' / '.join(SESSION_BACKENDS)}）"
+        )
+
+    return SESSION_BACKENDS[backend](max_messages)
+
+
+# =====================================================
+# 連線檢查（不需要 app.py）
+# =====================================================
+# 對任何 RESP 相容的服務都能跑，例如本機起一個 Valkey：
+#   docker run --rm -p 6379:6379 valkey/valkey
+#   CHAT_SESSION_BACKEND=redis python session_store.py
+def self_check(store):
+    session_id = f"self-check-{os.getpid()}"
+    channel = "self-check"
+
+    store.append(session_id, ("user", "hi"), ("assistant", "hello"))
+    store.append(session_id, ("user", "again"))
+    assert store.get(session_id)[-1] == ("user", "again")
+
+    store.delete(session_id)
+    assert store.get(session_id) == []
+
+    first = store.publish(channel, "a")
+    second = store.publish(channel, "b")
+    assert store.read_events(channel, first) == [(second, "b")]
+
+    return store.stats()
+
+
+if __name__ == "__main__":
+    print(f"🔎 {SESSION_BACKEND}：", end="")
+    print(json.dumps(self_check(create_session_store(4)), ensure_ascii=False))
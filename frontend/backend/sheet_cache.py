@@ -0,0 +1,152 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import xxhash
+
+from ingest_manifest import file_hash
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =====================================================
+# 設定（可由 .env 覆寫）
+# =====================================================
+SHEET_CACHE_ENABLED = os.getenv("RAG_SHEET_CACHE", "true").lower() == "true"
+SHEET_CACHE_DIR = Path(
+    os.getenv("RAG_SHEET_CACHE_DIR", BASE_DIR / "processed" / "sheet_cache")
+)
+
+# pickle 跟著 pandas 版本走，換版本就換目錄
+CACHE_FORMAT = f"pandas-{pd.__version__}"
+
+SHEET_NAMES_FILE = "sheets.json"
+
+# 同一個 process 內，檔案沒動就不重算 hash
+_digests = {}
+
+
+# =====================================================
+# Excel 工作表快取
+# =====================================================
+# (Excel 內容 hash, 工作表, parse 參數) → DataFrame pickle
+#
+# 第一次讀取時用 openpyxl 解析並存檔，之後直接載入，
+# Excel 內容沒變就不會再走 openpyxl
+#
+# 只給 repo 內的年度資料檔用；使用者上傳的檔案在記憶體解析，不進快取
+def source_digest(source):
+    path = Path(source)
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+    if key not in _digests:
+        _digests[key] = file_hash(path)
+
+    return _digests[key]
+
+
+def _sheet_path(workbook_dir, sheet_name, options):
+    key = json.dumps(
+        [sheet_name, options], ensure_ascii=False, sort_keys=True, default=str
+    ).encode("utf-8")
+
+    return workbook_dir / f"{xxhash.xxh3_64_hexdigest(key)}.pkl"
+
+
+def _write_atomic(path, write):
+    # 多個 worker 同時寫同一個檔也不會讀到半個檔
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    write(tmp)
+    tmp.replace(path)
+
+
+def read_sheets(source, sheets=None, **options):
+    """
+    回傳 {工作表名稱: DataFrame}，不存在的工作表不會出現在結果中
+
+    sheets：{工作表名稱: parse 參數}；None = 全部工作表，都用 options
+    """
+    if not SHEET_CACHE_ENABLED:
+        with pd.ExcelFile(source) as xls:
+            if sheets is None:
+                sheets = {name: options for name in xls.sheet_names}
+
+            return {
+                name: xls.parse(name, **opts)
+                for name, opts in sheets.items()
+                if name in xls.sheet_names
+            }
+
+    workbook_dir = SHEET_CACHE_DIR / CACHE_FORMAT / source_digest(source)
+    names_path = workbook_dir / SHEET_NAMES_FILE
+
+    sheet_names = None
+    if names_path.exists():
+        sheet_names = json.loads(names_path.read_text(encoding="utf-8"))
+
+    xls = None
+
+    def workbook():
+        nonlocal xls, sheet_names
+
+        if xls is None:
+            xls = pd.ExcelFile(source)
+            sheet_names = xls.sheet_names
+
+            workbook_dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(
+                names_path,
+                lambda p: p.write_text(
+                    json.dumps(sheet_names, ensure_ascii=False), encoding="utf-8"
+                ),
+            )
+
+        return xls
+
+    try:
+        if sheets is None:
+            if sheet_names is None:
+                workbook()
+            sheets = {name: options for name in sheet_names}
+
+        result = {}
+
+        for name, opts in sheets.items():
+
+            if sheet_names is not None and name not in sheet_names:
+                continue
+
+            path = _sheet_path(workbook_dir, name, opts)
+
+            if path.exists():
+                result[name] = pd.read_pickle(path)
+                continue
+
+            xls_file = workbook()
+
+            if name not in sheet_names:
+                continue
+
+            df = xls_file.parse(name, **opts)
+            _write_atomic(path, df.to_pickle)
+
+            result[name] = df
+
+        return result
+
+    finally:
+        if xls is not None:
+            xls.close()
+
+
+def read_sheet(source, sheet_name, **options):
+    """
+    同 pd.read_excel(source, sheet_name=sheet_name, **options)
+    """
+    sheets = read_sheets(source, {sheet_name: options})
+
+    if sheet_name not in sheets:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    return sheets[sheet_name]
@@ -53,6 +53,7 @@ def read_table(file):
 
         # Excel
         if filename.endswith((".xlsx", ".xls")):
+            # 上傳的檔案只在記憶體解析，不寫進 sheet_cache（那是給年度資料檔用的）
             xls = pd.ExcelFile(bio)
             sheets = {sheet: xls.parse(sheet, dtype=str) for sheet in xls.sheet_names}
 
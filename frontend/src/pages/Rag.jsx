@@ -4,6 +4,48 @@ import "./rag.css";
 import BackToTopButton from "../components/BackToTopButton";
 import { useTranslation } from "react-i18next";
 import { useNavigate } from "react-router-dom";
+
+// /chat 串流（SSE）：delta 逐段回呼，回傳 done / error 事件的完整資料
+async function readChatStream(res, onText) {
+  if (!res.headers.get("content-type")?.includes("text/event-stream")) {
+    return res.json();
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+
+  let buffer = "";
+  let text = "";
+  let result = null;
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    const frames = buffer.split("\n\n");
+    buffer = frames.pop();
+
+    for (const frame of frames) {
+      const event = frame.match(/^event: (.*)$/m)?.[1];
+      const data = frame.match(/^data: (.*)$/m)?.[1];
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+
+      if (event === "delta") {
+        text += payload.text;
+        onText(text);
+      } else {
+        result = payload;
+      }
+    }
+  }
+
+  return result || { answer: text };
+}
+
 export default function Rag() {
   const { t } = useTranslation();
   const navigate = useNavigate();
@@ -460,6 +502,7 @@ export default function Rag() {
         fd.append("session_id", inputSid?.value || "web-ui");
         fd.append("rag_auto", !!inputRag?.checked);
         fd.append("model", "gpt-4o-mini");
+        fd.append("stream", "true");
 
         if (file) {
           fd.append("file", file);
@@ -471,7 +514,15 @@ export default function Rag() {
           body: fd,
         });
 
-        const data = await res.json();
+        // 邊收邊顯示，收到 done 後再換成完整卡片
+        const data = await readChatStream(res, (text) => {
+          thinkingInner.innerHTML = `
+            <div class="ai-card">
+              <div class="answer-box">${marked.parse(text)}</div>
+            </div>
+          `;
+          chatLog.scrollTop = chatLog.scrollHeight;
+        });
 
         thinkingWrap.remove();
 
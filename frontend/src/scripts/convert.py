@@ -1,7 +1,14 @@
-import pandas as pd
 import json
 import os
 import re
+import sys
+from pathlib import Path
+
+# 共用 backend/ratio_sheet.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+from ratio_sheet import demand_supply_from_frame
+from sheet_cache import read_sheet
 
 # ✅ 改這裡
 DATA_DIR = "../../backend/data/yearly"
@@ -12,41 +19,13 @@ def extract_year(filename):
 
 def convert_ratio_to_json(excel_path, output_path, sheet="總比例換算"):
     try:
-        df = pd.read_excel(excel_path, sheet_name=sheet)
+        df = read_sheet(excel_path, sheet, header=None)
     except Exception as e:
         print(f"❌ 讀取失敗：{excel_path}（{e}）")
         return
 
-    result = {}
-
-    for _, row in df.iterrows():
-        d = str(row.iloc[0]).strip()
-
-        if d == "D1":
-            continue
-        if not d.startswith("D"):
-            continue
-
-        entry = {}
-
-        for col in df.columns[1:]:
-            s = str(col).strip()
-
-            if s == "S54":
-                continue
-            if not s.startswith("S"):
-                continue
-
-            val = row[col]
-
-            if pd.notna(val) and val != 0:
-                try:
-                    entry[s] = round(float(val), 3)
-                except:
-                    continue
-
-        if entry:
-            result[d] = entry
+    # D 列（排除 D1）× S 欄（排除 S54），只留非 0 數值
+    result = demand_supply_from_frame(df)
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
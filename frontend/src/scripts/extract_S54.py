@@ -1,7 +1,14 @@
-import pandas as pd
 import json
 import os
 import re
+import sys
+from pathlib import Path
+
+# 共用 backend/ratio_sheet.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+from ratio_sheet import s54_from_frame
+from sheet_cache import read_sheet
 
 # 👉 改成你實際路徑
 DATA_DIR = "../../backend/data/yearly"
@@ -13,29 +20,18 @@ def extract_year(filename):
 
 def extract_S54(excel_path, sheet="總比例換算"):
     try:
-        df = pd.read_excel(excel_path, sheet_name=sheet)
+        df = read_sheet(excel_path, sheet, header=None)
     except Exception as e:
         print(f"❌ 讀取失敗：{excel_path}（{e}）")
         return {}
 
-    result = {}
-
     # 找 S54 欄
-    if "S54" not in df.columns:
+    result = s54_from_frame(df)
+
+    if result is None:
         print(f"⚠️ 找不到 S54：{excel_path}")
         return {}
 
-    for _, row in df.iterrows():
-        d = str(row.iloc[0]).strip()
-
-        if not d.startswith("D"):
-            continue
-
-        val = row["S54"]
-
-        if pd.notna(val) and val != 0:
-            result[d] = round(float(val), 2)
-
     return result
 
 
@@ -4,7 +4,7 @@ import os
 import re
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "src", "data")
+DATA_DIR = os.getenv("ENERGY_DATA_DIR", os.path.join(BASE_DIR, "src", "data"))
 
 ITERATIONS = 1200
 LR = 0.03